@@ -0,0 +1,72 @@
+"""
+Logging overhead microbenchmark: chaqiruvchi threaddagi bitta logger.info narxi.
+
+Eski sxema (StreamHandler + RotatingFileHandler to'g'ridan-to'g'ri root da) va
+QueueHandler → QueueListener (logging_config) solishtiriladi. Stream /dev/null ga.
+
+Ishga tushirish:
+    python -m benchmarks.bench_logging [yozuvlar_soni]
+"""
+import os
+import sys
+import time
+import logging
+import logging.handlers
+import queue
+import tempfile
+
+from logging_config import DroppingQueueHandler, JsonFormatter, SamplingFilter, LOG_FORMAT, orjson
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+
+def _handlers(log_dir: str, formatter: logging.Formatter, devnull):
+    stream = logging.StreamHandler(devnull)
+    rotating = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "bench.log"), maxBytes=2 * 1024 * 1024, backupCount=3, encoding="utf-8"
+    )
+    for handler in (stream, rotating):
+        handler.setFormatter(formatter)
+    return [stream, rotating]
+
+
+def run(name: str, logger: logging.Logger, after=None):
+    start = time.perf_counter()
+    for i in range(RECORDS):
+        logger.info(f"✅ Post #{i % 15 + 1} | Channel: -100{i} | Premium: False")
+    elapsed = time.perf_counter() - start
+    drained = ""
+    if after:
+        t = time.perf_counter()
+        after()
+        drained = f" (listener drain {time.perf_counter() - t:.2f}s)"
+    print(f"{name:<34} {elapsed / RECORDS * 1e6:7.2f} µs/record{drained}")
+
+
+def bench(formatter: logging.Formatter, label: str):
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        direct = logging.getLogger(f"bench.direct.{label}")
+        direct.propagate = False
+        direct.setLevel(logging.INFO)
+        for handler in _handlers(tmp, formatter, devnull):
+            direct.addHandler(handler)
+        run(f"direct handlers [{label}]", direct)
+
+        for sample_rate in (1.0, 0.1):
+            queued = logging.getLogger(f"bench.queue.{label}.{sample_rate}")
+            queued.propagate = False
+            queued.setLevel(logging.INFO)
+            handler = DroppingQueueHandler(queue.Queue(maxsize=RECORDS + 10))
+            if sample_rate < 1.0:
+                handler.addFilter(SamplingFilter(sample_rate, (queued.name,)))
+            listener = logging.handlers.QueueListener(handler.queue, *_handlers(tmp, formatter, devnull))
+            listener.start()
+            queued.addHandler(handler)
+            run(f"queue [{label}] sample={sample_rate}", queued, after=listener.stop)
+
+
+if __name__ == "__main__":
+    encoder = "orjson" if orjson else "json"
+    print(f"{RECORDS} yozuv | JSON encoder: {encoder}")
+    bench(logging.Formatter(LOG_FORMAT), "text")
+    bench(JsonFormatter(), "json")
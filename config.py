@@ -81,6 +81,18 @@ if MAX_POSTS_PREMIUM < 1 or MAX_POSTS_PREMIUM > 15:
     MAX_POSTS_PREMIUM = 15
 
 DATABASE_URL = get_env_str("DATABASE_URL")
+# Ixtiyoriy read-replica: admin/statistika so'rovlari shu yerga yuboriladi
+DATABASE_REPLICA_URL = get_env_str("DATABASE_REPLICA_URL", "")
+REPLICA_MAX_LAG_SECONDS = get_env_int("REPLICA_MAX_LAG_SECONDS", 30)
+# Shundan uzoq so'rovlar logga yoziladi (parametrlarsiz)
+DB_SLOW_QUERY_MS = get_env_int("DB_SLOW_QUERY_MS", 500)
+# /metrics (Prometheus) porti; 0 — o'chirilgan
+METRICS_PORT = get_env_int("METRICS_PORT", 0)
+# Backup siqish: gzip (default) yoki zstd (zstandard paketi kerak)
+BACKUP_COMPRESSION = get_env_str("BACKUP_COMPRESSION", "gzip").lower()
+# Inkremental backup: shu kuni (0=Dushanba ... 6=Yakshanba) to'liq, qolgan kunlari delta
+BACKUP_FULL_WEEKDAY = get_env_int("BACKUP_FULL_WEEKDAY", 6)
+BACKUP_KEEP_FULL = get_env_int("BACKUP_KEEP_FULL", 2)  # nechta to'liq zanjir saqlanadi
 
 TIMEZONE = get_env_str("TIMEZONE", "Asia/Tashkent")
 
@@ -106,6 +118,18 @@ SCHEDULER_SCALE_THRESHOLD = get_env_int("SCHEDULER_SCALE_THRESHOLD", 5)
 GROK_RATE_LIMIT = get_env_int("GROK_RATE_LIMIT", 30)        # req/min
 IMAGE_RATE_LIMIT = get_env_int("IMAGE_RATE_LIMIT", 10)       # req/min
 TELEGRAM_RATE_LIMIT = get_env_int("TELEGRAM_RATE_LIMIT", 25)  # msg/sec
+# Broadcast: bir vaqtda nechta copy_message (umumiy tezlik baribir telegram_limiter da)
+BROADCAST_CONCURRENCY = get_env_int("BROADCAST_CONCURRENCY", 20)
+BROADCAST_PROGRESS_INTERVAL = get_env_int("BROADCAST_PROGRESS_INTERVAL", 5)  # sec
+# Yetib bo'lmaydigan (bloklagan/chiqargan) chat shuncha kundan keyin qayta sinab ko'riladi
+REACHABILITY_RECHECK_DAYS = get_env_int("REACHABILITY_RECHECK_DAYS", 7)
+# Saqlangan kanal nomi shundan eski bo'lsa fonda get_chat bilan yangilanadi
+CHANNEL_TITLE_TTL = get_env_int("CHANNEL_TITLE_TTL", 86400)  # sec
+
+# Change feed (LISTEN/NOTIFY) ulangan paytda keshlar uzoqroq yashaydi
+CHANGE_FEED_CACHE_TTL = get_env_int("CHANGE_FEED_CACHE_TTL", 3600)  # sec
+# Admin statistika ekrani shu muddat keshdan beriladi
+STATS_SNAPSHOT_TTL = get_env_int("STATS_SNAPSHOT_TTL", 60)  # sec
 
 GROK_PROMPT_FREE = get_env_str(
     "GROK_PROMPT_FREE",
@@ -6,7 +6,9 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from states import AddPost
 from keyboards.inline import p_back_to_main, back_to_main, premium_image_toggle
-from utils.database import db
+from utils.database import db, count_filled_posts
+from services.channel_titles import channel_titles
+from middlewares.user_context import UserContext
 from utils.validators import validate_time_format, validate_word_count
 from config import MAX_POSTS_FREE, MAX_POSTS_PREMIUM, MAX_THEME_WORDS_FREE, MAX_THEME_WORDS_PREMIUM, IMAGE_MODE
 
@@ -37,7 +39,7 @@ def build_channels_keyboard(channels, is_premium: bool, channel_titles: dict = N
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-async def show_channels_for_post(call: CallbackQuery, state: FSMContext, bot: Bot = None):
+async def show_channels_for_post(call: CallbackQuery, state: FSMContext, bot: Bot = None, user_ctx: UserContext = None):
     """
     Post qo'shish tugmasi bosilganda kanallar ro'yxatini ko'rsatish.
     Foydalanuvchining premium yoki oddiy kanallarini tekshiradi.
@@ -49,17 +51,14 @@ async def show_channels_for_post(call: CallbackQuery, state: FSMContext, bot: Bo
             pass
 
         user_id = call.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
 
         # Foydalanuvchi premium yoki oddiy ekanligini tekshirish
-        is_premium = await db.is_premium(user_id)
+        is_premium = await user_ctx.is_premium()
 
         # Kanallarni olish
-        if is_premium:
-            channels = await db.get_user_channels(user_id, premium=True)
-            back_kb = p_back_to_main
-        else:
-            channels = await db.get_user_channels(user_id, premium=False)
-            back_kb = back_to_main
+        channels = await user_ctx.channels(premium=is_premium)
+        back_kb = p_back_to_main if is_premium else back_to_main
 
         if not channels:
             await call.message.answer(
@@ -69,17 +68,10 @@ async def show_channels_for_post(call: CallbackQuery, state: FSMContext, bot: Bo
             )
             return
 
-        # Kanal nomlarini olishga harakat qilamiz
-        channel_titles = {}
-        if bot:
-            for ch in channels:
-                try:
-                    chat = await bot.get_chat(ch[1])
-                    channel_titles[ch[1]] = chat.title or f"ID: {ch[1]}"
-                except Exception:
-                    channel_titles[ch[1]] = f"ID: {ch[1]}"
+        # Kanal nomlari bazadan (yo'qlari parallel get_chat bilan)
+        titles = await channel_titles.titles(bot, user_id, premium=is_premium)
 
-        keyboard = build_channels_keyboard(channels, is_premium, channel_titles)
+        keyboard = build_channels_keyboard(channels, is_premium, titles)
 
         await call.message.answer(
             "📝 <b>Post qo'shish</b>\n\n"
@@ -95,7 +87,7 @@ async def show_channels_for_post(call: CallbackQuery, state: FSMContext, bot: Bo
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def select_channel_for_post(call: CallbackQuery, state: FSMContext, bot: Bot = None):
+async def select_channel_for_post(call: CallbackQuery, state: FSMContext, bot: Bot = None, user_ctx: UserContext = None):
     """
     Kanal tanlangandan keyin limitni tekshirish va vaqt so'rash.
     callback_data format: select_ch:{channel_id}:{p|f}
@@ -117,25 +109,18 @@ async def select_channel_for_post(call: CallbackQuery, state: FSMContext, bot: B
         is_premium = is_premium_str == 'p'
 
         user_id = call.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         back_kb = p_back_to_main if is_premium else back_to_main
 
-        # Kanal nomini olishga harakat qilamiz
-        channel_name = f"ID: {channel_id}"
-        if bot:
-            try:
-                chat = await bot.get_chat(channel_id)
-                channel_name = chat.title or channel_name
-            except Exception:
-                pass
+        channel_name = await channel_titles.title(bot, user_id, channel_id, premium=is_premium) or f"ID: {channel_id}"
 
         # Post limitni tekshirish
+        current_posts = count_filled_posts(await user_ctx.channel(channel_id, premium=is_premium), is_premium)
         if is_premium:
             max_posts = MAX_POSTS_PREMIUM
-            current_posts = await db.count_channel_posts(channel_id, premium=True)
             max_theme_words = MAX_THEME_WORDS_PREMIUM
         else:
             max_posts = MAX_POSTS_FREE
-            current_posts = await db.count_channel_posts(channel_id, premium=False)
             max_theme_words = MAX_THEME_WORDS_FREE
 
         if current_posts >= max_posts:
@@ -151,7 +136,7 @@ async def select_channel_for_post(call: CallbackQuery, state: FSMContext, bot: B
             return
 
         # Bo'sh post raqamini topish (o'chirilgan postlar o'rniga qo'shish uchun)
-        next_post_num = await db.get_next_available_post_num(channel_id, premium=is_premium)
+        next_post_num = await user_ctx.next_post_num(channel_id, premium=is_premium)
         if next_post_num is None:
             await call.message.answer(
                 f"⚠️ <b>Limitga yetdingiz!</b>\n\n"
@@ -1,8 +1,10 @@
 import logging
 import asyncio
 import os
+import tempfile
 from datetime import datetime, timedelta
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from typing import Optional
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram import Bot
 
@@ -15,14 +17,15 @@ from keyboards.inline import (
 from utils.database import db
 from utils.env_manager import update_env_value, get_current_settings
 from utils.security import validate_broadcast_message
-from utils.stats_chart import generate_stats_chart
+from utils.stats_chart import render_stats_chart
+from services.stats_snapshot import stats_snapshot
+from services.broadcast import broadcast_engine
+from utils.log_reader import log_files, export_window
+from utils.backup import list_backups, latest_backup_chain, prepare_upload_parts, get_cached_file_ids, cache_file_ids
 from config import SUPER_ADMIN1, SUPER_ADMIN2, GROK_INPUT_PRICE_PER_M, GROK_OUTPUT_PRICE_PER_M
 
 logger = logging.getLogger(__name__)
 
-LOG_DIR = os.getenv("LOG_DIR", "logs")
-LOG_FILE = os.getenv("LOG_FILE", "bot.log")
-
 
 async def show_admin_panel(call: CallbackQuery):
     try:
@@ -51,35 +54,31 @@ async def show_statistics(call: CallbackQuery):
             await call.answer("Sizda admin huquqi yo'q", show_alert=True)
             return
 
-        # Bugungi statsni yozib qo'yamiz
-        await db.record_daily_stats()
+        # Bugungi stats, API usage va tarix — qisqa TTL li snapshotdan
+        snapshot = await stats_snapshot.get()
+        stats = snapshot.stats
 
-        total_users = await db.get_total_users()
-        premium_users = await db.get_premium_users_count()
+        total_users = stats['total_users']
+        premium_users = stats['premium_users']
         free_users = total_users - premium_users
-        total_channels = await db.get_total_channels()
-        total_posts, posts_with_image = await db.count_total_active_posts()
+        total_channels = stats['total_channels']
+        total_posts = stats['total_posts']
+        posts_with_image = stats['posts_with_image']
 
         # Grok API usage
-        def _calc_cost(rows):
-            inp = sum(r[1] or 0 for r in rows)
-            out = sum(r[2] or 0 for r in rows)
-            reqs = sum(r[3] or 0 for r in rows)
+        def _calc_cost(window):
+            inp, out, reqs = window
             cost = (inp / 1_000_000) * GROK_INPUT_PRICE_PER_M + (out / 1_000_000) * GROK_OUTPUT_PRICE_PER_M
             return inp, out, reqs, cost
 
-        usage_today = await db.get_api_usage_summary(days=0)
-        usage_week = await db.get_api_usage_summary(days=7)
-        usage_month = await db.get_api_usage_summary(days=30)
-
-        t_inp, t_out, t_req, t_cost = _calc_cost(usage_today or [])
-        w_inp, w_out, w_req, w_cost = _calc_cost(usage_week or [])
-        m_inp, m_out, m_req, m_cost = _calc_cost(usage_month or [])
+        usage = snapshot.usage
+        t_inp, t_out, t_req, t_cost = _calc_cost(usage["today"])
+        w_inp, w_out, w_req, w_cost = _calc_cost(usage["week"])
+        m_inp, m_out, m_req, m_cost = _calc_cost(usage["month"])
 
         # Prognoz: o'rtacha kunlik temp asosida
-        usage_days = await db.get_api_usage_days_count()
-        all_usage = await db.get_api_usage_summary(days=9999)
-        all_inp, all_out, all_req, all_cost = _calc_cost(all_usage or [])
+        usage_days = usage["days"]
+        all_inp, all_out, all_req, all_cost = _calc_cost(usage["all"])
 
         if usage_days and usage_days > 0:
             daily_avg_cost = all_cost / usage_days
@@ -111,10 +110,10 @@ async def show_statistics(call: CallbackQuery):
         )
 
         # Grafik yaratish
-        stats_history = await db.get_stats_history(days=30)
+        stats_history = snapshot.history
 
         if stats_history and len(stats_history) >= 1:
-            chart_bytes = generate_stats_chart(stats_history)
+            chart_bytes = await render_stats_chart(stats_history)
             if chart_bytes:
                 photo = BufferedInputFile(chart_bytes, filename="stats.png")
                 await call.message.delete()
@@ -137,6 +136,41 @@ async def show_statistics(call: CallbackQuery):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
+async def show_db_metrics(call: CallbackQuery):
+    """Pool holati va eng og'ir so'rovlar (jarayon ishga tushgandan beri)."""
+    try:
+        user_id = call.from_user.id
+
+        if not await db.is_superadmin(user_id):
+            await call.answer("Sizda admin huquqi yo'q", show_alert=True)
+            return
+
+        metrics = db.metrics
+        lines = ["<b>🗄 DB metrikalar</b>\n"]
+        for name, stats in db.pool_stats().items():
+            lines.append(
+                f"<b>{name}</b> pool: ishlatilmoqda <b>{stats['checked_out']}</b> / "
+                f"size {stats['size']} | overflow {stats['overflow']}"
+            )
+        checkout = metrics.checkout
+        lines.append(
+            f"\n⏳ Checkout: avg <b>{checkout.avg:.1f}ms</b> | p95 ≤{checkout.percentile(0.95):.0f}ms | "
+            f"max {checkout.max:.0f}ms"
+        )
+        lines.append(f"🐢 Sekin so'rovlar: <b>{metrics.slow_queries}</b> | ❌ Xatolar: <b>{metrics.errors}</b>\n")
+        lines.append("<b>Eng og'ir so'rovlar (jami vaqt):</b>")
+        for name, hist in metrics.top_queries(limit=10):
+            lines.append(
+                f"<code>{name}</code>: {hist.count} ta | avg {hist.avg:.1f}ms | "
+                f"p95 ≤{hist.percentile(0.95):.0f}ms | max {hist.max:.0f}ms"
+            )
+
+        await call.message.edit_text("\n".join(lines), reply_markup=admin_panel, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Error in show_db_metrics: {e}", exc_info=True)
+        await call.answer("Xatolik yuz berdi", show_alert=True)
+
+
 async def download_logs(call: CallbackQuery):
     """24 soatlik loglarni txt fayl sifatida yuborish."""
     try:
@@ -148,88 +182,90 @@ async def download_logs(call: CallbackQuery):
 
         await call.answer("Loglar tayyorlanmoqda...", show_alert=False)
 
-        log_path = os.path.join(LOG_DIR, LOG_FILE)
-
-        if not os.path.exists(log_path):
+        if not log_files():
             await call.message.answer(
                 "Log fayl topilmadi.",
                 reply_markup=admin_panel
             )
             return
 
-        # 24 soatlik loglarni filter qilish
+        # 24 soatlik oyna: joriy + rotatsiya qilingan fayllardan, binary search bilan
         cutoff = datetime.now() - timedelta(hours=24)
-        filtered_lines = []
-
-        try:
-            with open(log_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        # Log format: "2024-12-25 10:30:45 - ..."
-                        if len(line) >= 19:
-                            ts_str = line[:19]
-                            ts = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                            if ts >= cutoff:
-                                filtered_lines.append(line)
-                        else:
-                            # Davomi (multiline traceback va h.k.)
-                            if filtered_lines:
-                                filtered_lines.append(line)
-                    except ValueError:
-                        # Timestamp parse qilib bo'lmasa - davomiy qator
-                        if filtered_lines:
-                            filtered_lines.append(line)
-        except Exception as e:
-            logger.error(f"Log o'qishda xatolik: {e}")
-            await call.message.answer(
-                "Log faylni o'qishda xatolik.",
-                reply_markup=admin_panel
-            )
-            return
-
-        if not filtered_lines:
-            await call.message.answer(
-                "Oxirgi 24 soatda log yozuvi topilmadi.",
-                reply_markup=admin_panel
-            )
-            return
-
-        # TXT fayl yaratish
-        content = "".join(filtered_lines)
-        # Telegram 50MB limit, lekin matnni 10MB gacha cheklaymiz
-        if len(content) > 10 * 1024 * 1024:
-            content = content[-(10 * 1024 * 1024):]
-
         timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-        filename = f"logs_24h_{timestamp}.txt"
-        doc = BufferedInputFile(content.encode('utf-8'), filename=filename)
+        filename = f"logs_24h_{timestamp}.txt.gz"
 
-        error_count = sum(1 for l in filtered_lines if ' - ERROR - ' in l)
-        warn_count = sum(1 for l in filtered_lines if ' - WARNING - ' in l)
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                export = await asyncio.to_thread(export_window, cutoff, os.path.join(tmp, filename))
+            except Exception as e:
+                logger.error(f"Log o'qishda xatolik: {e}")
+                await call.message.answer(
+                    "Log faylni o'qishda xatolik.",
+                    reply_markup=admin_panel
+                )
+                return
 
-        caption = (
-            f"📋 <b>24 soatlik loglar</b>\n\n"
-            f"📄 Qatorlar: {len(filtered_lines)}\n"
-            f"❌ Xatoliklar: {error_count}\n"
-            f"⚠️ Ogohlantirishlar: {warn_count}\n"
-            f"📅 Vaqt: {cutoff.strftime('%H:%M')} → {datetime.now().strftime('%H:%M')}"
-        )
+            if not export.lines:
+                await call.message.answer(
+                    "Oxirgi 24 soatda log yozuvi topilmadi.",
+                    reply_markup=admin_panel
+                )
+                return
 
-        await call.message.answer_document(
-            document=doc,
-            caption=caption,
-            reply_markup=admin_panel,
-            parse_mode="HTML"
-        )
+            caption = (
+                f"📋 <b>24 soatlik loglar</b>\n\n"
+                f"📄 Qatorlar: {export.lines}\n"
+                f"❌ Xatoliklar: {export.errors}\n"
+                f"⚠️ Ogohlantirishlar: {export.warnings}\n"
+                f"📅 Vaqt: {cutoff.strftime('%H:%M')} → {datetime.now().strftime('%H:%M')}"
+            )
+            if export.truncated:
+                caption += f"\n✂️ Faqat oxirgi {export.raw_bytes // (1024 * 1024)} MB"
+
+            await call.message.answer_document(
+                document=FSInputFile(export.path, filename=filename),
+                caption=caption,
+                reply_markup=admin_panel,
+                parse_mode="HTML"
+            )
 
-        logger.info(f"Admin {user_id} downloaded 24h logs ({len(filtered_lines)} lines)")
+        logger.info(f"Admin {user_id} downloaded 24h logs ({export.lines} lines)")
     except Exception as e:
         logger.error(f"Error in download_logs: {e}", exc_info=True)
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
+async def _send_backup_file(call: CallbackQuery, path: str, caption: Optional[str], last: bool):
+    """Bitta backup faylni yuborish: kesh dagi file_id lar yoki limitga bo'lingan bo'laklar."""
+    name = os.path.basename(path)
+    # Avval yuborilgan bo'lsa — file_id bilan, diskdan o'qimasdan
+    file_ids = await asyncio.to_thread(get_cached_file_ids, path)
+    if file_ids:
+        documents = file_ids
+    else:
+        parts = await asyncio.to_thread(prepare_upload_parts, path)
+        documents = [FSInputFile(part) for part in parts]
+    if len(documents) > 1:
+        joined = name + ".gz" if name.endswith(".sql") else name
+        note = f"✂️ {name}: {len(documents)} bo'lak. Yig'ish: <code>cat {joined}.0* > {joined}</code>"
+        caption = f"{caption}\n{note}" if caption else note
+
+    sent_ids = []
+    for i, document in enumerate(documents):
+        final = i == len(documents) - 1
+        msg = await call.message.answer_document(
+            document=document,
+            caption=caption if final else None,
+            reply_markup=admin_panel if final and last else None,
+            parse_mode="HTML"
+        )
+        sent_ids.append(msg.document.file_id)
+    if not file_ids:
+        await asyncio.to_thread(cache_file_ids, path, sent_ids)
+
+
 async def download_backup(call: CallbackQuery):
-    """Oxirgi backup faylni yuklab olish."""
+    """Oxirgi to'liq backup va uning deltalarini yuklab olish (deltalar o'zi tiklanmaydi)."""
     try:
         user_id = call.from_user.id
 
@@ -239,49 +275,36 @@ async def download_backup(call: CallbackQuery):
 
         await call.answer("Backup tayyorlanmoqda...", show_alert=False)
 
-        backup_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backups")
+        backups = list_backups()
+        chain = latest_backup_chain()
 
-        if not os.path.exists(backup_dir):
-            await call.message.answer("Backup papkasi topilmadi.", reply_markup=admin_panel)
-            return
-
-        sql_files = sorted(
-            [f for f in os.listdir(backup_dir) if f.endswith(".sql")],
-            key=lambda f: os.path.getmtime(os.path.join(backup_dir, f)),
-            reverse=True
-        )
-
-        if not sql_files:
+        if not chain:
             await call.message.answer("Hech qanday backup topilmadi.", reply_markup=admin_panel)
             return
 
-        latest = sql_files[0]
-        latest_path = os.path.join(backup_dir, latest)
-        file_size = os.path.getsize(latest_path)
-        mod_time = datetime.fromtimestamp(os.path.getmtime(latest_path))
-
-        with open(latest_path, 'rb') as f:
-            content = f.read()
-
-        doc = BufferedInputFile(content, filename=latest)
+        names = [os.path.basename(path) for path in chain]
+        total_size = sum(os.path.getsize(path) for path in chain)
+        mod_time = datetime.fromtimestamp(os.path.getmtime(chain[-1]))
 
-        size_kb = file_size / 1024
+        size_kb = total_size / 1024
         caption = (
             f"💾 <b>Oxirgi backup</b>\n\n"
-            f"📄 Fayl: {latest}\n"
+            f"📄 To'liq: {names[0]}\n"
             f"📦 Hajmi: {size_kb:.1f} KB\n"
             f"📅 Yaratilgan: {mod_time.strftime('%Y-%m-%d %H:%M')}\n"
-            f"🗂 Jami backuplar: {len(sql_files)}/7"
+            f"🗂 Jami backuplar: {len(backups)}"
         )
+        if len(chain) > 1:
+            caption += (
+                f"\n➕ Deltalar: {len(chain) - 1} ta\n"
+                f"♻️ Tiklash: <code>python -m utils.restore {' '.join(names)}</code>"
+            )
 
-        await call.message.answer_document(
-            document=doc,
-            caption=caption,
-            reply_markup=admin_panel,
-            parse_mode="HTML"
-        )
+        for i, path in enumerate(chain):
+            last = i == len(chain) - 1
+            await _send_backup_file(call, path, caption if last else None, last)
 
-        logger.info(f"Admin {user_id} downloaded backup: {latest} ({size_kb:.1f} KB)")
+        logger.info(f"Admin {user_id} downloaded backup: {', '.join(names)} ({size_kb:.1f} KB)")
     except Exception as e:
         logger.error(f"Error in download_backup: {e}", exc_info=True)
         await call.answer("Xatolik yuz berdi", show_alert=True)
@@ -350,55 +373,37 @@ async def confirm_broadcast_handler(call: CallbackQuery, state: FSMContext, bot:
             await state.clear()
             return
 
-        users = await db.get_all_user_ids()
-
-        if not users:
-            await call.message.edit_text(
-                "Hech qanday foydalanuvchi topilmadi.",
-                reply_markup=admin_panel
-            )
-            await state.clear()
-            return
-
         await call.message.edit_text("Xabar yuborilmoqda...")
-
-        success_count = 0
-        failed_count = 0
-
-        for user in users:
-            try:
-                await bot.copy_message(
-                    chat_id=user[0],
-                    from_chat_id=chat_id,
-                    message_id=message_id
-                )
-                success_count += 1
-            except Exception as e:
-                logger.warning(f"Failed to send to user {user[0]}: {e}")
-                failed_count += 1
-            await asyncio.sleep(0.05)  # Telegram rate limit himoyasi
-
-        result_text = (
-            "<b>Reklama yuborildi!</b>\n\n"
-            f"Muvaffaqiyatli: <b>{success_count}</b>\n"
-            f"Muvaffaqiyatsiz: <b>{failed_count}</b>\n"
-            f"Jami: <b>{len(users)}</b>"
-        )
-
-        await call.message.edit_text(
-            result_text,
-            reply_markup=admin_panel,
-            parse_mode="HTML"
-        )
         await state.clear()
 
-        logger.info(f"Broadcast completed: {success_count} success, {failed_count} failed")
+        # Yuborish fon vazifasida; shu xabar progress bilan yangilanib turadi
+        broadcast_id = await broadcast_engine.start(
+            bot, admin_id=user_id, from_chat_id=chat_id, message_id=message_id,
+            progress_chat_id=call.message.chat.id, progress_message_id=call.message.message_id,
+        )
+        logger.info(f"Broadcast #{broadcast_id} queued by admin {user_id}")
     except Exception as e:
         logger.error(f"Error in confirm_broadcast_handler: {e}", exc_info=True)
         await call.answer("Xatolik yuz berdi", show_alert=True)
         await state.clear()
 
 
+async def stop_broadcast_handler(call: CallbackQuery):
+    try:
+        if not await db.is_superadmin(call.from_user.id):
+            await call.answer("Sizda admin huquqi yo'q", show_alert=True)
+            return
+
+        broadcast_id = int(call.data.split(":")[1])
+        if broadcast_engine.cancel(broadcast_id):
+            await call.answer("To'xtatilmoqda...", show_alert=False)
+        else:
+            await call.answer("Bu reklama allaqachon tugagan", show_alert=True)
+    except Exception as e:
+        logger.error(f"Error in stop_broadcast_handler: {e}", exc_info=True)
+        await call.answer("Xatolik yuz berdi", show_alert=True)
+
+
 async def cancel_broadcast_handler(call: CallbackQuery, state: FSMContext):
     try:
         await call.message.edit_text(
@@ -5,12 +5,13 @@ from aiogram.fsm.context import FSMContext
 from functions import channel, premium_channel
 from keyboards.inline import premium_buy, premium_back
 from utils.database import db
+from middlewares.user_context import UserContext
 from config import STICKERS, MESSAGES, WEEKLY_PRICE, DAY15_PRICE, MONTHLY_PRICE
 
 logger = logging.getLogger(__name__)
 
 
-async def chanelling(callback: CallbackQuery, state: FSMContext):
+async def chanelling(callback: CallbackQuery, state: FSMContext, user_ctx: UserContext = None):
     try:
         try:
             await callback.message.delete()
@@ -18,11 +19,12 @@ async def chanelling(callback: CallbackQuery, state: FSMContext):
             pass
 
         user_id = callback.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
 
-        if await db.is_premium_user(user_id):
-            await premium_channel.requesting_id(callback, state)
+        if await user_ctx.is_premium():
+            await premium_channel.requesting_id(callback, state, user_ctx)
         else:
-            await channel.requesting_id(callback, state)
+            await channel.requesting_id(callback, state, user_ctx)
     except Exception as e:
         logger.error(f"Error in chanelling callback: {e}", exc_info=True)
         await callback.answer("Xatolik yuz berdi", show_alert=True)
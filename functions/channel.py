@@ -7,6 +7,7 @@ from states import Channel
 from keyboards.inline import make_bot_admin, make_bot_admin_back, back_to_main, admin_confirm
 from keyboards.reply import channel_button
 from utils.database import db
+from middlewares.user_context import UserContext
 from utils.validators import validate_time_format, validate_word_count
 from utils.helpers import get_post_number_from_text
 from utils.message_utils import safe_delete, send_prompt, send_final, send_error
@@ -28,13 +29,14 @@ async def requesting_id_again(call: CallbackQuery, state: FSMContext):
         logger.error(f"Error in requesting_id_again: {e}", exc_info=True)
 
 
-async def requesting_id(call: CallbackQuery, state: FSMContext):
+async def requesting_id(call: CallbackQuery, state: FSMContext, user_ctx: UserContext = None):
     try:
         user_id = call.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
 
         await safe_delete(call.message)
 
-        channel_count = await db.count_user_channels(user_id, premium=False)
+        channel_count = await user_ctx.channel_count(premium=False)
         if channel_count >= MAX_CHANNELS_FREE:
             await send_error(
                 call,
@@ -76,7 +78,8 @@ async def getting_id(message: Message, state: FSMContext):
         channel_id = message.forward_from_chat.id
         user_id = message.from_user.id
 
-        await state.update_data(channel_id=channel_id)
+        # Nom bazaga yoziladi — kanal ro'yxati get_chat siz chiziladi
+        await state.update_data(channel_id=channel_id, channel_title=message.forward_from_chat.title)
 
         if await db.channel_exists(channel_id, premium=False):
             await send_error(
@@ -126,7 +129,7 @@ async def admin_confirm_yes(call: CallbackQuery, state: FSMContext, bot: Bot):
                     await state.clear()
                     return
 
-                await db.add_channel(channel_id, user_id, premium=False)
+                await db.add_channel(channel_id, user_id, premium=False, title=data.get("channel_title"))
 
                 # "Admin qilingizmi?" xabarini o'chirish + prompt
                 await send_prompt(
@@ -158,7 +161,7 @@ async def admin_confirm_no(call: CallbackQuery, state: FSMContext):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def select_post_number(message: Message, state: FSMContext):
+async def select_post_number(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         # Foydalanuvchi "1 marta" matnini o'chirish
         await safe_delete(message)
@@ -173,14 +176,13 @@ async def select_post_number(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         data = await state.get_data()
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=False)
-            if channels:
-                channel_id = channels[0][1]
-            else:
+            channel_id = await user_ctx.first_channel_id(premium=False)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=back_to_main)
                 await state.clear()
                 return
@@ -199,7 +201,7 @@ async def select_post_number(message: Message, state: FSMContext):
         await state.clear()
 
 
-async def insert_time(message: Message, state: FSMContext):
+async def insert_time(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         # Foydalanuvchi kiritgan vaqtni o'chirish
         await safe_delete(message)
@@ -223,13 +225,12 @@ async def insert_time(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=False)
-            if channels:
-                channel_id = channels[0][1]
-            else:
+            channel_id = await user_ctx.first_channel_id(premium=False)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=back_to_main)
                 await state.clear()
                 return
@@ -247,7 +248,7 @@ async def insert_time(message: Message, state: FSMContext):
         await state.clear()
 
 
-async def insert_theme(message: Message, state: FSMContext):
+async def insert_theme(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         # Foydalanuvchi kiritgan mavzuni o'chirish
         await safe_delete(message)
@@ -273,13 +274,12 @@ async def insert_theme(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=False)
-            if channels:
-                channel_id = channels[0][1]
-            else:
+            channel_id = await user_ctx.first_channel_id(premium=False)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=back_to_main)
                 await state.clear()
                 return
@@ -290,6 +290,7 @@ async def insert_theme(message: Message, state: FSMContext):
         await state.update_data(**{f"post{current_post}_theme": theme_value, "channel_id": channel_id})
 
         await db.update_channel_post(channel_id, current_post, time_value, theme_value, premium=False, skip_24h_check=True)
+        user_ctx.invalidate()
 
         if current_post < post_count:
             await state.update_data(current_post=current_post + 1, channel_id=channel_id)
@@ -7,6 +7,8 @@ from aiogram import Bot
 from states import DeleteChannel, EditChannelPost
 from keyboards.inline import back_to_main, p_back_to_main
 from utils.database import db
+from services.channel_titles import channel_titles
+from middlewares.user_context import UserContext
 from utils.validators import validate_time_format
 
 logger = logging.getLogger(__name__)
@@ -34,17 +36,12 @@ async def _check_referral_activation(user_id: int, user_name: str, bot: Bot):
 
 async def create_channels_list_keyboard(channels, action_prefix, bot: Bot = None):
     keyboard = []
+    titles = await channel_titles.titles(bot, channels[0][0], premium=action_prefix == "p") if channels else {}
 
     for channel in channels:
         channel_id = channel[1]
 
-        channel_name = f"Kanal {channel_id}"
-        if bot:
-            try:
-                chat = await bot.get_chat(channel_id)
-                channel_name = chat.title or channel_name
-            except Exception:
-                pass
+        channel_name = titles.get(channel_id) or f"Kanal {channel_id}"
 
         if len(channel_name) > 20:
             channel_name = channel_name[:17] + "..."
@@ -100,13 +97,14 @@ def create_posts_list_keyboard(posts, channel_id, action_type, is_premium):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-async def show_channels_list(call: CallbackQuery, bot: Bot = None):
+async def show_channels_list(call: CallbackQuery, bot: Bot = None, user_ctx: UserContext = None):
     try:
         user_id = call.from_user.id
 
-        is_premium = await db.is_premium_user(user_id)
+        user_ctx = user_ctx or UserContext(user_id)
+        is_premium = await user_ctx.is_premium()
 
-        channels = await db.get_user_channels(user_id, premium=is_premium)
+        channels = await user_ctx.channels(premium=is_premium)
 
         if not channels:
             await call.message.edit_text(
@@ -129,12 +127,13 @@ async def show_channels_list(call: CallbackQuery, bot: Bot = None):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def show_channels_for_add_post(call: CallbackQuery, bot: Bot = None):
+async def show_channels_for_add_post(call: CallbackQuery, bot: Bot = None, user_ctx: UserContext = None):
     try:
         user_id = call.from_user.id
-        is_premium = await db.is_premium_user(user_id)
+        user_ctx = user_ctx or UserContext(user_id)
+        is_premium = await user_ctx.is_premium()
 
-        channels = await db.get_user_channels(user_id, premium=is_premium)
+        channels = await user_ctx.channels(premium=is_premium)
 
         if not channels:
             back_kb = p_back_to_main if is_premium else back_to_main
@@ -149,15 +148,11 @@ async def show_channels_for_add_post(call: CallbackQuery, bot: Bot = None):
         prefix = "p" if is_premium else "f"
         keyboard = []
 
+        titles = await channel_titles.titles(bot, user_id, premium=is_premium)
+
         for ch in channels:
             channel_id = ch[1]
-            channel_name = f"ID: {channel_id}"
-            if bot:
-                try:
-                    chat = await bot.get_chat(channel_id)
-                    channel_name = chat.title or channel_name
-                except Exception:
-                    pass
+            channel_name = titles.get(channel_id) or f"ID: {channel_id}"
 
             keyboard.append([
                 InlineKeyboardButton(
@@ -180,13 +175,14 @@ async def show_channels_for_add_post(call: CallbackQuery, bot: Bot = None):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def show_channels_list_cmd(message: Message, bot: Bot = None):
+async def show_channels_list_cmd(message: Message, bot: Bot = None, user_ctx: UserContext = None):
     try:
         user_id = message.from_user.id
 
-        is_premium = await db.is_premium_user(user_id)
+        user_ctx = user_ctx or UserContext(user_id)
+        is_premium = await user_ctx.is_premium()
 
-        channels = await db.get_user_channels(user_id, premium=is_premium)
+        channels = await user_ctx.channels(premium=is_premium)
 
         if not channels:
             await message.answer(
@@ -570,7 +566,7 @@ async def cancel_delete_post(call: CallbackQuery, state: FSMContext):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def add_post_start(call: CallbackQuery, state: FSMContext):
+async def add_post_start(call: CallbackQuery, state: FSMContext, user_ctx: UserContext = None):
     from config import MAX_POSTS_FREE, MAX_POSTS_PREMIUM
 
     try:
@@ -580,8 +576,9 @@ async def add_post_start(call: CallbackQuery, state: FSMContext):
 
         logger.info(f"add_post_start: channel_id={channel_id}, is_premium={is_premium}")
 
+        user_ctx = user_ctx or UserContext(call.from_user.id)
         max_posts = MAX_POSTS_PREMIUM if is_premium else MAX_POSTS_FREE
-        current_posts = await db.get_channel_posts(channel_id, premium=is_premium)
+        current_posts = await user_ctx.channel_posts(channel_id, premium=is_premium)
         logger.info(f"add_post_start: current_posts={len(current_posts)}, max_posts={max_posts}")
 
         if len(current_posts) >= max_posts:
@@ -592,7 +589,7 @@ async def add_post_start(call: CallbackQuery, state: FSMContext):
             )
             return
 
-        next_post_num = await db.get_next_available_post_num(channel_id, premium=is_premium)
+        next_post_num = await user_ctx.next_post_num(channel_id, premium=is_premium)
 
         if next_post_num is None or next_post_num > max_posts:
             await call.answer("Bo'sh slot topilmadi!", show_alert=True)
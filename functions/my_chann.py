@@ -8,6 +8,7 @@ from aiogram.exceptions import TelegramBadRequest
 
 from states import ChangeTimeState, ChangeThemeState, ChangeTimePremiumState, ChangeThemePremiumState
 from utils.database import db
+from middlewares.user_context import UserContext
 from utils.validators import validate_time_format, validate_word_count
 from config import MAX_THEME_WORDS_FREE, MAX_THEME_WORDS_PREMIUM
 from keyboards.inline import back_to_main
@@ -27,16 +28,16 @@ async def _safe_delete(message) -> bool:
         return False
 
 
-async def _build_channel_keyboard(channel_id: int, is_premium: bool = False):
+def _build_channel_keyboard(channel_data, is_premium: bool = False):
     keyboard = []
     prefix = "change_time_premium" if is_premium else "change_time"
     theme_prefix = "change_theme_premium" if is_premium else "change_theme"
 
     max_posts = 15 if is_premium else 3
-    channel_data = await db.get_channel_by_id(channel_id, premium=is_premium)
 
     if not channel_data:
         return None
+    channel_id = channel_data[1]
 
     posts_found = []
     for i in range(1, max_posts + 1):
@@ -99,22 +100,23 @@ def _format_channel_info(channel_data, is_premium: bool = False) -> str:
     return response
 
 
-async def is_premium(call: CallbackQuery):
-    if await db.is_premium_user(call.from_user.id):
-        await premium_channel_list(call.message)
+async def is_premium(call: CallbackQuery, user_ctx: UserContext = None):
+    user_ctx = user_ctx or UserContext(call.from_user.id)
+    if await user_ctx.is_premium():
+        await premium_channel_list(call.message, user_ctx)
     else:
-        await channel_list(call.message)
+        await channel_list(call.message, user_ctx)
 
 
-async def premium_channel_list(message: Message):
+async def premium_channel_list(message: Message, user_ctx: UserContext = None):
     user_id = message.from_user.id
-    channels = await db.get_user_channels(user_id, premium=True)
+    user_ctx = user_ctx or UserContext(user_id)
+    channels = await user_ctx.channels(premium=True)
 
     if channels:
         for channel in channels:
-            channel_id = channel[1]
             response = _format_channel_info(channel, is_premium=True)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=True)
+            keyboard = _build_channel_keyboard(channel, is_premium=True)
 
             if keyboard:
                 await message.answer(response, reply_markup=keyboard, parse_mode="HTML")
@@ -127,15 +129,15 @@ async def premium_channel_list(message: Message):
         )
 
 
-async def channel_list(message: Message):
+async def channel_list(message: Message, user_ctx: UserContext = None):
     user_id = message.from_user.id
-    channels = await db.get_user_channels(user_id, premium=False)
+    user_ctx = user_ctx or UserContext(user_id)
+    channels = await user_ctx.channels(premium=False)
 
     if channels:
         for channel in channels:
-            channel_id = channel[1]
             response = _format_channel_info(channel, is_premium=False)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=False)
+            keyboard = _build_channel_keyboard(channel, is_premium=False)
 
             if keyboard:
                 await message.answer(response, reply_markup=keyboard, parse_mode="HTML")
@@ -208,7 +210,7 @@ async def process_new_time(message: Message, state: FSMContext):
         channel = await db.get_channel_by_id(channel_id, premium=False)
         if channel:
             response = _format_channel_info(channel, is_premium=False)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=False)
+            keyboard = _build_channel_keyboard(channel, is_premium=False)
             await message.answer(
                 f"Vaqt muvaffaqiyatli o'zgartirildi!\n\n{response}",
                 reply_markup=keyboard,
@@ -280,7 +282,7 @@ async def process_new_theme(message: Message, state: FSMContext):
         channel = await db.get_channel_by_id(channel_id, premium=False)
         if channel:
             response = _format_channel_info(channel, is_premium=False)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=False)
+            keyboard = _build_channel_keyboard(channel, is_premium=False)
             await message.answer(
                 f"Mavzu muvaffaqiyatli o'zgartirildi!\n\n{response}",
                 reply_markup=keyboard,
@@ -360,7 +362,7 @@ async def process_new_premium_time(message: Message, state: FSMContext):
         channel = await db.get_channel_by_id(channel_id, premium=True)
         if channel:
             response = _format_channel_info(channel, is_premium=True)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=True)
+            keyboard = _build_channel_keyboard(channel, is_premium=True)
             await message.answer(
                 f"Vaqt muvaffaqiyatli o'zgartirildi!\n\n{response}",
                 reply_markup=keyboard,
@@ -432,7 +434,7 @@ async def process_new_premium_theme(message: Message, state: FSMContext):
         channel = await db.get_channel_by_id(channel_id, premium=True)
         if channel:
             response = _format_channel_info(channel, is_premium=True)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=True)
+            keyboard = _build_channel_keyboard(channel, is_premium=True)
             await message.answer(
                 f"Mavzu muvaffaqiyatli o'zgartirildi!\n\n{response}",
                 reply_markup=keyboard,
@@ -481,7 +483,7 @@ async def toggle_image_premium(call: CallbackQuery):
         channel = await db.get_channel_by_id(channel_id, premium=True)
         if channel:
             response = _format_channel_info(channel, is_premium=True)
-            keyboard = await _build_channel_keyboard(channel_id, is_premium=True)
+            keyboard = _build_channel_keyboard(channel, is_premium=True)
 
             status_text = "yoqildi" if new_status == 'yes' else "o'chirildi"
             await call.message.answer(
@@ -8,6 +8,7 @@ from states import PremiumChannel
 from keyboards.inline import p_make_bot_admin, p_make_bot_admin_back, p_back_to_main, premium_admin_confirm, premium_image_toggle
 from keyboards.reply import premium_channel_button
 from utils.database import db
+from middlewares.user_context import UserContext
 from utils.validators import validate_time_format, validate_word_count
 from utils.helpers import get_post_number_from_text
 from utils.message_utils import safe_delete, send_prompt, send_final, send_error
@@ -29,13 +30,14 @@ async def requesting_id_again(call: CallbackQuery, state: FSMContext):
         logger.error(f"Error in requesting_id_again: {e}", exc_info=True)
 
 
-async def requesting_id(call: CallbackQuery, state: FSMContext):
+async def requesting_id(call: CallbackQuery, state: FSMContext, user_ctx: UserContext = None):
     try:
         user_id = call.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
 
         await safe_delete(call.message)
 
-        channel_count = await db.count_user_channels(user_id, premium=True)
+        channel_count = await user_ctx.channel_count(premium=True)
         if channel_count >= MAX_CHANNELS_PREMIUM:
             await send_error(
                 call,
@@ -75,7 +77,8 @@ async def getting_id(message: Message, state: FSMContext):
         channel_id = message.forward_from_chat.id
         user_id = message.from_user.id
 
-        await state.update_data(channel_id=channel_id)
+        # Nom bazaga yoziladi — kanal ro'yxati get_chat siz chiziladi
+        await state.update_data(channel_id=channel_id, channel_title=message.forward_from_chat.title)
 
         if await db.channel_exists(channel_id, premium=True):
             await send_error(
@@ -124,7 +127,7 @@ async def premium_admin_confirm_yes(call: CallbackQuery, state: FSMContext, bot:
                     await state.clear()
                     return
 
-                await db.add_channel(channel_id, user_id, premium=True)
+                await db.add_channel(channel_id, user_id, premium=True, title=data.get("channel_title"))
 
                 success_message = (
                     "KANAL QO'SHILDI!\n\n"
@@ -164,7 +167,7 @@ async def premium_admin_confirm_no(call: CallbackQuery, state: FSMContext):
         await call.answer("Xatolik yuz berdi", show_alert=True)
 
 
-async def select_post_number(message: Message, state: FSMContext):
+async def select_post_number(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         await safe_delete(message)
 
@@ -178,14 +181,13 @@ async def select_post_number(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         data = await state.get_data()
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=True)
-            if channels:
-                channel_id = channels[-1][1]
-            else:
+            channel_id = await user_ctx.last_channel_id(premium=True)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=p_back_to_main)
                 await state.clear()
                 return
@@ -203,7 +205,7 @@ async def select_post_number(message: Message, state: FSMContext):
         await state.clear()
 
 
-async def insert_time(message: Message, state: FSMContext):
+async def insert_time(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         await safe_delete(message)
 
@@ -225,13 +227,12 @@ async def insert_time(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=True)
-            if channels:
-                channel_id = channels[-1][1]
-            else:
+            channel_id = await user_ctx.last_channel_id(premium=True)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=p_back_to_main)
                 await state.clear()
                 return
@@ -248,7 +249,7 @@ async def insert_time(message: Message, state: FSMContext):
         await state.clear()
 
 
-async def insert_theme(message: Message, state: FSMContext):
+async def insert_theme(message: Message, state: FSMContext, user_ctx: UserContext = None):
     try:
         await safe_delete(message)
 
@@ -273,13 +274,12 @@ async def insert_theme(message: Message, state: FSMContext):
             return
 
         user_id = message.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=True)
-            if channels:
-                channel_id = channels[-1][1]
-            else:
+            channel_id = await user_ctx.last_channel_id(premium=True)
+            if not channel_id:
                 await send_error(message, "Xatolik: Kanal topilmadi", reply_markup=p_back_to_main)
                 await state.clear()
                 return
@@ -300,6 +300,7 @@ async def insert_theme(message: Message, state: FSMContext):
             await state.set_state(PremiumChannel.IMAGE_TOGGLE)
         else:
             await db.update_channel_post(channel_id, current_post, time_value, theme_value, premium=True, with_image='no', skip_24h_check=True)
+            user_ctx.invalidate()
 
             if current_post < post_count:
                 await state.update_data(current_post=current_post + 1, channel_id=channel_id)
@@ -323,7 +324,7 @@ async def insert_theme(message: Message, state: FSMContext):
         await state.clear()
 
 
-async def handle_premium_image_toggle(call: CallbackQuery, state: FSMContext):
+async def handle_premium_image_toggle(call: CallbackQuery, state: FSMContext, user_ctx: UserContext = None):
     try:
         await safe_delete(call.message)
 
@@ -331,14 +332,13 @@ async def handle_premium_image_toggle(call: CallbackQuery, state: FSMContext):
         current_post = data.get("current_post", 1)
         post_count = data.get("post_count", 1)
         user_id = call.from_user.id
+        user_ctx = user_ctx or UserContext(user_id)
 
         channel_id = data.get('channel_id')
 
         if not channel_id:
-            channels = await db.get_user_channels(user_id, premium=True)
-            if channels:
-                channel_id = channels[-1][1]
-            else:
+            channel_id = await user_ctx.last_channel_id(premium=True)
+            if not channel_id:
                 await send_error(call, "Xatolik: Kanal topilmadi", reply_markup=p_back_to_main)
                 await state.clear()
                 return
@@ -358,6 +358,7 @@ async def handle_premium_image_toggle(call: CallbackQuery, state: FSMContext):
         await state.update_data(**{f"post{current_post}_has_image": has_image})
 
         await db.update_channel_post(channel_id, current_post, time_value, theme_value, premium=True, with_image=has_image, skip_24h_check=True)
+        user_ctx.invalidate()
         logger.info(f"handle_premium_image_toggle: Post saved successfully!")
 
         if current_post < post_count:
@@ -6,7 +6,8 @@ from aiogram import Bot
 
 from states import Payment, RejectReason
 from keyboards.inline import non_premium, premium, cheque_check, premium_buy
-from utils.database import db
+from utils.database import db, TZ
+from services.premium_expiry import premium_expiry
 from utils.helpers import format_payment_message, extract_user_id_from_caption
 from config import (
     MESSAGES, CARD_NUMBER, CARD_NAME, CARD_SURNAME,
@@ -241,19 +242,14 @@ async def approving(call: CallbackQuery):
             premium_type = "monthly"
             days = 30
 
-        start_date = datetime.now()
+        start_date = datetime.now(TZ)
         end_date = start_date + timedelta(days=days) if days > 0 else start_date + timedelta(days=30)
 
-        await db.update_user_subscription(
-            user_id,
-            subscription=True,
-            premium_type=premium_type or "unknown"
-        )
-
-        await db.execute_query(
-            "UPDATE users SET start_date = ?, end_date = ? WHERE id = ?",
-            (start_date, end_date, user_id)
-        )
+        if not await db.activate_subscription(user_id, premium_type or "unknown", start_date, end_date):
+            logger.error(f"approving: user {user_id} not found in users table")
+            await call.answer("Xatolik: Foydalanuvchi topilmadi", show_alert=True)
+            return
+        premium_expiry.schedule(user_id, end_date)
 
         await call.message.delete()
         await call.message.answer(f"Obuna tasdiqlandi! ({premium_type}, {days} kun)")
@@ -9,6 +9,8 @@ from aiogram.types import CallbackQuery, FSInputFile, Message
 from aiogram import Bot
 
 from utils.database import db
+from services.premium_expiry import premium_expiry
+from services.reachability import reachability
 from keyboards.inline import build_ramadan_gift_kb, referral_back
 from config import (
     REFERRAL_TIER1_COUNT, REFERRAL_TIER1_DAYS,
@@ -28,6 +30,17 @@ TIERS = [
 ]
 
 
+async def _send_to_referrer(bot: Bot, referrer_id: int, text: str):
+    """Referrerga xabar. Botni bloklagan bo'lsa yuborilmaydi, yangi bloklash belgilanadi."""
+    if not await db.filter_reachable_users([referrer_id]):
+        return
+    try:
+        await bot.send_message(chat_id=referrer_id, text=text, parse_mode='HTML')
+    except Exception as e:
+        if not await reachability.user_failed(referrer_id, e):
+            raise
+
+
 def _get_current_tier(activated_count: int) -> tuple | None:
     """Faol referrallar soniga qarab hozirgi tier qaytaradi: (count, days, label) yoki None."""
     for count, days, label in TIERS:
@@ -243,18 +256,15 @@ async def check_and_award_premium(referrer_id: int, bot: Bot):
                     base = now
 
             new_end = base + timedelta(days=tier_days)
-            await db.execute_query(
-                "UPDATE users SET end_date = ? WHERE id = ?",
-                (new_end.isoformat(), referrer_id)
-            )
-
-            await bot.send_message(
-                chat_id=referrer_id,
-                text=f"🎉 <b>Tabriklaymiz!</b>\n\n"
-                     f"Siz {activated} ta do'st taklif qildingiz!\n"
-                     f"Premium obunangiz <b>{tier_label}</b> ga uzaytirildi.\n"
-                     f"Yangi tugash sanasi: <b>{new_end.strftime('%Y-%m-%d')}</b>",
-                parse_mode='HTML'
+            if await db.extend_subscription(referrer_id, new_end):
+                premium_expiry.schedule(referrer_id, new_end)
+
+            await _send_to_referrer(
+                bot, referrer_id,
+                f"🎉 <b>Tabriklaymiz!</b>\n\n"
+                f"Siz {activated} ta do'st taklif qildingiz!\n"
+                f"Premium obunangiz <b>{tier_label}</b> ga uzaytirildi.\n"
+                f"Yangi tugash sanasi: <b>{new_end.strftime('%Y-%m-%d')}</b>"
             )
         else:
             # Premium yo'q yoki referral premium — yangi/yangilash
@@ -282,15 +292,8 @@ async def check_and_award_premium(referrer_id: int, bot: Bot):
 
             new_end = base + timedelta(days=tier_days)
 
-            await db.update_user_subscription(referrer_id, subscription=True, premium_type="referral")
-            await db.execute_query(
-                "UPDATE users SET start_date = ?, end_date = ? WHERE id = ?",
-                (new_start.isoformat(), new_end.isoformat(), referrer_id)
-            )
-
-            # Cache yangilash
-            if referrer_id in db._premium_cache:
-                del db._premium_cache[referrer_id]
+            if await db.activate_subscription(referrer_id, "referral", new_start, new_end):
+                premium_expiry.schedule(referrer_id, new_end)
 
             if not is_premium:
                 msg = (
@@ -308,11 +311,7 @@ async def check_and_award_premium(referrer_id: int, bot: Bot):
                     f"Tugash sanasi: <b>{new_end.strftime('%Y-%m-%d')}</b>"
                 )
 
-            await bot.send_message(
-                chat_id=referrer_id,
-                text=msg,
-                parse_mode='HTML'
-            )
+            await _send_to_referrer(bot, referrer_id, msg)
 
         logger.info(f"Referral award: user={referrer_id}, tier={tier_label}, activated={activated}")
 
@@ -323,11 +322,10 @@ async def check_and_award_premium(referrer_id: int, bot: Bot):
 async def notify_referrer_joined(referrer_id: int, new_user_name: str, bot: Bot):
     """Do'st botga qo'shilganda referrerga xabar."""
     try:
-        await bot.send_message(
-            chat_id=referrer_id,
-            text=f"👤 <b>{new_user_name}</b> sizning havolangiz orqali botga qo'shildi!\n\n"
-                 f"Mukofot olish uchun u kanal biriktirib, kamida 1 ta post qo'shishi kerak.",
-            parse_mode='HTML'
+        await _send_to_referrer(
+            bot, referrer_id,
+            f"👤 <b>{new_user_name}</b> sizning havolangiz orqali botga qo'shildi!\n\n"
+            f"Mukofot olish uchun u kanal biriktirib, kamida 1 ta post qo'shishi kerak."
         )
     except Exception as e:
         logger.warning(f"Failed to notify referrer {referrer_id}: {e}")
@@ -350,11 +348,7 @@ async def notify_referrer_activated(referrer_id: int, new_user_name: str, bot: B
         else:
             text += "🎉 Siz eng yuqori bosqichga yetdingiz!"
 
-        await bot.send_message(
-            chat_id=referrer_id,
-            text=text,
-            parse_mode='HTML'
-        )
+        await _send_to_referrer(bot, referrer_id, text)
     except Exception as e:
         logger.warning(f"Failed to notify referrer activated {referrer_id}: {e}")
 
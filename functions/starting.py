@@ -4,6 +4,7 @@ from zoneinfo import ZoneInfo
 from aiogram.types import Message, CallbackQuery
 
 from utils.database import db
+from utils.security import sanitize_referrer_id
 from keyboards.inline import non_premium, premium, superadmin_main, superadmin_premium_main
 from config import STICKERS, MESSAGES, WEEKLY_PRICE, DAY15_PRICE, MONTHLY_PRICE
 
@@ -13,7 +14,10 @@ TZ = ZoneInfo("Asia/Tashkent")
 
 async def _get_premium_info_text(user_id: int) -> str:
     """Premium foydalanuvchi uchun obuna ma'lumotlari."""
-    info = await db.get_user_premium_info(user_id)
+    return _format_premium_info(await db.get_user_premium_info(user_id))
+
+
+def _format_premium_info(info: tuple | None) -> str:
     if not info:
         return ""
 
@@ -85,20 +89,16 @@ async def greating(event: Message | CallbackQuery):
             logger.info(f"Superadmin {user_id} accessed the bot")
             return
 
-        if not await db.user_exists(user_id):
-            await db.add_user(user_id, subscription=False)
-
-            # Referral deep link tekshirish
-            if referral_arg:
-                try:
-                    referrer_id = int(referral_arg.replace("ref_", ""))
-                    if referrer_id != user_id and await db.user_exists(referrer_id):
-                        await db.add_referral(referrer_id, user_id)
-                        from functions.referral import notify_referrer_joined
-                        await notify_referrer_joined(referrer_id, full_name, event.bot)
-                        logger.info(f"Referral: {user_id} invited by {referrer_id}")
-                except (ValueError, TypeError):
-                    pass
+        referrer_id = sanitize_referrer_id(referral_arg) if referral_arg else None
+
+        # Ro'yxatdan o'tkazish + referral bitta so'rovda
+        registration = await db.register_user(user_id, referrer_id)
+
+        if registration['is_new']:
+            if registration['referrer_id']:
+                from functions.referral import notify_referrer_joined
+                await notify_referrer_joined(registration['referrer_id'], full_name, event.bot)
+                logger.info(f"Referral: {user_id} invited by {registration['referrer_id']}")
 
             welcome_text = (
                 f"<b>Xush kelibsiz!</b>\n\n"
@@ -118,8 +118,8 @@ async def greating(event: Message | CallbackQuery):
             )
             logger.info(f"New user registered: {user_id}")
         else:
-            if await db.is_premium_user(user_id):
-                premium_info = await _get_premium_info_text(user_id)
+            if registration['is_premium']:
+                premium_info = _format_premium_info(registration['premium_info'])
                 welcome_msg = MESSAGES["welcome_premium"].format(name=full_name)
                 if premium_info:
                     welcome_msg += f"\n{premium_info}"
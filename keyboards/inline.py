@@ -108,6 +108,7 @@ admin_panel = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text='🔗 Referal', callback_data='admin_referral')],
     [InlineKeyboardButton(text='📋 24h Loglar', callback_data='admin_logs')],
     [InlineKeyboardButton(text='💾 Backuplar', callback_data='admin_backups')],
+    [InlineKeyboardButton(text='🗄 DB metrikalar', callback_data='admin_db_metrics')],
     [InlineKeyboardButton(text='⚙️ Bot sozlamalari', callback_data='admin_settings')],
     [InlineKeyboardButton(text='◀️ Orqaga', callback_data='back')]
 ])
@@ -188,3 +189,10 @@ def build_channels_keyboard(channels, is_premium: bool):
     keyboard.append([InlineKeyboardButton(text='🏠 Bosh menyu', callback_data=back_data)])
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_broadcast_progress_kb(broadcast_id: int):
+    """Davom etayotgan broadcastni to'xtatish tugmasi."""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⛔ To'xtatish", callback_data=f"broadcast_stop:{broadcast_id}")]
+    ])
@@ -1,8 +1,17 @@
 from __future__ import annotations
+import atexit
+import itertools
+import json
 import logging
 import logging.handlers
 import os
-from typing import Optional
+import queue
+from typing import Dict, Optional
+
+try:
+    import orjson  # ixtiyoriy: tezroq JSON (pip install orjson)
+except ImportError:
+    orjson = None
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -11,15 +20,32 @@ LOG_DIR = os.getenv("LOG_DIR", "logs")
 LOG_FILE = os.getenv("LOG_FILE", "bot.log")
 MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(2 * 1024 * 1024)))
 BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+# Handlerlar alohida threadda; navbat to'lsa INFO/DEBUG tashlab yuboriladi
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Har post uchun yoziladigan INFO lardan shu ulushi qoldiriladi (1.0 — hammasi)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLED_LOGGERS = tuple(
+    name.strip() for name in os.getenv(
+        "LOG_SAMPLED_LOGGERS", "services.post_scheduler,services.grok_service,services.image_service"
+    ).split(",") if name.strip()
+)
+# Navbat to'la bo'lsa WARNING+ shuncha kutadi, keyin u ham tashlanadi
+_BLOCKING_PUT_TIMEOUT = 0.1
 
 try:
     os.makedirs(LOG_DIR, exist_ok=True)
 except OSError:
     pass
 
+def _json_dumps(data: dict) -> str:
+    """Ikkala yo'lda bir xil ixcham qator (orjson bo'sh joy qo'ymaydi)."""
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
-        import json
         base = {
             "time": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S"),
             "level": record.levelname,
@@ -28,7 +54,75 @@ class JsonFormatter(logging.Formatter):
         }
         if record.exc_info:
             base["exception"] = self.formatException(record.exc_info)
-        return json.dumps(base, ensure_ascii=False)
+        return _json_dumps(base)
+
+
+class SamplingFilter(logging.Filter):
+    """Tanlangan loggerlarning INFO (va past) yozuvlaridan har N-chisini o'tkazish.
+
+    WARNING va undan yuqori har doim o'tadi. Hisoblagich deterministik — 0.1 da
+    aynan har 10-yozuv qoladi.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, loggers: tuple = LOG_SAMPLED_LOGGERS):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.loggers = frozenset(loggers)
+        self._counters: Dict[str, itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or record.name not in self.loggers or self.every == 1:
+            return True
+        if not self.every:
+            return False
+        counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % self.every == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Chegaralangan navbat: to'lganda event loop kutmaydi, yozuv tashlab yuboriladi.
+
+    Tashlanganlar soni navbatda joy ochilgach WARNING sifatida chiqadi.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._unreported:
+            self._report_dropped()
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=_BLOCKING_PUT_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+    def _report_dropped(self):
+        notice = logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            f"Log navbati to'lgan: {self._unreported} ta yozuv tashlab yuborildi", None, None,
+        )
+        try:
+            self.queue.put_nowait(notice)
+            self._unreported = 0
+        except queue.Full:
+            pass
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Navbatdagi yozuvlarni handlerlarga yetkazib, listener threadini to'xtatish."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def configure_logging(level: Optional[str] = None) -> None:
@@ -54,7 +148,18 @@ def configure_logging(level: Optional[str] = None) -> None:
     file_handler.setFormatter(formatter)
     file_handler.setLevel(lvl)
 
-    root.addHandler(stream_handler)
-    root.addHandler(file_handler)
+    # Disk/konsol I/O va rotatsiya listener threadida — event loop faqat navbatga qo'yadi
+    global _listener
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.setLevel(lvl)
+    if LOG_SAMPLE_RATE < 1.0:
+        queue_handler.addFilter(SamplingFilter())
+    _listener = logging.handlers.QueueListener(
+        queue_handler.queue, stream_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root.addHandler(queue_handler)
 
-__all__ = ["configure_logging"]
+__all__ = ["configure_logging", "stop_logging", "DroppingQueueHandler", "SamplingFilter", "JsonFormatter"]
@@ -1,3 +1,6 @@
+import time
+_PROCESS_STARTED = time.perf_counter()
+
 import logging
 import asyncio
 from datetime import datetime, timedelta
@@ -6,6 +9,7 @@ from aiogram import Bot, Dispatcher, F
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message, BotCommand
+from aiogram.methods import GetUpdates
 from aiogram.fsm.context import FSMContext
 
 from config import BOT_TOKEN, SUPER_ADMINS, ADMIN_GROUP_ID, TIMEZONE, LOG_LEVEL, LOG_FORMAT, MAX_POSTS_FREE, MAX_POSTS_PREMIUM
@@ -28,10 +32,18 @@ from states import (
     RejectReason
 )
 from utils.database import db
-from utils.backup import create_backup, cleanup_old_backups
+from middlewares.user_context import UserContextMiddleware
+from utils.backup import create_scheduled_backup, cleanup_old_backups
+from utils.stats_chart import render_stats_chart, shutdown_chart_pool
 from services.post_scheduler import PostScheduler
+from services.premium_expiry import premium_expiry
+from services.change_feed import change_feed
+from services.metrics_server import start_metrics_server
+from services.stats_snapshot import stats_snapshot
+from services.broadcast import broadcast_engine
+from services.channel_titles import channel_titles
+from utils.startup_timer import startup_timer
 
-configure_logging(LOG_LEVEL)
 logger = logging.getLogger("bot")
 
 
@@ -40,8 +52,17 @@ class BotManager:
         self.bot = Bot(token=BOT_TOKEN)
         self.dp = Dispatcher(storage=MemoryStorage())
         self.scheduler = None
+        self._metrics_runner = None
         self._stop_event = asyncio.Event()
         self._tz = ZoneInfo(TIMEZONE)
+        self.bot.session.middleware(self._first_poll_probe)
+
+    async def _first_poll_probe(self, make_request, bot, method):
+        """Birinchi getUpdates — bot update qabul qilishga tayyor (time-to-first-poll)."""
+        if startup_timer.first_poll is None and isinstance(method, GetUpdates):
+            startup_timer.mark_first_poll()
+            logger.info(startup_timer.report())
+        return await make_request(bot, method)
 
     async def _daily_tasks_loop(self):
         """Har kuni 00:00 da backup + statistika yozish."""
@@ -66,41 +87,19 @@ class BotManager:
 
                 # 1. Statistikani yozish
                 try:
-                    await db.record_daily_stats()
+                    snapshot = await stats_snapshot.get(refresh=True)
                     logger.info("Kunlik statistika yozildi")
+                    # Admin birinchi ochganda grafik keshdan chiqadi
+                    await render_stats_chart(snapshot.history)
                 except Exception as e:
                     logger.error(f"Kunlik statistika xatolik: {e}")
 
-                # 2. Muddati o'tgan premiumlarni tekshirish
-                try:
-                    expired_users = await db.get_expired_premium_users()
-                    for user in expired_users:
-                        user_id = user[0]
-                        await db.expire_user_premium(user_id)
-                        try:
-                            from keyboards.inline import premium_buy
-                            await self.bot.send_message(
-                                chat_id=user_id,
-                                text="⏰ <b>Premium obunangiz tugadi!</b>\n\n"
-                                     "Premium imkoniyatlardan foydalanishni davom ettirish uchun "
-                                     "obunani yangilang 👇",
-                                parse_mode="HTML",
-                                reply_markup=premium_buy
-                            )
-                        except Exception as notify_err:
-                            logger.warning(f"Premium expiry notify failed for {user_id}: {notify_err}")
-                    if expired_users:
-                        logger.info(f"Premium expired: {len(expired_users)} ta user o'chirildi")
-                except Exception as e:
-                    logger.error(f"Premium expiry check xatolik: {e}")
-
-                # 3. Backup yaratish
+                # 2. Backup yaratish
                 try:
-                    today_str = datetime.now(self._tz).strftime("%Y-%m-%d")
-                    backup_path = await create_backup(f"backup_{today_str}.sql")
+                    backup_path = await create_scheduled_backup()
                     if backup_path:
                         logger.info(f"Kunlik backup tayyor: {backup_path}")
-                    cleanup_old_backups(keep_last=7)
+                    cleanup_old_backups()
                 except Exception as e:
                     logger.error(f"Kunlik backup xatolik: {e}")
 
@@ -109,10 +108,11 @@ class BotManager:
                 await asyncio.sleep(60)
 
     async def on_startup(self, bot: Bot):
-        await db.initialize()
+        with startup_timer.phase("db.initialize"):
+            await db.initialize()
 
-        for admin_id in SUPER_ADMINS:
-            await db.add_superadmin(admin_id)
+            for admin_id in SUPER_ADMINS:
+                await db.add_superadmin(admin_id)
 
         commands = [
             BotCommand(command="start", description="Botni ishga tushirish"),
@@ -121,42 +121,36 @@ class BotManager:
             BotCommand(command="referral", description="Ramazon sovg'asi 🎁"),
             BotCommand(command="help", description="Yordam"),
         ]
-        await bot.set_my_commands(commands)
+        with startup_timer.phase("set_my_commands"):
+            await bot.set_my_commands(commands)
 
-        self.scheduler = PostScheduler(bot)
-        asyncio.create_task(self.scheduler.run(stop_event=self._stop_event))
+        with startup_timer.phase("services"):
+            self.scheduler = PostScheduler(bot)
+            asyncio.create_task(self.scheduler.run(stop_event=self._stop_event))
 
-        # Kunlik vazifalar loopini ishga tushirish (00:00 da backup + stats)
-        asyncio.create_task(self._daily_tasks_loop())
+            try:
+                self._metrics_runner = await start_metrics_server()
+            except OSError as e:
+                logger.warning(f"Metrics server failed to start: {e}")
 
-        # Boshlang'ich statistikani yozish
-        try:
-            await db.record_daily_stats()
-        except Exception as e:
-            logger.warning(f"Daily stats record failed: {e}")
+            # Boshqa jarayonlardagi o'zgarishlar bo'yicha keshni tozalash (LISTEN/NOTIFY)
+            asyncio.create_task(change_feed.run(stop_event=self._stop_event))
 
-        # Startup'da muddati o'tgan premiumlarni tekshirish
-        try:
-            from keyboards.inline import premium_buy
-            expired_users = await db.get_expired_premium_users()
-            for user in expired_users:
-                user_id = user[0]
-                await db.expire_user_premium(user_id)
-                try:
-                    await bot.send_message(
-                        chat_id=user_id,
-                        text="⏰ <b>Premium obunangiz tugadi!</b>\n\n"
-                             "Premium imkoniyatlardan foydalanishni davom ettirish uchun "
-                             "obunani yangilang 👇",
-                        parse_mode="HTML",
-                        reply_markup=premium_buy
-                    )
-                except Exception:
-                    pass
-            if expired_users:
-                logger.info(f"Startup: {len(expired_users)} ta expired premium o'chirildi")
-        except Exception as e:
-            logger.warning(f"Startup premium expiry check failed: {e}")
+            # Premium muddatlari: startda o'tib ketganlarni tozalaydi, keyin aniq vaqtida tugatadi
+            asyncio.create_task(premium_expiry.run(bot, stop_event=self._stop_event))
+
+            # Restartdan oldin tugamagan reklamalar
+            await broadcast_engine.resume(bot)
+
+            # Kunlik vazifalar loopini ishga tushirish (00:00 da backup + stats)
+            asyncio.create_task(self._daily_tasks_loop())
+
+        # Boshlang'ich statistikani yozish
+        with startup_timer.phase("record_daily_stats"):
+            try:
+                await db.record_daily_stats()
+            except Exception as e:
+                logger.warning(f"Daily stats record failed: {e}")
 
         try:
             await bot.send_message(chat_id=ADMIN_GROUP_ID, text="🚀 Bot va Post Scheduler ishga tushdi")
@@ -169,6 +163,12 @@ class BotManager:
             self._stop_event.set()
             self.scheduler.stop()
 
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+
+        await broadcast_engine.stop()
+        await channel_titles.stop()
+        shutdown_chart_pool()
         await db.close_all()
 
         try:
@@ -181,6 +181,10 @@ class BotManager:
         self.dp.startup.register(self.on_startup)
         self.dp.shutdown.register(self.on_shutdown)
 
+        # Har bir update uchun lazy user konteksti (user_ctx)
+        self.dp.message.middleware(UserContextMiddleware())
+        self.dp.callback_query.middleware(UserContextMiddleware())
+
         # Guruhda admin reply handler (texnik yordam + chek suhbat) — BIRINCHI
         async def handle_admin_group_reply(message: Message):
             await tech_support.handle_group_reply(message, self.bot, self.dp.storage)
@@ -228,8 +232,10 @@ class BotManager:
         self.dp.callback_query.register(admin_panel.request_broadcast_message, F.data == "admin_broadcast")
         self.dp.callback_query.register(admin_panel.confirm_broadcast_handler, F.data == "confirm_broadcast")
         self.dp.callback_query.register(admin_panel.cancel_broadcast_handler, F.data == "cancel_broadcast")
+        self.dp.callback_query.register(admin_panel.stop_broadcast_handler, F.data.startswith("broadcast_stop:"))
         self.dp.callback_query.register(admin_panel.download_logs, F.data == "admin_logs")
         self.dp.callback_query.register(admin_panel.download_backup, F.data == "admin_backups")
+        self.dp.callback_query.register(admin_panel.show_db_metrics, F.data == "admin_db_metrics")
 
         self.dp.callback_query.register(admin_panel.show_settings_menu, F.data == "admin_settings")
         self.dp.callback_query.register(admin_panel.show_payment_settings, F.data == "settings_payment")
@@ -374,6 +380,7 @@ class BotManager:
     async def start(self):
         try:
             self.register_handlers()
+            startup_timer.mark("register_handlers")
             logger.info("Starting bot polling...")
             await self.dp.start_polling(self.bot, polling_timeout=30)
         except Exception as e:
@@ -388,6 +395,11 @@ async def main():
 
 
 if __name__ == "__main__":
+    # Faqat shu yerda: spawn qilingan jarayonlar (grafik pool) main.py ni __mp_main__
+    # sifatida qayta import qiladi — ularda log fayl handlerlari ochilmasligi kerak
+    configure_logging(LOG_LEVEL)
+    startup_timer.restart(_PROCESS_STARTED)
+    startup_timer.mark("imports")
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,6 @@
+from .user_context import UserContext, UserContextMiddleware
+
+__all__ = [
+    'UserContext',
+    'UserContextMiddleware'
+]
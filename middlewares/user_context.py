@@ -0,0 +1,103 @@
+"""Har bir update uchun user konteksti (lazy, bir update da ko'pi bilan bir marta yuklanadi)."""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from utils.database import db, parse_channel_posts, next_free_post_num
+from services.reachability import reachability
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class UserContext:
+    """User roli, premium holati va kanal qatorlari — bitta update davomida keshlanadi.
+
+    Yozish amallaridan keyin invalidate() chaqiriladi.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._premium: Optional[bool] = None
+        self._premium_info = _UNSET
+        self._channels: Dict[bool, list] = {}
+        self._channel_rows: Dict[tuple, Optional[tuple]] = {}
+
+    async def is_superadmin(self) -> bool:
+        return await db.is_superadmin(self.user_id)
+
+    async def is_premium(self) -> bool:
+        if self._premium is None:
+            self._premium = await db.is_premium_user(self.user_id)
+        return self._premium
+
+    async def premium_info(self) -> Optional[tuple]:
+        """(subscription, premium_type, start_date, end_date, referral_base_date)."""
+        if self._premium_info is _UNSET:
+            self._premium_info = await db.get_user_premium_info(self.user_id)
+        return self._premium_info
+
+    async def channels(self, premium: bool) -> list:
+        if premium not in self._channels:
+            self._channels[premium] = await db.get_user_channels(self.user_id, premium=premium) or []
+        return self._channels[premium]
+
+    async def channel_count(self, premium: bool) -> int:
+        return len(await self.channels(premium))
+
+    async def first_channel_id(self, premium: bool) -> Optional[int]:
+        channels = await self.channels(premium)
+        return channels[0][1] if channels else None
+
+    async def last_channel_id(self, premium: bool) -> Optional[int]:
+        channels = await self.channels(premium)
+        return channels[-1][1] if channels else None
+
+    async def channel(self, channel_id: int, premium: bool) -> Optional[tuple]:
+        """Kanal qatori: avval userning kanallaridan, bo'lmasa id bo'yicha."""
+        for row in self._channels.get(premium, ()):
+            if row[1] == channel_id:
+                return row
+        key = (channel_id, premium)
+        if key not in self._channel_rows:
+            self._channel_rows[key] = await db.get_channel_by_id(channel_id, premium=premium)
+        return self._channel_rows[key]
+
+    async def channel_posts(self, channel_id: int, premium: bool) -> list:
+        return parse_channel_posts(await self.channel(channel_id, premium), premium)
+
+    async def next_post_num(self, channel_id: int, premium: bool) -> Optional[int]:
+        return next_free_post_num(await self.channel(channel_id, premium), premium)
+
+    def invalidate(self):
+        """Yozishdan keyin: keyingi o'qish bazadan qayta yuklanadi."""
+        self._premium = None
+        self._premium_info = _UNSET
+        self._channels.clear()
+        self._channel_rows.clear()
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Handlerlarga `user_ctx` ni uzatadi; update yuborgan userning yetib bo'lmaslik belgisini oladi."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None:
+            data["user_ctx"] = UserContext(user.id)
+            try:
+                await reachability.user_active(user.id)
+            except Exception as e:
+                logger.warning(f"Reachability belgisini olib bo'lmadi: {user.id}: {e}")
+        return await handler(event, data)
+
+
+__all__ = ["UserContext", "UserContextMiddleware"]
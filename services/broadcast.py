@@ -0,0 +1,200 @@
+"""Reklama (broadcast) yuborish — fon vazifasi, restartdan keyin davom etadi.
+
+Userlar id bo'yicha chunklarda olinadi (keyset), har bir chunk BROADCAST_CONCURRENCY
+parallel copy_message bilan yuboriladi; umumiy tezlikni telegram_limiter cheklaydi.
+TelegramRetryAfter kelsa barcha workerlar shu muddatga to'xtaydi. Har chunkdan keyin
+cursor_id (shu id gacha hammasi ishlangan) bazaga yoziladi — restartda ko'pi bilan
+bitta chunk qayta yuboriladi. Botni bloklagan userlar reachability orqali belgilanadi
+va keyingi broadcastlarda o'tkazib yuboriladi.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import BROADCAST_CONCURRENCY, BROADCAST_PROGRESS_INTERVAL
+from utils.database import db
+from services.post_scheduler import telegram_limiter
+from services.reachability import reachability, unreachable_reason
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+MAX_ATTEMPTS = 3
+
+
+class BroadcastJob:
+    def __init__(self, broadcast_id: int, from_chat_id: int, message_id: int,
+                 progress_chat_id: Optional[int], progress_message_id: Optional[int],
+                 cursor_id: Optional[int] = None, sent: int = 0, failed: int = 0):
+        self.id = broadcast_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.progress_chat_id = progress_chat_id
+        self.progress_message_id = progress_message_id
+        self.cursor_id = cursor_id
+        self.sent = sent
+        self.failed = failed
+        self.cancelled = False
+        self.started_at = time.monotonic()
+        self.last_progress = 0.0
+
+
+class BroadcastEngine:
+    def __init__(self, concurrency: int = BROADCAST_CONCURRENCY,
+                 progress_interval: float = BROADCAST_PROGRESS_INTERVAL):
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.bot: Optional[Bot] = None
+        self._jobs: Dict[int, BroadcastJob] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        # RetryAfter — barcha broadcastlar uchun umumiy pauza (monotonic vaqt)
+        self._paused_until = 0.0
+
+    async def start(self, bot: Bot, admin_id: int, from_chat_id: int, message_id: int,
+                    progress_chat_id: int, progress_message_id: int) -> int:
+        self.bot = bot
+        broadcast_id = await db.create_broadcast(
+            admin_id, from_chat_id, message_id, progress_chat_id, progress_message_id
+        )
+        self._spawn(BroadcastJob(broadcast_id, from_chat_id, message_id, progress_chat_id, progress_message_id))
+        logger.info(f"Broadcast #{broadcast_id} boshlandi (admin {admin_id})")
+        return broadcast_id
+
+    async def resume(self, bot: Bot):
+        """Restartdan oldin tugamagan broadcastlarni cursor_id dan davom ettirish."""
+        self.bot = bot
+        for row in await db.get_running_broadcasts() or []:
+            broadcast_id = row[0]
+            if broadcast_id in self._tasks:
+                continue
+            self._spawn(BroadcastJob(*row))
+            logger.info(f"Broadcast #{broadcast_id} davom ettirildi (cursor={row[5]})")
+
+    def cancel(self, broadcast_id: int) -> bool:
+        job = self._jobs.get(broadcast_id)
+        if job is None:
+            return False
+        job.cancelled = True
+        return True
+
+    async def stop(self):
+        """Shutdown: vazifalar to'xtatiladi, status 'running' qoladi — keyingi startda davom etadi."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, job: BroadcastJob):
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+
+    async def _wait_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send(self, job: BroadcastJob, user_id: int, semaphore: asyncio.Semaphore,
+                    unreachable: Dict[int, str]) -> Optional[bool]:
+        """True — yuborildi, False — yuborib bo'lmadi, None — bekor qilingan.
+
+        Doimiy xatolar (bloklangan, o'chirilgan akkaunt) sababi unreachable ga yoziladi.
+        """
+        async with semaphore:
+            for _ in range(MAX_ATTEMPTS):
+                if job.cancelled:
+                    return None
+                await self._wait_pause()
+                try:
+                    async with telegram_limiter:
+                        await self.bot.copy_message(
+                            chat_id=user_id, from_chat_id=job.from_chat_id, message_id=job.message_id
+                        )
+                    return True
+                except TelegramRetryAfter as e:
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after + 0.5)
+                    logger.warning(f"Broadcast #{job.id}: rate limit {e.retry_after}s")
+                except Exception as e:
+                    reason = unreachable_reason(e)
+                    if reason:
+                        unreachable[user_id] = reason
+                    logger.debug(f"Broadcast #{job.id}: {user_id} ga yuborilmadi: {e}")
+                    return False
+            return False
+
+    def _progress_text(self, job: BroadcastJob, status: Optional[str] = None) -> str:
+        done = job.sent + job.failed
+        elapsed = max(time.monotonic() - job.started_at, 1e-6)
+        title = {
+            None: "📢 <b>Reklama yuborilmoqda...</b>",
+            "done": "<b>Reklama yuborildi!</b>",
+            "cancelled": "⛔ <b>Reklama to'xtatildi</b>",
+        }[status]
+        return (
+            f"{title}\n\n"
+            f"Muvaffaqiyatli: <b>{job.sent}</b>\n"
+            f"Muvaffaqiyatsiz: <b>{job.failed}</b>\n"
+            f"Jami: <b>{done}</b>"
+            + ("" if status else f"\n⚡ {done / elapsed:.1f} xabar/s")
+        )
+
+    async def _edit_progress(self, job: BroadcastJob, status: Optional[str] = None):
+        if not job.progress_chat_id or not job.progress_message_id:
+            return
+        from keyboards.inline import admin_panel, build_broadcast_progress_kb
+
+        job.last_progress = time.monotonic()
+        try:
+            await self.bot.edit_message_text(
+                self._progress_text(job, status),
+                chat_id=job.progress_chat_id, message_id=job.progress_message_id,
+                reply_markup=admin_panel if status else build_broadcast_progress_kb(job.id),
+                parse_mode="HTML",
+            )
+        except TelegramRetryAfter as e:
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after + 0.5)
+        except Exception as e:
+            # "message is not modified" va h.k. — progress ixtiyoriy
+            logger.debug(f"Broadcast #{job.id} progress: {e}")
+
+    async def _run(self, job: BroadcastJob):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            await self._edit_progress(job)
+            async for user_ids in db.iter_user_ids(chunk_size=CHUNK_SIZE, after_id=job.cursor_id,
+                                                   reachable_only=True):
+                unreachable: Dict[int, str] = {}
+                results: List[Optional[bool]] = await asyncio.gather(
+                    *(self._send(job, uid, semaphore, unreachable) for uid in user_ids)
+                )
+                await reachability.mark_users(unreachable)
+                # Faqat haqiqatan yetib borganlar (vaqtinchalik xato belgini olib tashlamaydi)
+                await reachability.users_reached([uid for uid, ok in zip(user_ids, results) if ok])
+                job.sent += results.count(True)
+                job.failed += results.count(False)
+                if job.cancelled:
+                    break
+                job.cursor_id = user_ids[-1]
+                await db.save_broadcast_progress(job.id, job.cursor_id, job.sent, job.failed)
+                if time.monotonic() - job.last_progress >= self.progress_interval:
+                    await self._edit_progress(job)
+
+            status = "cancelled" if job.cancelled else "done"
+            await db.finish_broadcast(job.id, status, job.sent, job.failed)
+            await self._edit_progress(job, status)
+            logger.info(f"Broadcast #{job.id} {status}: {job.sent} success, {job.failed} failed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Status 'running' qoladi — keyingi startda cursor_id dan davom etadi
+            logger.error(f"Broadcast #{job.id} xatolik: {e}", exc_info=True)
+        finally:
+            self._jobs.pop(job.id, None)
+            self._tasks.pop(job.id, None)
+
+
+broadcast_engine = BroadcastEngine()
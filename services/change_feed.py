@@ -0,0 +1,137 @@
+"""Jarayonlararo kesh invalidatsiyasi (Postgres LISTEN/NOTIFY).
+
+Triggerlar (5-migratsiya) users/superadmins/channel/premium_channel o'zgarganda
+"<jadval>|<user_id>" payload yuboradi. Har bir jarayon alohida asyncpg ulanishida
+tinglaydi va keshdan aynan shu kalitni o'chiradi. Ulanish uzilsa — o'tkazib
+yuborilgan xabarlar noma'lum, shuning uchun keshlar to'liq tozalanadi va TTL qisqaradi.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+import asyncpg
+
+from config import CHANGE_FEED_CACHE_TTL
+from utils.database import db, PREMIUM_CACHE_TTL
+from utils.migrations import CHANGE_FEED_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+KeyHandler = Callable[[int], None]
+ResetHandler = Callable[[], None]
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._handlers: Dict[str, List[KeyHandler]] = {}
+        self._reset_handlers: List[ResetHandler] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self.connected = False
+
+    def subscribe(self, table: str, handler: KeyHandler):
+        """`table` dagi o'zgarishda handler(user_id) chaqiriladi."""
+        self._handlers.setdefault(table, []).append(handler)
+
+    def on_reset(self, handler: ResetHandler):
+        """Ulanish uzilganda (xabarlar yo'qolgan bo'lishi mumkin) chaqiriladi."""
+        self._reset_handlers.append(handler)
+
+    def dispatch(self, payload: str):
+        table, _, key = payload.partition("|")
+        try:
+            user_id = int(key)
+        except ValueError:
+            logger.warning(f"Change feed: noto'g'ri payload {payload!r}")
+            return
+        for handler in self._handlers.get(table, ()):
+            try:
+                handler(user_id)
+            except Exception as e:
+                logger.error(f"Change feed handler xatolik ({table}): {e}", exc_info=True)
+
+    def _reset(self):
+        for handler in self._reset_handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.error(f"Change feed reset xatolik: {e}", exc_info=True)
+
+    def _on_notify(self, conn, pid, channel, payload):
+        self.dispatch(payload)
+
+    def _set_connected(self, connected: bool):
+        self.connected = connected
+        # Invalidatsiya kafolatlangan paytdagina uzun TTL
+        db.set_premium_cache_ttl(CHANGE_FEED_CACHE_TTL if connected else PREMIUM_CACHE_TTL)
+
+    async def _listen(self, stop_event: asyncio.Event):
+        lost = asyncio.Event()
+        self._conn = await asyncpg.connect(db.raw_dsn())
+        try:
+            self._conn.add_termination_listener(lambda conn: lost.set())
+            await self._conn.add_listener(CHANGE_FEED_CHANNEL, self._on_notify)
+            # Ulanishdan oldingi o'zgarishlar ko'rinmagan — keshni boshidan to'ldiramiz
+            self._reset()
+            self._set_connected(True)
+            logger.info(f"Change feed: '{CHANGE_FEED_CHANNEL}' tinglanmoqda")
+
+            stop_wait = asyncio.ensure_future(stop_event.wait())
+            lost_wait = asyncio.ensure_future(lost.wait())
+            try:
+                await asyncio.wait({stop_wait, lost_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                stop_wait.cancel()
+                lost_wait.cancel()
+            if lost.is_set():
+                raise ConnectionError("LISTEN ulanishi uzildi")
+        finally:
+            self._set_connected(False)
+            if not self._conn.is_closed():
+                await self._conn.close()
+            self._conn = None
+
+    async def run(self, stop_event: asyncio.Event):
+        if not db.is_postgres:
+            logger.info("Change feed o'chirilgan: faqat PostgreSQL da ishlaydi")
+            return
+
+        delay = RECONNECT_MIN_DELAY
+        while not stop_event.is_set():
+            try:
+                await self._listen(stop_event)
+                delay = RECONNECT_MIN_DELAY
+            except Exception as e:
+                self._reset()
+                logger.warning(f"Change feed uzildi: {e}. {delay}s dan keyin qayta ulanadi")
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+# Fondagi qayta yuklashlar — GC yig'ib olmasligi uchun havola saqlanadi
+_reload_tasks: Set[asyncio.Task] = set()
+
+
+def _reload_done(task: asyncio.Task):
+    _reload_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Superadminlarni qayta yuklab bo'lmadi: {task.exception()}")
+
+
+def _reload_superadmins(user_id: Optional[int] = None):
+    task = asyncio.get_running_loop().create_task(db.load_superadmins())
+    _reload_tasks.add(task)
+    task.add_done_callback(_reload_done)
+
+
+change_feed = ChangeFeed()
+change_feed.subscribe("users", db.invalidate_premium_cache)
+change_feed.subscribe("superadmins", _reload_superadmins)
+change_feed.on_reset(db.clear_premium_cache)
+change_feed.on_reset(_reload_superadmins)
@@ -0,0 +1,101 @@
+"""Kanal ro'yxati tugmalari uchun nomlar keshi.
+
+Nom kanal qo'shilganda (forward qilingan postdan) bazaga yoziladi va ro'yxat bitta
+so'rov bilan o'qiladi — odatiy holatda Bot API chaqirilmaydi. Nomi yo'q kanallar
+telegram_limiter ostida parallel get_chat bilan olinadi; CHANNEL_TITLE_TTL dan eski
+nomlar darhol ko'rsatiladi va fonda yangilanadi.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from config import CHANNEL_TITLE_TTL
+from utils.database import db, to_timestamp
+from services.post_scheduler import telegram_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelTitleService:
+    def __init__(self, ttl: float = CHANNEL_TITLE_TTL):
+        self.ttl = ttl
+        # Fonda yangilanayotgan (premium, kanal) lar — bir kanal uchun bitta vazifa
+        self._refreshing: Set[Tuple[bool, int]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _fetch(self, bot: Bot, channel_ids: Iterable[int]) -> Dict[int, str]:
+        """get_chat lar parallel, umumiy tezlik telegram_limiter da. Xatolilar natijada yo'q."""
+        async def fetch(channel_id: int) -> Optional[str]:
+            try:
+                async with telegram_limiter:
+                    chat = await bot.get_chat(channel_id)
+                return chat.title
+            except Exception as e:
+                logger.debug(f"Kanal nomi olinmadi: {channel_id}: {e}")
+                return None
+
+        channel_ids = list(channel_ids)
+        results = await asyncio.gather(*(fetch(cid) for cid in channel_ids))
+        return {cid: title for cid, title in zip(channel_ids, results) if title}
+
+    async def _refresh(self, bot: Bot, channel_ids: List[int], premium: bool):
+        try:
+            titles = await self._fetch(bot, channel_ids)
+            if titles:
+                await db.set_channel_titles(titles, premium=premium)
+        except Exception as e:
+            logger.warning(f"Kanal nomlarini yangilab bo'lmadi: {e}")
+        finally:
+            self._refreshing.difference_update((premium, cid) for cid in channel_ids)
+
+    def _refresh_in_background(self, bot: Bot, channel_ids: List[int], premium: bool):
+        channel_ids = [cid for cid in channel_ids if (premium, cid) not in self._refreshing]
+        if not channel_ids:
+            return
+        self._refreshing.update((premium, cid) for cid in channel_ids)
+        task = asyncio.create_task(self._refresh(bot, channel_ids, premium))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def titles(self, bot: Optional[Bot], user_id: int, premium: bool) -> Dict[int, str]:
+        """Userning kanallari: id → nom (topilmaganlari natijada yo'q)."""
+        stored = await db.get_channel_titles(user_id, premium=premium)
+        titles: Dict[int, str] = {}
+        missing: List[int] = []
+        stale: List[int] = []
+        now = time.time()
+        for channel_id, (title, updated_at) in stored.items():
+            if not title:
+                missing.append(channel_id)
+                continue
+            titles[channel_id] = title
+            updated = to_timestamp(updated_at)
+            if updated is None or now - updated >= self.ttl:
+                stale.append(channel_id)
+
+        if bot is None:
+            return titles
+        if missing:
+            fetched = await self._fetch(bot, missing)
+            if fetched:
+                await db.set_channel_titles(fetched, premium=premium)
+                titles.update(fetched)
+        if stale:
+            self._refresh_in_background(bot, stale, premium)
+        return titles
+
+    async def title(self, bot: Optional[Bot], user_id: int, channel_id: int, premium: bool) -> Optional[str]:
+        return (await self.titles(bot, user_id, premium)).get(channel_id)
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+channel_titles = ChannelTitleService()
@@ -7,7 +7,6 @@ import aiohttp
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from typing import Optional
-from openai import AsyncOpenAI, OpenAIError, RateLimitError, APIConnectionError
 from config import (
     GROK_API_KEY, GROK_BASE_URL, GROK_TIMEOUT,
     GROK_MODEL_PREMIUM, GROK_MODEL_FREE,
@@ -59,17 +58,25 @@ def _is_currency_topic(theme: str) -> bool:
 
 class GrokService:
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=GROK_API_KEY,
-            base_url=GROK_BASE_URL,
-            timeout=GROK_TIMEOUT
-        )
+        self._client = None
         self.circuit = CircuitBreaker(
             name="grok_api",
             failure_threshold=5,
             recovery_timeout=60.0
         )
 
+    @property
+    def client(self):
+        # openai og'ir paket — birinchi post generatsiyasida yuklanadi, bot startida emas
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=GROK_API_KEY,
+                base_url=GROK_BASE_URL,
+                timeout=GROK_TIMEOUT
+            )
+        return self._client
+
     async def generate_post(self, theme: str, is_premium: bool = False) -> str:
         now = datetime.now(ZoneInfo(TIMEZONE))
         today_str = now.strftime("%d-%B %Y, %A")
@@ -100,6 +107,8 @@ class GrokService:
             logger.warning(f"Circuit OPEN, fallback: theme='{theme}'")
             return f"📢 {theme}\n\nQiziqarli yangiliklar tez orada!"
 
+        from openai import OpenAIError, RateLimitError, APIConnectionError
+
         max_attempts = 4
         base_delay = 1.0
         last_error: Optional[Exception] = None
@@ -2,9 +2,7 @@ import logging
 import asyncio
 import random
 import base64
-import httpx
 from typing import Optional
-from openai import AsyncOpenAI, OpenAIError, RateLimitError, APIConnectionError
 from aiolimiter import AsyncLimiter
 from config import GROK_API_KEY, GROK_BASE_URL, GROK_IMAGE_MODEL, GROK_IMAGE_PROMPT, GROK_TIMEOUT, IMAGE_RATE_LIMIT
 
@@ -14,14 +12,22 @@ image_limiter = AsyncLimiter(max_rate=IMAGE_RATE_LIMIT, time_period=60)
 
 class ImageService:
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=GROK_API_KEY,
-            base_url=GROK_BASE_URL,
-            timeout=GROK_TIMEOUT
-        )
+        self._client = None
         self.prompt_template = GROK_IMAGE_PROMPT
         self.model = GROK_IMAGE_MODEL
 
+    @property
+    def client(self):
+        # openai/httpx faqat rasm kerak bo'lganda yuklanadi
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=GROK_API_KEY,
+                base_url=GROK_BASE_URL,
+                timeout=GROK_TIMEOUT
+            )
+        return self._client
+
     def _validate_image_bytes(self, image_bytes: bytes) -> bool:
         """Rasmni yaroqliligini tekshirish (JPEG/PNG/WebP magic bytes)."""
         if not image_bytes or len(image_bytes) < 100:
@@ -45,6 +51,9 @@ class ImageService:
             logger.warning("GROK_API_KEY not configured, skipping image generation")
             return None
 
+        import httpx
+        from openai import OpenAIError, RateLimitError, APIConnectionError
+
         max_attempts = 3
         base_delay = 2.0
         last_error: Optional[Exception] = None
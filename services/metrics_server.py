@@ -0,0 +1,31 @@
+"""/metrics endpoint (Prometheus text formati) — METRICS_PORT > 0 bo'lsa ishlaydi."""
+
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from config import METRICS_PORT
+from utils.database import db
+from utils.db_metrics import render_prometheus
+from utils.startup_timer import startup_timer
+
+logger = logging.getLogger(__name__)
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    body = render_prometheus(db.metrics, db.pool_stats()) + startup_timer.render_prometheus()
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(port: int = METRICS_PORT) -> Optional[web.AppRunner]:
+    """Serverni ishga tushirish; to'xtatish uchun runner.cleanup()."""
+    if port <= 0:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logger.info(f"Metrics server: http://0.0.0.0:{port}/metrics")
+    return runner
@@ -7,9 +7,10 @@ from aiogram.types import BufferedInputFile
 from aiogram.exceptions import TelegramRetryAfter
 from aiolimiter import AsyncLimiter
 
-from utils.database import db
+from utils.database import db, REACHABLE_SQL, recheck_cutoff
 from services.grok_service import grok_service
 from services.image_service import image_service
+from services.reachability import reachability, unreachable_reason
 from config import (
     TIMEZONE, TELEGRAM_RATE_LIMIT,
     SCHEDULER_MIN_WORKERS, SCHEDULER_MAX_WORKERS, SCHEDULER_SCALE_THRESHOLD
@@ -37,14 +38,17 @@ class PostScheduler:
     async def get_all_scheduled_posts(self):
         current_time = datetime.now(self.tz).strftime("%H:%M")
         scheduled_posts = []
+        # Yetib bo'lmaydigan kanallar qayta tekshirish vaqti kelguncha olinmaydi
+        cutoff = recheck_cutoff()
 
         # Free kanallar — SQL da filter
         free_channels = await db.execute_query(
-            """SELECT user_id, id,
-                      post1, theme1, post2, theme2, post3, theme3
+            f"""SELECT user_id, id,
+                      post1, theme1, post2, theme2, post3, theme3,
+                      inactive_at
                FROM channel
-               WHERE post1 = ? OR post2 = ? OR post3 = ?""",
-            (current_time, current_time, current_time),
+               WHERE (post1 = ? OR post2 = ? OR post3 = ?) AND {REACHABLE_SQL}""",
+            (current_time, current_time, current_time, cutoff),
             fetch_all=True
         )
 
@@ -68,12 +72,13 @@ class PostScheduler:
                             'post_num': i,
                             'is_premium': False,
                             'with_image': False,
-                            'priority': 1
+                            'priority': 1,
+                            'recheck': channel[-1] is not None
                         })
 
         # Premium kanallar — SQL da filter (15 ta post)
         premium_where = " OR ".join([f"post{i} = ?" for i in range(1, 16)])
-        premium_params = tuple([current_time] * 15)
+        premium_params = (*[current_time] * 15, cutoff)
 
         premium_channels = await db.execute_query(
             f"""SELECT user_id, id,
@@ -84,9 +89,10 @@ class PostScheduler:
                       post13, theme13, post14, theme14, post15, theme15,
                       image1, image2, image3, image4, image5,
                       image6, image7, image8, image9, image10,
-                      image11, image12, image13, image14, image15
+                      image11, image12, image13, image14, image15,
+                      inactive_at
                FROM premium_channel
-               WHERE {premium_where}""",
+               WHERE ({premium_where}) AND {REACHABLE_SQL}""",
             premium_params,
             fetch_all=True
         )
@@ -113,7 +119,8 @@ class PostScheduler:
                             'post_num': i,
                             'is_premium': True,
                             'with_image': post_image == 'yes',
-                            'priority': 0
+                            'priority': 0,
+                            'recheck': channel[-1] is not None
                         })
 
         scheduled_posts.sort(key=lambda x: x['priority'])
@@ -133,6 +140,10 @@ class PostScheduler:
         with_image = post_data.get('with_image', False)
 
         try:
+            # Avval yetib bo'lmagan kanal: Grok dan oldin arzon get_chat tekshiruvi
+            if post_data.get('recheck') and not await reachability.recheck_channel(self.bot, channel_id, is_premium):
+                return
+
             post_text = await grok_service.generate_post(theme, is_premium)
 
             if not post_text:
@@ -169,6 +180,8 @@ class PostScheduler:
                         f"{'Premium' if is_premium else 'Free'} | Theme: {theme[:30]}")
 
         except Exception as e:
+            if await reachability.channel_failed(channel_id, is_premium, e):
+                return
             logger.error(f"❌ Post yuborib bo'lmadi: channel={channel_id}: {e}", exc_info=True)
 
     async def _send_text_with_retry(self, channel_id: int, text: str, max_retries: int = 2):
@@ -186,6 +199,8 @@ class PostScheduler:
                 logger.warning(f"Rate limit {e.retry_after}s, retry {attempt + 1}: channel={channel_id}")
                 await asyncio.sleep(e.retry_after + 0.5)
             except Exception as e:
+                if unreachable_reason(e):
+                    raise  # doimiy xato — qayta urinish befoyda
                 logger.error(f"send_message xato: channel={channel_id}: {e}")
                 if attempt < max_retries:
                     await asyncio.sleep(1)
@@ -0,0 +1,162 @@
+"""Premium muddatini aniq vaqtida tugatish (timer heap).
+
+Yaqin orada tugaydigan premiumlar end_date bo'yicha heap da saqlanadi, loop eng
+yaqin muddatgacha uxlaydi va vaqti kelganda bitta UPDATE ... RETURNING bilan
+barcha tugaganlarni o'chiradi. Yangi obuna/uzaytirishda `schedule()` chaqiriladi.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from utils.database import db, TZ, to_timestamp
+from services.post_scheduler import telegram_limiter
+from services.reachability import reachability, unreachable_reason
+
+logger = logging.getLogger(__name__)
+
+# Heap faqat shu oraliqdagi muddatlarni saqlaydi, qolganlari keyingi reload da yuklanadi
+LOAD_HORIZON = timedelta(hours=6)
+NOTIFY_BATCH_SIZE = 25
+NOTIFY_ATTEMPTS = 2
+
+EXPIRED_TEXT = (
+    "⏰ <b>Premium obunangiz tugadi!</b>\n\n"
+    "Premium imkoniyatlardan foydalanishni davom ettirish uchun "
+    "obunani yangilang 👇"
+)
+
+
+class PremiumExpiryScheduler:
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        # user_id -> amaldagi muddat; heap dagi eski yozuvlar shu bilan tekshiriladi
+        self._deadlines: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._loaded_until = 0.0
+        self.bot: Optional[Bot] = None
+
+    def schedule(self, user_id: int, end_date: datetime):
+        """Userning yangi tugash vaqtini qo'shish (eskisi bekor bo'ladi)."""
+        deadline = to_timestamp(end_date)
+        if deadline is None:
+            return
+        if deadline > self._loaded_until:
+            # Uzoq muddat — keyingi reload da yuklanadi, eski yozuv bekor
+            self._deadlines.pop(user_id, None)
+            return
+        self._deadlines[user_id] = deadline
+        heapq.heappush(self._heap, (deadline, user_id))
+        self._wakeup.set()
+
+    def cancel(self, user_id: int):
+        self._deadlines.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    async def _reload(self):
+        """Indekslangan so'rov bilan keyingi LOAD_HORIZON dagi muddatlarni yuklash."""
+        until = datetime.now(TZ) + LOAD_HORIZON
+        rows = await db.get_upcoming_premium_expirations(until)
+        self._heap = []
+        self._deadlines = {}
+        self._loaded_until = until.timestamp()
+        for user_id, end_date in rows:
+            self.schedule(user_id, end_date)
+        logger.info(f"Premium expiry: {len(self._heap)} ta muddat yuklandi")
+
+    def _pop_due(self, now: float) -> bool:
+        """Vaqti kelgan (va eskirmagan) yozuvlarni heap dan olish."""
+        due = False
+        while self._heap and self._heap[0][0] <= now:
+            deadline, user_id = heapq.heappop(self._heap)
+            if self._deadlines.get(user_id) == deadline:
+                del self._deadlines[user_id]
+                due = True
+        return due
+
+    async def expire_due(self) -> List[int]:
+        user_ids = await db.expire_due_premiums()
+        if user_ids:
+            logger.info(f"Premium expired: {len(user_ids)} ta user o'chirildi")
+            if self.bot:
+                await self._notify(user_ids)
+        return user_ids
+
+    async def _notify(self, user_ids: List[int]):
+        """Xabarlarni NOTIFY_BATCH_SIZE lik guruhlarda, telegram_limiter ostida yuborish.
+
+        Botni bloklagan userlarga yuborilmaydi; yangi bloklaganlar reachability da belgilanadi.
+        """
+        from keyboards.inline import premium_buy
+
+        unreachable: Dict[int, str] = {}
+
+        async def send(user_id: int):
+            for attempt in range(NOTIFY_ATTEMPTS):
+                try:
+                    async with telegram_limiter:
+                        await self.bot.send_message(
+                            chat_id=user_id, text=EXPIRED_TEXT,
+                            parse_mode="HTML", reply_markup=premium_buy
+                        )
+                    return
+                except TelegramRetryAfter as e:
+                    if attempt == NOTIFY_ATTEMPTS - 1:
+                        logger.warning(
+                            f"Premium expiry notify dropped for {user_id}: "
+                            f"RetryAfter {e.retry_after}s after {NOTIFY_ATTEMPTS} attempts"
+                        )
+                        return
+                    await asyncio.sleep(e.retry_after + 0.5)
+                except Exception as e:
+                    reason = unreachable_reason(e)
+                    if reason:
+                        unreachable[user_id] = reason
+                    else:
+                        logger.warning(f"Premium expiry notify failed for {user_id}: {e}")
+                    return
+
+        for i in range(0, len(user_ids), NOTIFY_BATCH_SIZE):
+            batch = await db.filter_reachable_users(user_ids[i:i + NOTIFY_BATCH_SIZE])
+            await asyncio.gather(*(send(uid) for uid in batch))
+        await reachability.mark_users(unreachable)
+
+    async def run(self, bot: Bot, stop_event: asyncio.Event):
+        self.bot = bot
+        logger.info("⏰ Premium expiry scheduler started")
+
+        while not stop_event.is_set():
+            try:
+                now = time.time()
+                if now >= self._loaded_until:
+                    # Start va har LOAD_HORIZON da: o'tib ketganlarni tozalash + qayta yuklash
+                    await self.expire_due()
+                    await self._reload()
+                elif self._pop_due(now):
+                    await self.expire_due()
+
+                next_at = self._heap[0][0] if self._heap else self._loaded_until
+                timeout = max(0.0, min(next_at, self._loaded_until) - time.time())
+                self._wakeup.clear()
+                stop_wait = asyncio.ensure_future(stop_event.wait())
+                wake_wait = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({stop_wait, wake_wait}, timeout=timeout,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    stop_wait.cancel()
+                    wake_wait.cancel()
+            except Exception as e:
+                logger.error(f"Premium expiry loop xatolik: {e}", exc_info=True)
+                await asyncio.sleep(60)
+
+
+premium_expiry = PremiumExpiryScheduler()
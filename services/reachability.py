@@ -0,0 +1,115 @@
+"""Yetib bo'lmaydigan chatlar reestri (bot bloklangan, kanaldan chiqarilgan, chat yo'q).
+
+Broadcast, premium/referral xabarlari va post scheduler yuborishdagi xatoni shu yerga
+beradi: Forbidden / chat not found / kicked kabi doimiy xatolarda chat inactive_at va
+sababi bilan belgilanadi va keyingi yuborishlardan (REACHABLE_SQL) chiqariladi.
+Qayta tekshirish dangasa: REACHABILITY_RECHECK_DAYS o'tgach chat yana bitta urinishga
+qo'shiladi — yetib borsa belgi olinadi, bo'lmasa vaqt yangilanadi. User o'zi update
+yuborsa (botni blokdan chiqarib /start bosgan) belgi darhol olinadi.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from utils.cache import TTLCache
+from utils.database import db
+
+logger = logging.getLogger(__name__)
+
+# Xato matnidagi belgi → saqlanadigan sabab (vaqtinchalik xatolar bu yerda yo'q)
+_REASON_MARKERS = (
+    ("bot was blocked", "blocked"),
+    ("user is deactivated", "deactivated"),
+    ("bot was kicked", "kicked"),
+    ("chat not found", "not_found"),
+    ("have no rights to send", "no_rights"),
+    ("not enough rights to send", "no_rights"),
+    ("need administrator rights", "no_rights"),
+)
+
+
+def unreachable_reason(exc: BaseException) -> Optional[str]:
+    """Chatga umuman yetib bo'lmasligini bildiruvchi xato bo'lsa — sabab, aks holda None."""
+    if not isinstance(exc, (TelegramForbiddenError, TelegramBadRequest)):
+        return None
+    message = str(exc).lower()
+    for marker, reason in _REASON_MARKERS:
+        if marker in message:
+            return reason
+    return "forbidden" if isinstance(exc, TelegramForbiddenError) else None
+
+
+def _channel_table(premium: bool) -> str:
+    return "premium_channel" if premium else "channel"
+
+
+class ReachabilityRegistry:
+    def __init__(self):
+        # Update yuborgani uchun belgisi olingan userlar — har update da bazaga yozmaslik uchun
+        self._active_users = TTLCache(max_size=50000, ttl_seconds=3600)
+
+    async def mark_users(self, failures: Dict[int, str]):
+        """{user_id: sabab} — userlarni sabab bo'yicha guruhlab belgilash."""
+        by_reason: Dict[str, List[int]] = {}
+        for user_id, reason in failures.items():
+            by_reason.setdefault(reason, []).append(user_id)
+            self._active_users.invalidate(user_id)
+        for reason, user_ids in by_reason.items():
+            await db.mark_inactive("users", user_ids, reason)
+        if failures:
+            logger.info(f"Reachability: {len(failures)} ta user yetib bo'lmaydigan deb belgilandi")
+
+    async def user_failed(self, user_id: int, exc: BaseException) -> bool:
+        """Userga yuborish xatosi. Doimiy xato bo'lsa belgilab True qaytaradi."""
+        reason = unreachable_reason(exc)
+        if reason is None:
+            return False
+        await self.mark_users({user_id: reason})
+        return True
+
+    async def channel_failed(self, channel_id: int, premium: bool, exc: BaseException) -> bool:
+        """Kanalga yuborish xatosi. Doimiy xato bo'lsa belgilab True qaytaradi."""
+        reason = unreachable_reason(exc)
+        if reason is None:
+            return False
+        await db.mark_inactive(_channel_table(premium), [channel_id], reason)
+        logger.warning(f"Reachability: kanal {channel_id} yetib bo'lmaydigan ({reason})")
+        return True
+
+    async def users_reached(self, user_ids: List[int]):
+        """Xabar yetib borgan userlar — qayta sinalganlardan belgi olinadi."""
+        if user_ids:
+            await db.reactivate("users", user_ids)
+
+    async def user_active(self, user_id: int):
+        """User o'zi update yubordi — demak chatga yetib boriladi, belgi bo'lsa olinadi."""
+        if user_id in self._active_users:
+            return
+        await db.reactivate("users", [user_id])
+        self._active_users.set(user_id, True)
+
+    async def channel_reached(self, channel_id: int, premium: bool):
+        await db.reactivate(_channel_table(premium), [channel_id])
+
+    async def recheck_channel(self, bot: Bot, channel_id: int, premium: bool) -> bool:
+        """Qayta tekshirish navbati kelgan kanalni qimmat generatsiyadan oldin get_chat bilan sinash."""
+        from services.post_scheduler import telegram_limiter
+
+        try:
+            async with telegram_limiter:
+                await bot.get_chat(channel_id)
+        except TelegramRetryAfter:
+            return True  # bilib bo'lmadi — oddiy yuborish hal qiladi
+        except Exception as e:
+            if await self.channel_failed(channel_id, premium, e):
+                return False
+            return True
+        await self.channel_reached(channel_id, premium)
+        logger.info(f"Reachability: kanal {channel_id} yana faol")
+        return True
+
+
+reachability = ReachabilityRegistry()
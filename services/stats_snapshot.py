@@ -0,0 +1,66 @@
+"""Admin statistika ekrani uchun keshlangan snapshot.
+
+Bitta yangilanish = 3 ta so'rov: bugungi daily_stats (yozish + qaytarish), 30 kunlik tarix
+va API usage ning barcha oynalari (bitta shartli agregat so'rov). Natija STATS_SNAPSHOT_TTL
+davomida keshdan beriladi; bir vaqtda kelgan so'rovlar bitta yangilanishni kutadi.
+"""
+
+import asyncio
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from config import STATS_SNAPSHOT_TTL
+from utils.database import db
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 30
+
+
+class StatsSnapshot(NamedTuple):
+    stats: dict        # record_daily_stats natijasi
+    usage: dict        # get_api_usage_rollup natijasi
+    history: list      # get_stats_history (grafik uchun)
+    created_at: float  # time.time()
+
+
+class StatsSnapshotService:
+    def __init__(self, ttl: float = STATS_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[StatsSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _fresh(self) -> Optional[StatsSnapshot]:
+        snapshot = self._snapshot
+        if snapshot and time.time() - snapshot.created_at < self.ttl:
+            return snapshot
+        return None
+
+    async def _build(self) -> StatsSnapshot:
+        async def stats_and_history():
+            # Tarix bugungi (hozir yozilgan) qatorni ham o'z ichiga olishi uchun ketma-ket
+            # va primary dan — replica bu qatorga hali yetib kelmagan bo'lishi mumkin
+            stats = await db.record_daily_stats()
+            return stats, await db.get_stats_history(days=HISTORY_DAYS, replica=False)
+
+        (stats, history), usage = await asyncio.gather(stats_and_history(), db.get_api_usage_rollup())
+        return StatsSnapshot(stats, usage, [tuple(row) for row in history or []], time.time())
+
+    async def get(self, refresh: bool = False) -> StatsSnapshot:
+        if not refresh and (snapshot := self._fresh()):
+            return snapshot
+        async with self._lock:
+            # Lock kutayotganda boshqa so'rov yangilagan bo'lishi mumkin
+            if not refresh and (snapshot := self._fresh()):
+                return snapshot
+            started = time.perf_counter()
+            self._snapshot = await self._build()
+            logger.debug(f"Stats snapshot yangilandi: {(time.perf_counter() - started) * 1000:.0f}ms")
+            return self._snapshot
+
+
+stats_snapshot = StatsSnapshotService()
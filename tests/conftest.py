@@ -22,6 +22,7 @@ def event_loop():
 async def db(tmp_path):
     """Create a fresh async database instance for each test."""
     from utils.database import DatabaseManager
+    from utils.cache import TTLCache
     from sqlalchemy.ext.asyncio import create_async_engine
 
     db_file = tmp_path / "test.db"
@@ -30,10 +31,13 @@ async def db(tmp_path):
     manager = DatabaseManager.__new__(DatabaseManager)
     manager._created = True
     manager._db_ready = False
-    manager._premium_cache = {}
-    manager._cache_ttl_seconds = 300
-    manager._cache_max_size = 10000
+    manager._premium_cache = TTLCache(max_size=10000, ttl_seconds=300)
+    manager._superadmin_ids = frozenset()
+    manager._roles_loaded = False
     manager._engine = create_async_engine(db_url, echo=False)
+    manager._replica_engine = None
+    manager._replica_healthy = False
+    manager._replica_checked_at = 0.0
 
     await manager.initialize()
     yield manager
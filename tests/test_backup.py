@@ -0,0 +1,181 @@
+"""Tests for the compressed CSV backup."""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_create_backup_manifest(db, tmp_path, monkeypatch):
+    """Test the backup tar holds compressed CSVs matching its manifest."""
+    from utils import backup
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    await db.add_user(9001)
+    await db.add_user(9002, subscription=True)
+
+    path = await backup.create_backup("backup_test.tar")
+    assert path == str(tmp_path / "backup_test.tar")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["backup_test.tar", "test.db"]
+
+    with tarfile.open(path) as tar:
+        manifest = json.load(tar.extractfile("manifest.json"))
+        users = manifest["tables"]["users"]
+        data = tar.extractfile(users["file"]).read()
+
+    assert manifest["schema_version"] == db.schema_version
+    assert users["rows"] == 2
+    assert users["sha256"] == hashlib.sha256(data).hexdigest()
+    rows = list(csv.reader(io.StringIO(gzip.decompress(data).decode())))
+    assert rows[0] == users["columns"]
+    assert rows[1][0] == "9001"
+    assert rows[1][users["columns"].index("premium_type")] == "\\N"
+    assert manifest["tables"]["referrals"]["rows"] == 0
+
+
+@pytest.mark.asyncio
+async def test_restore_roundtrip(db, tmp_path, monkeypatch):
+    """Test a backup restores into an empty database with matching counts."""
+    from utils import backup
+    from utils.restore import RestoreError, restore_backup
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    await db.add_user(9101)
+    await db.add_user(9102)
+    await db.add_referral(9101, 9102)
+    await db.add_channel(-1009100000001, 9101, premium=True)
+    path = await backup.create_backup("backup_test.tar")
+
+    target = f"sqlite+aiosqlite:///{tmp_path / 'restored.db'}"
+    counts = await restore_backup(path, target)
+    assert counts["users"] == 2
+    assert counts["referrals"] == 1
+    assert counts["premium_channel"] == 1
+
+    with pytest.raises(RestoreError):
+        await restore_backup(path, target)
+    counts = await restore_backup(path, target, truncate=True)
+    assert counts["users"] == 2
+
+
+@pytest.mark.asyncio
+async def test_delta_backup_restore(db, tmp_path, monkeypatch):
+    """Test a full backup plus a change-log delta restores the latest state."""
+    from utils import backup
+    from utils.restore import RestoreError, restore_backup
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    await db.add_user(9201)
+    await db.add_user(9202)
+    await db.add_channel(-1009200000001, 9201)
+    await db.add_channel(-1009200000002, 9202)
+    full = await backup.create_backup("backup_full.tar")
+    position = backup.read_backup_manifest(full)["change_log_id"]
+
+    await db.update_user_subscription(9201, True, "monthly")
+    await db.add_user(9203)
+    await db.delete_channel(-1009200000002)
+    delta = await backup.create_delta_backup("backup_full.tar", position, "delta_1.tar")
+
+    manifest = backup.read_backup_manifest(delta)
+    assert manifest["tables"]["users"]["mode"] == "upsert"
+    assert manifest["tables"]["users"]["rows"] == 2
+    assert manifest["tables"]["channel"]["deleted"] == [-1009200000002]
+
+    target = f"sqlite+aiosqlite:///{tmp_path / 'restored.db'}"
+    with pytest.raises(RestoreError):
+        await restore_backup(delta, target)
+    counts = await restore_backup(full, target, deltas=[delta])
+    assert counts["users"] == 3
+    assert counts["channel"] == 1
+
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    engine = create_async_engine(target)
+    try:
+        async with engine.connect() as conn:
+            premium = (await conn.execute(text("SELECT premium_type FROM users WHERE id = 9201"))).scalar()
+            log_rows = (await conn.execute(text("SELECT COUNT(*) FROM change_log"))).scalar()
+    finally:
+        await engine.dispose()
+    assert premium == "monthly"
+    assert log_rows == 0
+
+
+def test_prepare_upload_parts(tmp_path, monkeypatch):
+    """Test oversized backups are split into ordered parts and file_ids are cached."""
+    from utils import backup
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    path = tmp_path / "backup_big.tar"
+    payload = bytes(range(256)) * 40
+    path.write_bytes(payload)
+
+    assert backup.prepare_upload_parts(str(path), part_size=len(payload)) == [str(path)]
+    parts = backup.prepare_upload_parts(str(path), part_size=4000)
+    assert [p.rsplit(".", 1)[1] for p in parts] == ["001", "002", "003"]
+    assert b"".join(open(p, "rb").read() for p in parts) == payload
+
+    assert backup.get_cached_file_ids(str(path)) is None
+    backup.cache_file_ids(str(path), ["a", "b", "c"])
+    assert backup.get_cached_file_ids(str(path)) == ["a", "b", "c"]
+
+    backup.cleanup_old_backups(keep_full=0)
+    assert not path.exists()
+    assert not any((tmp_path / "parts").iterdir())
+    assert backup._load_upload_cache() == {}
+
+
+def test_latest_backup_chain(tmp_path, monkeypatch):
+    """Test the download chain starts at the newest full backup and lists its deltas in order."""
+    from utils import backup
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    assert backup.latest_backup_chain() == []
+    names = ["backup_1.tar", "delta_2.tar", "backup_3.tar", "delta_4.tar", "delta_5.tar"]
+    for i, name in enumerate(names):
+        path = tmp_path / name
+        path.write_bytes(b"x")
+        os.utime(path, (1000 + i, 1000 + i))
+
+    chain = backup.latest_backup_chain()
+    assert [os.path.basename(p) for p in chain] == ["backup_3.tar", "delta_4.tar", "delta_5.tar"]
+
+    for name in names[:3]:
+        (tmp_path / name).unlink()
+    assert backup.latest_backup_chain() == []
+
+
+@pytest.mark.asyncio
+async def test_backup_reads_one_engine_throughout(db, tmp_path, monkeypatch):
+    """Test the change-log position and every table come from the engine chosen at the start."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from utils import backup
+    from utils.migrations import run_migrations
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    await db.add_user(9301)
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    await run_migrations(replica)
+
+    # Birinchi tanlovda replica sog'lom, keyin primary ga o'tadi
+    picks = []
+
+    async def reporting_engine():
+        picks.append(True)
+        return replica if len(picks) == 1 else db._engine
+
+    monkeypatch.setattr(db, "_reporting_engine", reporting_engine)
+    try:
+        path = await backup.create_backup("backup_pinned.tar")
+    finally:
+        await replica.dispose()
+
+    manifest = backup.read_backup_manifest(path)
+    assert manifest["change_log_id"] == 0
+    assert manifest["tables"]["users"]["rows"] == 0
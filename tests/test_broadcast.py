@@ -0,0 +1,121 @@
+"""Tests for the background broadcast engine."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from services import broadcast
+from services.broadcast import BroadcastEngine
+
+
+def _bot(copy_message):
+    bot = MagicMock()
+    bot.copy_message = AsyncMock(side_effect=copy_message)
+    bot.edit_message_text = AsyncMock()
+    return bot
+
+
+async def _wait(engine: BroadcastEngine):
+    await asyncio.gather(*list(engine._tasks.values()))
+
+
+@pytest.mark.asyncio
+async def test_broadcast_sends_concurrently_and_honours_retry_after(db, monkeypatch):
+    """Test every user is tried once, RetryAfter is retried and blocked users count as failed."""
+    monkeypatch.setattr(broadcast, "CHUNK_SIZE", 3)
+    for uid in range(1, 8):
+        await db.add_user(uid)
+
+    retried = set()
+
+    async def copy_message(chat_id, from_chat_id, message_id):
+        if chat_id == 2 and chat_id not in retried:
+            retried.add(chat_id)
+            raise TelegramRetryAfter(method=MagicMock(), message="flood", retry_after=0)
+        if chat_id == 5:
+            raise TelegramForbiddenError(method=MagicMock(), message="bot was blocked by the user")
+
+    engine = BroadcastEngine(concurrency=4, progress_interval=0)
+    bot = _bot(copy_message)
+    broadcast_id = await engine.start(bot, admin_id=1, from_chat_id=1, message_id=10,
+                                      progress_chat_id=1, progress_message_id=99)
+    await _wait(engine)
+
+    sent_to = sorted(call.kwargs["chat_id"] for call in bot.copy_message.await_args_list)
+    assert sent_to == [1, 2, 2, 3, 4, 5, 6, 7]
+    row = await db.execute_query(
+        "SELECT status, cursor_id, sent, failed FROM broadcasts WHERE id = ?", (broadcast_id,), fetch_one=True
+    )
+    assert tuple(row) == ("done", 7, 6, 1)
+    assert "Reklama yuborildi" in bot.edit_message_text.await_args.args[0]
+    row = await db.execute_query("SELECT inactive_reason FROM users WHERE id = ?", (5,), fetch_one=True)
+    assert row[0] == "blocked"
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_after_cursor(db):
+    """Test a running broadcast left by a restart continues after its saved cursor."""
+    for uid in range(1, 6):
+        await db.add_user(uid)
+    broadcast_id = await db.create_broadcast(1, 1, 10, None, None)
+    await db.save_broadcast_progress(broadcast_id, 3, 3, 0)
+
+    engine = BroadcastEngine()
+    bot = _bot(None)
+    await engine.resume(bot)
+    await _wait(engine)
+
+    assert [call.kwargs["chat_id"] for call in bot.copy_message.await_args_list] == [4, 5]
+    assert await db.get_running_broadcasts() == []
+
+
+@pytest.mark.asyncio
+async def test_broadcast_cancel(db, monkeypatch):
+    """Test cancelling stops before the remaining chunks and records the status."""
+    monkeypatch.setattr(broadcast, "CHUNK_SIZE", 2)
+    for uid in range(1, 11):
+        await db.add_user(uid)
+
+    engine = BroadcastEngine(concurrency=1)
+
+    async def copy_message(chat_id, from_chat_id, message_id):
+        if chat_id == 3:
+            engine.cancel(broadcast_id)
+
+    bot = _bot(copy_message)
+    broadcast_id = await engine.start(bot, 1, 1, 10, None, None)
+    await _wait(engine)
+
+    assert bot.copy_message.await_count == 3
+    row = await db.execute_query("SELECT status, sent FROM broadcasts WHERE id = ?", (broadcast_id,), fetch_one=True)
+    assert tuple(row) == ("cancelled", 3)
+    assert engine.cancel(broadcast_id) is False
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reactivates_only_reached_users(db):
+    """Test stale-marked users are cleared only when the broadcast actually reaches them."""
+    from datetime import timedelta
+    from aiogram.exceptions import TelegramNetworkError
+    from utils.database import db_now
+
+    for uid in range(1, 4):
+        await db.add_user(uid)
+    stale = db_now() - timedelta(days=30)
+    for uid in (1, 2):
+        await db.execute_query(
+            "UPDATE users SET inactive_at = ?, inactive_reason = 'blocked' WHERE id = ?", (stale, uid)
+        )
+
+    async def copy_message(chat_id, from_chat_id, message_id):
+        if chat_id == 2:
+            raise TelegramNetworkError(method=MagicMock(), message="timeout")
+
+    engine = BroadcastEngine()
+    await engine.start(_bot(copy_message), 1, 1, 10, None, None)
+    await _wait(engine)
+
+    rows = await db.execute_query("SELECT id, inactive_reason FROM users ORDER BY id", fetch_all=True)
+    # 1 ga yetib bordi — belgi olindi; 2 da vaqtinchalik xato — belgi qoladi
+    assert [tuple(r) for r in rows] == [(1, None), (2, "blocked"), (3, None)]
@@ -0,0 +1,30 @@
+"""Tests for the LRU + TTL cache."""
+import time
+
+from utils.cache import TTLCache
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" endi eng yangi
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entry_expires_at_given_time():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.set("premium", True, expires_at=time.time() - 1)
+    cache.set("free", False)
+
+    assert cache.get("premium") is None
+    assert cache.get("free") is False
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
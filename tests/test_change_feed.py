@@ -0,0 +1,48 @@
+"""Tests for change-feed cache invalidation."""
+import asyncio
+import logging
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services import change_feed as change_feed_module
+from services.change_feed import ChangeFeed, change_feed
+
+
+@pytest.mark.asyncio
+async def test_notification_evicts_premium_key(db):
+    """Test a users notification evicts exactly that user's premium entry."""
+    await db.add_user(7001)
+    await db.add_user(7002)
+    assert await db.is_premium_user(7001) is False
+    assert await db.is_premium_user(7002) is False
+
+    change_feed.dispatch("users|7001")
+    assert 7001 not in db._premium_cache
+    assert 7002 in db._premium_cache
+
+
+def test_dispatch_routes_by_table():
+    """Test handlers receive the user id of their own table only."""
+    feed = ChangeFeed()
+    seen = []
+    feed.subscribe("channel", seen.append)
+    feed.dispatch("channel|42")
+    feed.dispatch("premium_channel|43")
+    feed.dispatch("channel|bad")
+    assert seen == [42]
+
+
+@pytest.mark.asyncio
+async def test_superadmin_reload_task_is_kept_and_failures_logged(db, monkeypatch, caplog):
+    """Test the background superadmin reload is referenced until done and its error is logged."""
+    monkeypatch.setattr(db, "load_superadmins", AsyncMock(side_effect=RuntimeError("db down")))
+
+    with caplog.at_level(logging.ERROR, logger="services.change_feed"):
+        change_feed.dispatch("superadmins|1")
+        assert len(change_feed_module._reload_tasks) == 1
+        await asyncio.gather(*change_feed_module._reload_tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    assert not change_feed_module._reload_tasks
+    assert "db down" in caplog.text
@@ -0,0 +1,60 @@
+"""Tests for the channel title cache."""
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from services.channel_titles import ChannelTitleService
+from utils.database import db_now
+
+
+def _bot(titles):
+    async def get_chat(channel_id):
+        if channel_id not in titles:
+            raise RuntimeError("chat not found")
+        return SimpleNamespace(title=titles[channel_id])
+
+    bot = MagicMock()
+    bot.get_chat = AsyncMock(side_effect=get_chat)
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_titles_served_from_database(db):
+    """Test stored titles cost no Bot API calls and misses are fetched once."""
+    await db.add_user(7001)
+    await db.add_channel(-1007000000001, 7001, title="Yangiliklar")
+    await db.add_channel(-1007000000002, 7001)
+    await db.add_channel(-1007000000003, 7001)
+
+    service = ChannelTitleService(ttl=3600)
+    bot = _bot({-1007000000002: "Sport"})
+
+    titles = await service.titles(bot, 7001, premium=False)
+    assert titles == {-1007000000001: "Yangiliklar", -1007000000002: "Sport"}
+    assert sorted(c.args[0] for c in bot.get_chat.await_args_list) == [-1007000000003, -1007000000002]
+
+    # Topilgan nom saqlandi — faqat topilmagan kanal qayta so'raladi
+    bot.get_chat.reset_mock()
+    assert await service.titles(bot, 7001, premium=False) == titles
+    assert [c.args[0] for c in bot.get_chat.await_args_list] == [-1007000000003]
+
+
+@pytest.mark.asyncio
+async def test_stale_titles_refreshed_in_background(db):
+    """Test titles older than the TTL are returned at once and refreshed in the background."""
+    await db.add_user(7002)
+    await db.add_channel(-1007000000010, 7002, premium=True, title="Eski nom")
+    await db.execute_query(
+        "UPDATE premium_channel SET title_updated_at = ? WHERE id = ?", (db_now() - timedelta(days=2), -1007000000010)
+    )
+
+    service = ChannelTitleService(ttl=3600)
+    bot = _bot({-1007000000010: "Yangi nom"})
+
+    assert await service.titles(bot, 7002, premium=True) == {-1007000000010: "Eski nom"}
+    await asyncio.gather(*list(service._tasks))
+    assert await service.title(None, 7002, -1007000000010, premium=True) == "Yangi nom"
+    assert bot.get_chat.await_count == 1
@@ -85,3 +85,307 @@ async def test_premium_cache(db):
     assert await db.is_premium_user(user_id) is True
 
     assert await db.is_premium_user(user_id) is True
+
+
+def test_prepare_query_placeholders():
+    """Test ? placeholders are translated for both drivers."""
+    from utils.database import prepare_query
+
+    prepared = prepare_query("UPDATE users SET subscription = ? WHERE id = ?")
+    assert prepared.param_names == ("p0", "p1")
+    assert str(prepared.clause) == "UPDATE users SET subscription = :p0 WHERE id = :p1"
+    assert prepared.native_sql == "UPDATE users SET subscription = $1 WHERE id = $2"
+
+
+@pytest.mark.asyncio
+async def test_statement_cache_reused(db):
+    """Test translated statements are cached by SQL text."""
+    await db.add_user(88888)
+    await db.user_exists(88888)
+    cached = db._stmt_cache["SELECT 1 FROM users WHERE id = ?"]
+    await db.user_exists(88888)
+    assert db._stmt_cache["SELECT 1 FROM users WHERE id = ?"] is cached
+
+
+@pytest.mark.asyncio
+async def test_add_referral_only_once(db):
+    """Test a user can be referred only once."""
+    await db.add_user(1001)
+    await db.add_user(1002)
+    await db.add_user(1003)
+    assert await db.add_referral(1001, 1003) is True
+    assert await db.add_referral(1002, 1003) is False
+    assert await db.get_referrer_of(1003) == 1001
+    row = await db.execute_query("SELECT referred_by FROM users WHERE id = ?", (1003,), fetch_one=True)
+    assert row[0] == 1001
+
+
+@pytest.mark.asyncio
+async def test_activate_subscription(db):
+    """Test premium is enabled with dates in one update."""
+    from datetime import datetime, timedelta
+    from utils.database import TZ
+
+    start = datetime.now(TZ)
+    assert await db.activate_subscription(99999, "weekly", start, start + timedelta(days=7)) is False
+
+    await db.add_user(1004)
+    assert await db.is_premium_user(1004) is False
+    assert await db.activate_subscription(1004, "weekly", start, start + timedelta(days=7)) is True
+    assert await db.is_premium_user(1004) is True
+    row = await db.execute_query("SELECT premium_type FROM users WHERE id = ?", (1004,), fetch_one=True)
+    assert row[0] == "weekly"
+
+
+@pytest.mark.asyncio
+async def test_extend_subscription_refreshes_cache(db):
+    """Test extending end_date stores a timestamp and drops the cached premium state."""
+    from datetime import datetime, timedelta
+    from utils.database import TZ
+
+    now = datetime.now(TZ)
+    assert await db.extend_subscription(99999, now) is False
+
+    await db.add_user(1005)
+    await db.activate_subscription(1005, "weekly", now - timedelta(days=8), now - timedelta(minutes=1))
+    assert await db.is_premium_user(1005) is False
+    assert await db.extend_subscription(1005, now + timedelta(days=7)) is True
+    assert await db.is_premium_user(1005) is True
+    row = await db.execute_query("SELECT premium_type, end_date FROM users WHERE id = ?", (1005,), fetch_one=True)
+    assert row[0] == "weekly"
+    assert "T" not in str(row[1])
+
+
+@pytest.mark.asyncio
+async def test_record_daily_stats_aggregates(db):
+    """Test daily stats are aggregated in SQL."""
+    await db.add_user(2001)
+    await db.add_user(2002, subscription=True)
+    await db.add_channel(-1005550000001, 2001, premium=False)
+    await db.add_channel(-1005550000002, 2002, premium=True)
+    await db.update_channel_post(-1005550000001, 1, "09:00", "a", premium=False, skip_24h_check=True)
+    await db.update_channel_post(-1005550000002, 1, "10:00", "b", premium=True, with_image='yes', skip_24h_check=True)
+    await db.update_channel_post(-1005550000002, 2, "11:00", "c", premium=True, with_image='no', skip_24h_check=True)
+
+    assert await db.count_total_active_posts() == (3, 1)
+    stats = await db.record_daily_stats()
+    assert stats == {
+        'total_users': 2, 'premium_users': 1, 'total_channels': 2,
+        'total_posts': 3, 'posts_with_image': 1,
+    }
+    history = await db.get_stats_history(days=1)
+    assert history[0][1:] == (2, 1, 2, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_api_usage_rollup_single_query(db):
+    """Test every API usage window is summed by one conditional aggregate."""
+    from datetime import datetime, timedelta
+    from utils.database import TZ
+
+    today = datetime.now(TZ)
+    for days_ago, model, inp, out, reqs in [
+        (0, "a", 100, 10, 1), (0, "b", 50, 5, 2), (3, "a", 1000, 100, 4),
+        (20, "a", 7, 7, 7), (400, "b", 1, 1, 1),
+    ]:
+        await db.execute_query(
+            "INSERT INTO api_usage (date, model, input_tokens, output_tokens, requests_count) VALUES (?, ?, ?, ?, ?)",
+            ((today - timedelta(days=days_ago)).strftime("%Y-%m-%d"), model, inp, out, reqs)
+        )
+
+    db.metrics.reset()
+    rollup = await db.get_api_usage_rollup()
+    assert sum(h.count for h in db.metrics.queries.values()) == 1
+    assert rollup == {
+        "today": (150, 15, 3), "week": (1150, 115, 7), "month": (1157, 122, 14),
+        "all": (1158, 123, 15), "days": 4,
+    }
+
+
+@pytest.mark.asyncio
+async def test_superadmins_loaded_into_memory(db):
+    """Test role checks are served from the in-memory set."""
+    await db.execute_query("INSERT INTO superadmins (id) VALUES (?)", (3001,))
+    assert await db.is_superadmin(3001) is False
+
+    await db.load_superadmins()
+    assert await db.is_superadmin(3001) is True
+    assert db._superadmin_ids == frozenset({3001})
+
+
+@pytest.mark.asyncio
+async def test_premium_cache_respects_end_date(db):
+    """Test expired premium is not reported as active."""
+    from datetime import datetime, timedelta
+    from utils.database import TZ
+
+    await db.add_user(3002)
+    now = datetime.now(TZ)
+    await db.activate_subscription(3002, "weekly", now - timedelta(days=8), now - timedelta(minutes=1))
+    assert await db.is_premium_user(3002) is False
+
+    await db.activate_subscription(3002, "weekly", now, now + timedelta(days=7))
+    assert await db.is_premium_user(3002) is True
+    assert await db.is_premium_user(3002) is True
+    assert db.premium_cache_stats()['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_premium_cache_negative(db):
+    """Test unknown users are cached as non-premium."""
+    assert await db.is_premium_user(3003) is False
+    assert await db.is_premium_user(3003) is False
+    assert db.premium_cache_stats()['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_register_user_with_referrer(db):
+    """Test /start registration links an existing referrer once."""
+    await db.add_user(4001)
+
+    result = await db.register_user(4002, referrer_id=4001)
+    assert result['is_new'] is True
+    assert result['referrer_id'] == 4001
+    assert result['is_premium'] is False
+    assert await db.get_referrer_of(4002) == 4001
+
+    again = await db.register_user(4002, referrer_id=4001)
+    assert again['is_new'] is False
+    assert again['referrer_id'] is None
+
+
+@pytest.mark.asyncio
+async def test_register_user_unknown_referrer(db):
+    """Test unknown or self referrers are ignored."""
+    result = await db.register_user(4003, referrer_id=4999)
+    assert result['is_new'] is True
+    assert result['referrer_id'] is None
+
+    result = await db.register_user(4004, referrer_id=4004)
+    assert result['referrer_id'] is None
+    assert await db.get_referrer_of(4004) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_query_chunks(db):
+    """Test rows are streamed in fixed-size chunks."""
+    for uid in range(6001, 6006):
+        await db.add_user(uid)
+
+    chunks = [chunk async for chunk in db.stream_query("SELECT id FROM users ORDER BY id", chunk_size=2)]
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[0][0]._fields == ("id",)
+
+    id_chunks = [ids async for ids in db.iter_user_ids(chunk_size=2)]
+    assert id_chunks == [[6001, 6002], [6003, 6004], [6005]]
+
+
+@pytest.mark.asyncio
+async def test_migrations_applied_once(db):
+    """Test each migration is recorded once and not re-run."""
+    from utils.migrations import LATEST_VERSION, MIGRATIONS, run_migrations
+
+    rows = await db.execute_query("SELECT version FROM schema_version ORDER BY version", fetch_all=True)
+    assert [r[0] for r in rows] == [m.version for m in MIGRATIONS]
+
+    assert await run_migrations(db._engine) == LATEST_VERSION
+    rows = await db.execute_query("SELECT COUNT(*) FROM schema_version", fetch_one=True)
+    assert rows[0] == len(MIGRATIONS)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_referrals_rebuilt_with_rowid(tmp_path, monkeypatch):
+    """Test old SQLite referrals (SERIAL id) get numbered ids and change-log triggers after upgrading."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from utils import migrations
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    try:
+        # change_log dan oldingi baza: referrals.id NULL bo'lib qolgan
+        monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:5])
+        monkeypatch.setattr(migrations, "LATEST_VERSION", 5)
+        await migrations.run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(text("INSERT INTO referrals (referrer_id, referred_id) VALUES (1, 2)"))
+
+        monkeypatch.undo()
+        assert await migrations.run_migrations(engine) == migrations.LATEST_VERSION
+        async with engine.begin() as conn:
+            await conn.execute(text("INSERT INTO referrals (referrer_id, referred_id) VALUES (1, 3)"))
+            ids = (await conn.execute(text("SELECT id FROM referrals ORDER BY referred_id"))).scalars().all()
+            logged = (await conn.execute(text("SELECT row_id FROM change_log WHERE table_name = 'referrals'"))).scalars().all()
+    finally:
+        await engine.dispose()
+
+    assert ids == [1, 2]
+    assert logged == [2]
+
+
+@pytest.mark.asyncio
+async def test_expire_due_premiums_bulk(db):
+    """Test due premiums are expired in one update and cache is invalidated."""
+    from datetime import datetime, timedelta
+    from utils.database import TZ
+
+    now = datetime.now(TZ)
+    for uid, end in ((5001, now - timedelta(minutes=1)), (5002, now + timedelta(hours=1)),
+                     (5003, now + timedelta(days=3))):
+        await db.add_user(uid)
+        await db.activate_subscription(uid, "weekly", now - timedelta(days=7), end)
+
+    upcoming = await db.get_upcoming_premium_expirations(now + timedelta(hours=2))
+    assert [row[0] for row in upcoming] == [5001, 5002]
+
+    assert await db.expire_due_premiums() == [5001]
+    assert await db.expire_due_premiums() == []
+    assert await db.is_premium_user(5002) is True
+    row = await db.execute_query("SELECT subscription FROM users WHERE id = ?", (5001,), fetch_one=True)
+    assert not row[0]
+
+
+@pytest.mark.asyncio
+async def test_reporting_queries_use_replica(db, tmp_path):
+    """Test reporting reads go to the replica and fall back to the primary."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from utils.migrations import run_migrations
+
+    await db.add_user(8001)
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    await run_migrations(replica)
+    db._replica_engine = replica
+    try:
+        assert await db.get_total_users() == 0
+        assert await db.user_exists(8001) is True
+
+        # Replica ishlamay qolsa primary ga qaytadi
+        await replica.dispose()
+        db._replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'r.db'}")
+        db._replica_checked_at = 0.0
+        assert await db.get_total_users() == 1
+        assert db._replica_healthy is False
+    finally:
+        await db._replica_engine.dispose()
+        db._replica_engine = None
+
+
+@pytest.mark.asyncio
+async def test_query_metrics_recorded(db, caplog):
+    """Test queries are timed by name and slow ones are logged without values."""
+    import logging
+    from utils.db_metrics import DBMetrics, render_prometheus
+
+    db.metrics = DBMetrics(slow_query_ms=0)
+    try:
+        with caplog.at_level(logging.WARNING, logger="utils.db_metrics"):
+            await db.user_exists(424242)
+        hist = db.metrics.queries["select_users"]
+        assert hist.count == 1
+        assert db.metrics.checkout.count == 1
+        assert "424242" not in caplog.text
+        assert "params=(int)" in caplog.text
+
+        text = render_prometheus(db.metrics, db.pool_stats())
+        assert 'univerbot_db_query_seconds_count{query="select_users"} 1' in text
+    finally:
+        del db.metrics
@@ -0,0 +1,86 @@
+"""Tests for reading log windows across rotated files."""
+import gzip
+from datetime import datetime, timedelta
+
+from utils.log_reader import export_window, find_offset, log_files, window_ranges
+
+START = datetime(2026, 3, 1, 0, 0, 0)
+
+
+def _write_logs(tmp_path, minutes_per_file=(0, 600, 1200), lines_per_file=600):
+    # bot.log.2 (eng eski), bot.log.1, bot.log — har daqiqada bitta yozuv, ba'zilari traceback bilan
+    names = ["bot.log.2", "bot.log.1", "bot.log"]
+    expected = []
+    for name, first in zip(names, minutes_per_file):
+        with open(tmp_path / name, "w", encoding="utf-8") as f:
+            for i in range(lines_per_file):
+                ts = START + timedelta(minutes=first + i)
+                level = "ERROR" if i % 50 == 0 else "WARNING" if i % 30 == 0 else "INFO"
+                record = f"{ts:%Y-%m-%d %H:%M:%S},123 - bot - {level} - xabar {first + i}\n"
+                if level == "ERROR":
+                    record += "Traceback (most recent call last):\n  File \"x.py\", line 1\n"
+                f.write(record)
+                expected.append((ts, record))
+    return expected
+
+
+def test_log_files_order(tmp_path):
+    """Test rotated files are listed oldest first and missing ones skipped."""
+    _write_logs(tmp_path)
+    (tmp_path / "bot.log.2").unlink()
+    assert log_files(str(tmp_path), "bot.log", 3) == [str(tmp_path / "bot.log.1"), str(tmp_path / "bot.log")]
+
+
+def test_find_offset_matches_linear_scan(tmp_path):
+    """Test the binary search lands on the first record at or after the cutoff."""
+    expected = _write_logs(tmp_path)
+    path = tmp_path / "bot.log.1"
+    data = path.read_bytes()
+    with open(path, "rb") as f:
+        for minute in (590, 600, 601, 777, 1199, 1200):
+            cutoff = START + timedelta(minutes=minute)
+            offset = find_offset(f, len(data), f"{cutoff:%Y-%m-%d %H:%M:%S}".encode())
+            first = next((r for ts, r in expected[600:1200] if ts >= cutoff), None)
+            if first is None:
+                assert offset == len(data)
+            else:
+                assert data[offset:].startswith(first.encode())
+
+
+def test_export_window_spans_rotated_files(tmp_path):
+    """Test the export covers the window across files with on-the-fly level counts."""
+    expected = _write_logs(tmp_path)
+    paths = log_files(str(tmp_path), "bot.log", 3)
+    cutoff = START + timedelta(minutes=900)
+
+    assert [p for p, _, _ in window_ranges(cutoff, paths)] == paths[1:]
+
+    export = export_window(cutoff, str(tmp_path / "out.txt.gz"), paths)
+    wanted = "".join(r for ts, r in expected if ts >= cutoff)
+    assert gzip.decompress((tmp_path / "out.txt.gz").read_bytes()).decode() == wanted
+    assert export.lines == wanted.count("\n")
+    assert export.errors == wanted.count(" - ERROR - ")
+    assert export.warnings == wanted.count(" - WARNING - ")
+    assert not export.truncated
+
+    limited = export_window(cutoff, str(tmp_path / "tail.txt.gz"), paths, max_bytes=2000)
+    tail = gzip.decompress((tmp_path / "tail.txt.gz").read_bytes()).decode()
+    assert limited.truncated and 0 < len(tail) <= 2000
+    assert wanted.endswith(tail) and tail[:4] == "2026"
+
+    assert export_window(datetime(2030, 1, 1), str(tmp_path / "none.gz"), paths).lines == 0
+
+
+def test_json_lines_with_any_spacing(tmp_path):
+    """Test JSON records are parsed whether or not the formatter adds spaces."""
+    lines = [
+        '{"time": "2026-03-01T10:00:00", "level": "ERROR", "message": "a"}\n',
+        '{"time":"2026-03-01T11:00:00","level":"WARNING","message":"b"}\n',
+        '{ "time" : "2026-03-01T12:00:00", "level" : "ERROR", "message": "c"}\n',
+    ]
+    (tmp_path / "bot.log").write_text("".join(lines), encoding="utf-8")
+    out = tmp_path / "out.gz"
+
+    export = export_window(datetime(2026, 3, 1, 10, 30), str(out), [str(tmp_path / "bot.log")])
+    assert gzip.decompress(out.read_bytes()).decode() == "".join(lines[1:])
+    assert (export.lines, export.errors, export.warnings) == (2, 1, 1)
@@ -0,0 +1,65 @@
+"""Tests for the queued logging setup."""
+import gzip
+import json
+import logging
+import queue
+from datetime import datetime, timedelta
+
+import pytest
+
+import logging_config
+from logging_config import DroppingQueueHandler, JsonFormatter, SamplingFilter
+from utils.log_reader import export_window
+
+
+def _record(level=logging.INFO, name="services.post_scheduler", msg="post"):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+
+def test_sampling_filter_keeps_every_nth_info():
+    """Test sampled loggers keep 1 of N INFO records and all warnings."""
+    sampler = SamplingFilter(rate=0.1, loggers=("services.post_scheduler",))
+    kept = sum(sampler.filter(_record()) for _ in range(100))
+    assert kept == 10
+    assert all(sampler.filter(_record(logging.WARNING)) for _ in range(5))
+    assert all(sampler.filter(_record(name="bot")) for _ in range(5))
+
+
+def test_dropping_queue_handler_never_blocks_and_reports():
+    """Test a full queue drops records and later reports how many were lost."""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(_record(msg=f"m{i}"))
+    assert handler.dropped == 3
+
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["m0", "m1"]
+    handler.handle(_record(msg="after"))
+    notice, after = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert handler.queue.empty()
+    assert after.getMessage() == "after"
+    assert notice.levelno == logging.WARNING and "3 ta yozuv" in notice.getMessage()
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_formatter_round_trip(tmp_path, monkeypatch, use_orjson):
+    """Test JsonFormatter lines are found and counted by the log reader."""
+    if use_orjson and logging_config.orjson is None:
+        pytest.skip("orjson o'rnatilmagan")
+    if not use_orjson:
+        monkeypatch.setattr(logging_config, "orjson", None)
+
+    formatter = JsonFormatter()
+    start = datetime(2026, 3, 1, 10, 0, 0)
+    lines = []
+    for minute, level in enumerate((logging.INFO, logging.ERROR, logging.WARNING, logging.ERROR)):
+        record = _record(level=level, msg="Bo'sh o‘rin ✅")
+        record.created = (start + timedelta(minutes=minute)).timestamp()
+        lines.append(formatter.format(record) + "\n")
+    path = tmp_path / "bot.log"
+    path.write_text("".join(lines), encoding="utf-8")
+    out = tmp_path / "out.gz"
+
+    export = export_window(start + timedelta(seconds=30), str(out), [str(path)])
+    assert gzip.decompress(out.read_bytes()).decode("utf-8") == "".join(lines[1:])
+    assert (export.lines, export.errors, export.warnings) == (3, 2, 1)
+    assert json.loads(lines[0])["message"] == "Bo'sh o‘rin ✅"
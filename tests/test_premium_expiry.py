@@ -0,0 +1,49 @@
+"""Tests for the premium expiry timer heap."""
+import logging
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from services import premium_expiry
+from services.premium_expiry import PremiumExpiryScheduler
+from utils.database import TZ
+
+
+def test_schedule_replaces_previous_deadline():
+    """Test a renewed premium does not fire at its old deadline."""
+    scheduler = PremiumExpiryScheduler()
+    scheduler._loaded_until = time.time() + 3600
+    now = datetime.now(TZ)
+
+    scheduler.schedule(1, now - timedelta(seconds=1))
+    scheduler.schedule(2, now - timedelta(seconds=1))
+    scheduler.schedule(2, now + timedelta(minutes=30))
+    assert scheduler._pop_due(time.time()) is True
+    assert 1 not in scheduler._deadlines
+    assert 2 in scheduler._deadlines
+
+    # Horizon dan tashqari muddat heap ga tushmaydi
+    scheduler.schedule(2, now + timedelta(days=30))
+    assert len(scheduler) == 0
+    assert scheduler._pop_due(time.time() + 1800) is False
+
+
+@pytest.mark.asyncio
+async def test_notify_logs_drop_after_repeated_retry_after(db, monkeypatch, caplog):
+    """Test a notification still rate limited on the last attempt is logged, not silently lost."""
+    monkeypatch.setattr(premium_expiry.asyncio, "sleep", AsyncMock())
+    await db.add_user(7)
+    scheduler = PremiumExpiryScheduler()
+    scheduler.bot = MagicMock()
+    scheduler.bot.send_message = AsyncMock(
+        side_effect=TelegramRetryAfter(method=MagicMock(), message="Too Many Requests", retry_after=3)
+    )
+
+    with caplog.at_level(logging.WARNING, logger="services.premium_expiry"):
+        await scheduler._notify([7])
+
+    assert scheduler.bot.send_message.await_count == premium_expiry.NOTIFY_ATTEMPTS
+    assert "notify dropped for 7" in caplog.text
@@ -0,0 +1,100 @@
+"""Tests for the unreachable chat registry."""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError
+
+from services.reachability import reachability, unreachable_reason
+from utils.database import db_now
+
+
+def _forbidden(message="Forbidden: bot was blocked by the user"):
+    return TelegramForbiddenError(method=MagicMock(), message=message)
+
+
+def test_unreachable_reason():
+    """Test permanent errors are classified and transient ones are ignored."""
+    assert unreachable_reason(_forbidden()) == "blocked"
+    assert unreachable_reason(_forbidden("Forbidden: bot was kicked from the channel chat")) == "kicked"
+    assert unreachable_reason(_forbidden("Forbidden: something new")) == "forbidden"
+    assert unreachable_reason(TelegramBadRequest(method=MagicMock(), message="Bad Request: chat not found")) == "not_found"
+    assert unreachable_reason(TelegramBadRequest(method=MagicMock(), message="Bad Request: message is too long")) is None
+    assert unreachable_reason(TelegramNetworkError(method=MagicMock(), message="timeout")) is None
+
+
+@pytest.mark.asyncio
+async def test_blocked_users_are_skipped_until_recheck(db):
+    """Test marked users leave iter_user_ids and return after the recheck window."""
+    for uid in range(1, 5):
+        await db.add_user(uid)
+
+    await reachability.mark_users({2: "blocked", 3: "deactivated"})
+    ids = [uid async for chunk in db.iter_user_ids(reachable_only=True) for uid in chunk]
+    assert ids == [1, 4]
+    assert await db.filter_reachable_users([3, 4, 1]) == [4, 1]
+    row = await db.execute_query("SELECT inactive_reason FROM users WHERE id = ?", (2,), fetch_one=True)
+    assert row[0] == "blocked"
+
+    # Qayta tekshirish muddati o'tdi — 2 yana sinaladi va yetib boradi
+    await db.execute_query("UPDATE users SET inactive_at = ? WHERE id = ?", (db_now() - timedelta(days=30), 2))
+    ids = [uid async for chunk in db.iter_user_ids(reachable_only=True) for uid in chunk]
+    assert ids == [1, 2, 4]
+    await reachability.users_reached([1, 2, 4])
+    row = await db.execute_query("SELECT inactive_at FROM users WHERE id = ?", (2,), fetch_one=True)
+    assert row[0] is None
+    assert await db.filter_reachable_users([3]) == []
+
+
+@pytest.mark.asyncio
+async def test_scheduler_skips_and_rechecks_unreachable_channels(db):
+    """Test kicked channels leave the scheduler index and are probed lazily."""
+    from services.post_scheduler import PostScheduler
+
+    scheduler = PostScheduler(MagicMock())
+    current = datetime.now(scheduler.tz).strftime("%H:%M")
+    await db.add_user(10)
+    await db.add_channel(-1001, 10)
+    await db.add_channel(-1002, 10)
+    for channel_id in (-1001, -1002):
+        await db.execute_query("UPDATE channel SET post1 = ?, theme1 = ? WHERE id = ?", (current, "AI", channel_id))
+
+    assert await reachability.channel_failed(-1002, False, _forbidden("Forbidden: bot was kicked"))
+    posts = await scheduler.get_all_scheduled_posts()
+    assert [(p['channel_id'], p['recheck']) for p in posts] == [(-1001, False)]
+
+    await db.execute_query("UPDATE channel SET inactive_at = ? WHERE id = ?", (db_now() - timedelta(days=30), -1002))
+    posts = await scheduler.get_all_scheduled_posts()
+    assert sorted((p['channel_id'], p['recheck']) for p in posts) == [(-1002, True), (-1001, False)]
+
+    bot = MagicMock()
+    bot.get_chat = AsyncMock()
+    assert await reachability.recheck_channel(bot, -1002, False) is True
+    row = await db.execute_query("SELECT inactive_at FROM channel WHERE id = ?", (-1002,), fetch_one=True)
+    assert row[0] is None
+
+    bot.get_chat = AsyncMock(side_effect=TelegramBadRequest(method=MagicMock(), message="Bad Request: chat not found"))
+    assert await reachability.recheck_channel(bot, -1002, False) is False
+    row = await db.execute_query("SELECT inactive_reason FROM channel WHERE id = ?", (-1002,), fetch_one=True)
+    assert row[0] == "not_found"
+
+
+@pytest.mark.asyncio
+async def test_incoming_update_clears_unreachable_mark(db):
+    """Test a marked user who sends an update is reachable again without waiting for the recheck."""
+    from middlewares.user_context import UserContextMiddleware
+
+    await db.add_user(20)
+    await reachability.mark_users({20: "blocked"})
+    assert await db.filter_reachable_users([20]) == []
+
+    handler = AsyncMock(return_value="ok")
+    data = {"event_from_user": MagicMock(id=20)}
+    assert await UserContextMiddleware()(handler, MagicMock(), data) == "ok"
+    assert data["user_ctx"].user_id == 20
+    assert await db.filter_reachable_users([20]) == [20]
+
+    # Qayta bloklasa — keyingi update yana belgini oladi
+    await reachability.mark_users({20: "blocked"})
+    await UserContextMiddleware()(handler, MagicMock(), data)
+    assert await db.filter_reachable_users([20]) == [20]
@@ -3,6 +3,7 @@ import pytest
 from utils.security import (
     check_rate_limit,
     sanitize_channel_id,
+    sanitize_referrer_id,
     validate_broadcast_message,
     sanitize_text_input,
     validate_theme,
@@ -38,6 +39,15 @@ def test_sanitize_channel_id_invalid():
     assert sanitize_channel_id("invalid") is None
 
 
+def test_sanitize_referrer_id():
+    """Test referral payloads outside the BIGINT range are dropped."""
+    assert sanitize_referrer_id("ref_123456") == 123456
+    assert sanitize_referrer_id(f"ref_{2 ** 63 - 1}") == 2 ** 63 - 1
+    assert sanitize_referrer_id(f"ref_{2 ** 63}") is None
+    assert sanitize_referrer_id("ref_0") is None
+    assert sanitize_referrer_id("ref_abc") is None
+
+
 def test_validate_broadcast_message_valid():
     """Test valid broadcast message."""
     is_valid, _ = validate_broadcast_message("Hello users!")
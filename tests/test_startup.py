@@ -0,0 +1,87 @@
+"""Tests for bot startup: import cost and the time-to-first-poll timer."""
+import json
+import logging
+import os
+import subprocess
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+from utils.startup_timer import StartupTimer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bot jarayoniga startda yuklanmasligi kerak bo'lgan og'ir modullar
+HEAVY_MODULES = ("matplotlib", "openai", "httpx")
+# aiogram.types ning o'zi ~2-3s; sekin CI uchun zaxira bilan
+IMPORT_BUDGET_SECONDS = 10.0
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import logging
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules],
+                  "handlers": len(logging.getLogger().handlers)}))
+""" % (HEAVY_MODULES,)
+
+
+def test_main_import_skips_heavy_modules(tmp_path):
+    """Test importing the bot loads no heavy modules, configures no logging and stays within budget."""
+    env = dict(os.environ, LOG_DIR=str(tmp_path))
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert data["loaded"] == []
+    # Spawn qilingan worker main.py ni import qiladi — log handlerlar faqat __main__ da
+    assert data["handlers"] == 0
+    assert data["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_startup_timer_report():
+    """Test phases and time-to-first-poll appear in the log report and Prometheus output."""
+    timer = StartupTimer()
+    with timer.phase("db.initialize"):
+        pass
+    timer.mark_first_poll()
+
+    assert [name for name, _ in timer.phases] == ["db.initialize"]
+    assert "time-to-first-poll" in timer.report()
+    metrics = timer.render_prometheus()
+    assert 'univerbot_startup_phase_seconds{phase="db.initialize"}' in metrics
+    assert "univerbot_time_to_first_poll_seconds" in metrics
+
+
+@pytest.mark.asyncio
+async def test_first_poll_probe_records_time_to_first_poll(monkeypatch, caplog):
+    """Test the session probe stamps time-to-first-poll on the first getUpdates only and logs the report."""
+    import main
+    from aiogram.methods import GetMe, GetUpdates
+
+    timer = StartupTimer()
+    monkeypatch.setattr(main, "startup_timer", timer)
+    manager = main.BotManager()
+    timer.mark("imports")
+    with timer.phase("db.initialize"):
+        pass
+    make_request = AsyncMock(return_value="response")
+
+    assert await manager._first_poll_probe(make_request, manager.bot, GetMe()) == "response"
+    assert timer.first_poll is None
+
+    with caplog.at_level(logging.INFO, logger="bot"):
+        await manager._first_poll_probe(make_request, manager.bot, GetUpdates())
+    first_poll = timer.first_poll
+    assert first_poll is not None and first_poll > 0
+    assert [name for name, _ in timer.phases] == ["imports", "db.initialize"]
+    assert "time-to-first-poll" in caplog.text
+
+    # Keyingi pollar o'lchovni o'zgartirmaydi
+    await manager._first_poll_probe(make_request, manager.bot, GetUpdates())
+    assert timer.first_poll == first_poll
+    assert make_request.await_count == 3
+    await manager.bot.session.close()
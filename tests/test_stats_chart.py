@@ -0,0 +1,56 @@
+"""Tests for off-loop stats chart rendering and caching."""
+import pytest
+
+from utils import stats_chart
+
+
+ROWS = [
+    ("2026-01-02", 12, 3, 5, 9, 2),
+    ("2026-01-01", 10, 2, 4, 7, 1),
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_chart_state():
+    stats_chart._cache.clear()
+    yield
+    stats_chart.shutdown_chart_pool()
+    stats_chart._cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_render_stats_chart_in_process_pool():
+    """Test the chart renders in the worker process and repeats hit the cache."""
+    png = await stats_chart.render_stats_chart(ROWS)
+    assert png and png.startswith(b"\x89PNG")
+
+    stats_chart.shutdown_chart_pool()
+    assert await stats_chart.render_stats_chart(list(ROWS)) is png
+    assert stats_chart._executor is None
+
+
+@pytest.mark.asyncio
+async def test_render_stats_chart_cache_keyed_by_rows(monkeypatch):
+    """Test changed rows miss the cache and the cache stays bounded."""
+    calls = []
+
+    async def fake_run(rows):
+        calls.append(rows)
+        return b"png-%d" % len(calls)
+
+    class Loop:
+        def run_in_executor(self, executor, fn, rows):
+            return fake_run(rows)
+
+    monkeypatch.setattr(stats_chart, "_get_executor", lambda: None)
+    monkeypatch.setattr(stats_chart.asyncio, "get_running_loop", lambda: Loop())
+
+    for i in range(stats_chart.CHART_CACHE_SIZE + 2):
+        await stats_chart.render_stats_chart([("2026-01-01", i, 0, 0, 0, 0)])
+    assert len(calls) == stats_chart.CHART_CACHE_SIZE + 2
+    assert len(stats_chart._cache) == stats_chart.CHART_CACHE_SIZE
+
+    await stats_chart.render_stats_chart([("2026-01-01", 0, 0, 0, 0, 0)])
+    assert len(calls) == stats_chart.CHART_CACHE_SIZE + 3
+    assert await stats_chart.render_stats_chart([("2026-01-01", 0, 0, 0, 0, 0)]) == b"png-%d" % len(calls)
+    assert len(calls) == stats_chart.CHART_CACHE_SIZE + 3
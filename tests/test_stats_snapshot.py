@@ -0,0 +1,46 @@
+"""Tests for the cached admin statistics snapshot."""
+import pytest
+
+from services.stats_snapshot import StatsSnapshotService
+
+
+@pytest.mark.asyncio
+async def test_snapshot_served_from_cache_within_ttl(db):
+    """Test repeated opens reuse the snapshot until refresh or TTL expiry."""
+    service = StatsSnapshotService(ttl=60)
+    await db.add_user(4501)
+
+    first = await service.get()
+    assert first.stats["total_users"] == 1
+    assert first.usage["days"] == 0
+    assert first.history[0][1] == 1
+
+    await db.add_user(4502)
+    db.metrics.reset()
+    assert await service.get() is first
+    assert db.metrics.queries == {}
+
+    refreshed = await service.get(refresh=True)
+    assert refreshed.stats["total_users"] == 2
+
+    service.ttl = 0
+    assert await service.get() is not refreshed
+
+
+@pytest.mark.asyncio
+async def test_snapshot_history_includes_today_with_lagging_replica(db, tmp_path):
+    """Test the history is read from the primary so today's fresh row is never missing."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from utils.migrations import run_migrations
+
+    await db.add_user(4601)
+    # Bo'sh replica — orqada qolgan replica kabi
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    await run_migrations(replica)
+    db._replica_engine = replica
+    try:
+        snapshot = await StatsSnapshotService(ttl=60).get()
+        assert snapshot.history and snapshot.history[0][1] == 1
+    finally:
+        await replica.dispose()
+        db._replica_engine = None
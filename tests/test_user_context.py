@@ -0,0 +1,35 @@
+"""Tests for the per-update user context."""
+import pytest
+
+from middlewares.user_context import UserContext
+
+
+@pytest.mark.asyncio
+async def test_channels_loaded_once_per_update(db, mocker):
+    """Test channel rows are queried once per update and again after invalidate."""
+    await db.add_user(5001)
+    await db.add_channel(-1006660000001, 5001, premium=False)
+    spy = mocker.spy(db, "get_user_channels")
+
+    ctx = UserContext(5001)
+    assert await ctx.channel_count(premium=False) == 1
+    assert await ctx.first_channel_id(premium=False) == -1006660000001
+    assert await ctx.channel(-1006660000001, premium=False) is not None
+    assert spy.call_count == 1
+
+    ctx.invalidate()
+    await ctx.channels(premium=False)
+    assert spy.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_channel_posts_from_context(db):
+    """Test posts and the next free post number are derived from the cached channel row."""
+    await db.add_user(5002)
+    await db.add_channel(-1006660000002, 5002, premium=True)
+    await db.update_channel_post(-1006660000002, 1, "09:00", "theme", premium=True, skip_24h_check=True)
+
+    ctx = UserContext(5002)
+    posts = await ctx.channel_posts(-1006660000002, premium=True)
+    assert posts == [{'post_num': 1, 'time': "09:00", 'theme': "theme"}]
+    assert await ctx.next_post_num(-1006660000002, premium=True) == 2
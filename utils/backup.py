@@ -1,12 +1,48 @@
-"""Kunlik PostgreSQL backup — SQL dump fayl yaratish."""
+"""Kunlik backup — jadvallar CSV (siqilgan) + manifest, bitta .tar faylda.
 
+Tuzilishi:
+    backup_YYYY-MM-DD.tar
+    ├── manifest.json          # jadval → fayl, qatorlar soni, sha256, ustunlar
+    ├── users.csv.gz           # CSV, sarlavha bilan, NULL = \\N
+    └── ...
+
+PostgreSQL da har bir jadval `COPY ... TO STDOUT` bilan oqim ko'rinishida olinadi,
+boshqa drayverlarda stream_query orqali. Siqish va diskka yozish alohida threadda,
+tayyor arxiv vaqtinchalik fayldan atomik rename qilinadi.
+
+Inkremental rejim: haftada bir to'liq backup (backup_*.tar), qolgan kunlari delta
+(delta_*.tar) — change_log bo'yicha o'zgargan qatorlar va o'chirilgan id lar.
+Tiklash: python -m utils.restore backup_X.tar delta_Y.tar delta_Z.tar
+
+Telegram orqali yuborish: limitdan katta arxiv bo'laklarga bo'linadi (parts/), yuborilgan
+bo'laklarning file_id lari keshlanadi — qayta yuklab olish diskdan o'qimaydi.
+"""
+
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
 import logging
-from datetime import datetime
+import tarfile
+import tempfile
+from datetime import datetime, date
+from typing import BinaryIO, List, Optional, Tuple
 from zoneinfo import ZoneInfo
-from sqlalchemy import text
 
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import BACKUP_COMPRESSION, BACKUP_FULL_WEEKDAY, BACKUP_KEEP_FULL
 from utils.database import db
+from utils.migrations import CHANGE_LOG_TABLES
+
+try:
+    import zstandard
+except ImportError:  # ixtiyoriy: pip install zstandard
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
@@ -14,90 +50,394 @@ TZ = ZoneInfo("Asia/Tashkent")
 
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backups")
 TABLES = ["superadmins", "users", "channel", "premium_channel", "daily_stats", "referrals", "api_usage"]
+BACKUP_CHUNK_SIZE = 1000
+BACKUP_EXTENSIONS = (".tar", ".sql")  # .sql — eski formatdagi backuplar
+MANIFEST_NAME = "manifest.json"
+CSV_NULL = "\\N"
+FULL_PREFIX = "backup_"
+DELTA_PREFIX = "delta_"
+
+# Bot API yuklash limiti 50 MB — zaxira bilan
+UPLOAD_PART_SIZE = 49 * 1024 * 1024
+UPLOAD_COPY_CHUNK = 1024 * 1024
+PARTS_DIR_NAME = "parts"
+UPLOAD_CACHE_NAME = "upload_cache.json"
+
+# Delta: change_log oralig'ida (since, position] o'zgargan qatorlar
+_CHANGED_IDS_WHERE = "id IN (SELECT row_id FROM change_log WHERE table_name = ? AND id > ? AND id <= ?)"
+
+
+class _HashingWriter:
+    """Faylga yozib, yozilgan (siqilgan) baytlardan sha256 hisoblaydi."""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def flush(self):
+        self._f.flush()
+
+
+class _CompressedFile:
+    """Siqib yozuvchi fayl. Barcha metodlar bloklovchi — threadda chaqiriladi."""
+
+    def __init__(self, path: str, compression: str):
+        self._raw = open(path, "wb")
+        self._hashing = _HashingWriter(self._raw)
+        if compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=3).stream_writer(self._hashing, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._hashing, mode="wb", compresslevel=6, mtime=0)
+
+    def write(self, data: bytes):
+        self._stream.write(data)
+
+    def close(self):
+        self._stream.close()
+        self._raw.close()
+
+    @property
+    def sha256(self) -> str:
+        return self._hashing.sha256.hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self._hashing.size
+
+
+def _resolve_compression() -> str:
+    if BACKUP_COMPRESSION == "zstd":
+        if zstandard is not None:
+            return "zstd"
+        logger.warning("BACKUP_COMPRESSION=zstd, lekin zstandard o'rnatilmagan — gzip ishlatiladi")
+    return "gzip"
+
 
+def _csv_value(val):
+    """Python qiymatini PostgreSQL COPY CSV ko'rinishiga o'girish."""
+    if val is None:
+        return CSV_NULL
+    if isinstance(val, bool):
+        return "t" if val else "f"
+    if isinstance(val, datetime):
+        return val.isoformat(sep=" ")
+    if isinstance(val, date):
+        return val.isoformat()
+    return val
 
-async def create_backup(backup_name: str = "backup.sql") -> str | None:
-    """Barcha jadvallarni SQL dump qilib faylga yozish.
+
+def _encode_csv_rows(rows, header: Optional[List[str]] = None) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+    writer.writerows([_csv_value(v) for v in row] for row in rows)
+    return buf.getvalue().encode("utf-8")
+
+
+async def _dump_table(table: str, out: _CompressedFile, engine: AsyncEngine,
+                      where: Optional[str] = None, params: tuple = ()) -> dict:
+    """Jadvalni (yoki where shartidagi qatorlarni) `out` ga oqim ko'rinishida yozish."""
+
+    async def sink(data: bytes):
+        await asyncio.to_thread(out.write, data)
+
+    # Fast path: asyncpg COPY — qatorlar Python obyektlariga aylantirilmaydi
+    rows = await db.copy_table_to(table, sink, engine=engine, where=where, params=params)
+    if rows is not None:
+        columns = await db.get_table_columns(table, engine=engine)
+        return {"rows": rows, "columns": columns}
+
+    query = f"SELECT * FROM {table}" + (f" WHERE {where}" if where else "")
+    rows = 0
+    columns: List[str] = []
+    async for chunk in db.stream_query(query, params, chunk_size=BACKUP_CHUNK_SIZE, engine=engine):
+        header = None
+        if not columns:
+            columns = list(chunk[0]._fields)
+            header = columns
+        # CSV formatlash ham threadda — event loop bo'sh qoladi
+        await sink(await asyncio.to_thread(_encode_csv_rows, chunk, header))
+        rows += len(chunk)
+    return {"rows": rows, "columns": columns}
+
+
+def _write_tar(tar_path: str, work_dir: str, members: List[str]):
+    with tarfile.open(tar_path, "w") as tar:
+        for name in members:
+            tar.add(os.path.join(work_dir, name), arcname=name)
+
+
+async def _write_archive(backup_name: str, manifest: dict, specs: List[Tuple[str, dict]],
+                         engine: AsyncEngine) -> str:
+    """specs: (jadval, {mode, where, params, deleted}) — har biri alohida siqilgan CSV.
+
+    engine — pozitsiya olingan engine; barcha jadvallar ham shundan o'qiladi.
+    """
+    compression = _resolve_compression()
+    ext = "csv.zst" if compression == "zstd" else "csv.gz"
+    manifest.update({
+        "format": "csv",
+        "schema_version": db.schema_version,
+        "compression": compression,
+        "null": CSV_NULL,
+        "tables": {},
+    })
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    backup_path = os.path.join(BACKUP_DIR, backup_name)
+    work_dir = tempfile.mkdtemp(prefix=".backup_", dir=BACKUP_DIR)
+    try:
+        for table, spec in specs:
+            file_name = f"{table}.{ext}"
+            out = await asyncio.to_thread(_CompressedFile, os.path.join(work_dir, file_name), compression)
+            try:
+                info = await _dump_table(table, out, engine, spec.get("where"), spec.get("params", ()))
+            finally:
+                await asyncio.to_thread(out.close)
+            manifest["tables"][table] = {
+                "file": file_name, "sha256": out.sha256, "bytes": out.size, "mode": spec["mode"], **info,
+            }
+            if "deleted" in spec:
+                manifest["tables"][table]["deleted"] = spec["deleted"]
+            logger.info(f"Backup: {table} ({spec['mode']}) — {info['rows']} qator, {out.size} bytes")
+
+        with open(os.path.join(work_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        # Yarim yozilgan arxiv hech qachon *.tar nomida ko'rinmaydi
+        tmp_path = backup_path + ".tmp"
+        members = [MANIFEST_NAME] + [t["file"] for t in manifest["tables"].values()]
+        await asyncio.to_thread(_write_tar, tmp_path, work_dir, members)
+        os.replace(tmp_path, backup_path)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+    logger.info(f"Backup yaratildi: {backup_path} ({os.path.getsize(backup_path)} bytes)")
+    return backup_path
+
+
+async def create_backup(backup_name: Optional[str] = None) -> str | None:
+    """To'liq backup: barcha jadvallar siqilgan CSV + manifest ko'rinishida .tar ga.
 
     Args:
-        backup_name: Fayl nomi (default: backup.sql)
+        backup_name: Fayl nomi (default: backup_YYYY-MM-DD.tar)
 
     Returns:
         Yaratilgan fayl yo'li yoki None
     """
+    now = datetime.now(TZ)
     try:
-        os.makedirs(BACKUP_DIR, exist_ok=True)
-        backup_path = os.path.join(BACKUP_DIR, backup_name)
-        timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-
-        lines = []
-        lines.append(f"-- UniverBot Database Backup\n")
-        lines.append(f"-- Created: {timestamp}\n")
-        lines.append(f"-- Tables: {', '.join(TABLES)}\n\n")
-
-        async with db._engine.connect() as conn:
-            for table_name in TABLES:
-                try:
-                    result = await conn.execute(text(f"SELECT * FROM {table_name}"))
-                    rows = result.fetchall()
-                    if not rows:
-                        lines.append(f"-- Table '{table_name}': empty\n\n")
-                        continue
-
-                    columns = list(rows[0]._mapping.keys())
-                    col_names = ", ".join(columns)
-
-                    lines.append(f"-- Table: {table_name} ({len(rows)} rows)\n")
-
-                    for row in rows:
-                        values = []
-                        for val in row:
-                            if val is None:
-                                values.append("NULL")
-                            elif isinstance(val, bool):
-                                values.append("TRUE" if val else "FALSE")
-                            elif isinstance(val, (int, float)):
-                                values.append(str(val))
-                            else:
-                                escaped = str(val).replace("'", "''")
-                                values.append(f"'{escaped}'")
-
-                        vals_str = ", ".join(values)
-                        lines.append(f"INSERT INTO {table_name} ({col_names}) VALUES ({vals_str}) ON CONFLICT DO NOTHING;\n")
-
-                    lines.append("\n")
-
-                except Exception as e:
-                    logger.warning(f"Backup: '{table_name}' jadvalini eksport qilib bo'lmadi: {e}")
-                    lines.append(f"-- ERROR exporting table '{table_name}': {e}\n\n")
-
-        with open(backup_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-
-        file_size = os.path.getsize(backup_path)
-        logger.info(f"Backup yaratildi: {backup_path} ({file_size} bytes)")
-        return backup_path
-
+        # Engine bir marta tanlanadi: pozitsiya va ma'lumot bitta manbadan (replica holati
+        # backup o'rtasida o'zgarsa ham). Pozitsiya dump dan OLDIN olinadi: keyingi delta
+        # undan keyingi hamma narsani qamraydi
+        engine = await db.reporting_engine()
+        position = await db.get_change_log_position(engine=engine)
+        manifest = {"type": "full", "created_at": now.isoformat(), "change_log_id": position}
+        return await _write_archive(
+            backup_name or f"{FULL_PREFIX}{now.strftime('%Y-%m-%d')}.tar",
+            manifest, [(table, {"mode": "full"}) for table in TABLES], engine,
+        )
     except Exception as e:
         logger.error(f"Backup yaratishda xatolik: {e}", exc_info=True)
         return None
 
 
-def cleanup_old_backups(keep_last: int = 7):
-    """Eski backuplarni tozalash, oxirgi N tasini qoldirish."""
-    try:
-        if not os.path.exists(BACKUP_DIR):
-            return
+async def create_delta_backup(base_name: str, since_id: int, backup_name: Optional[str] = None) -> str | None:
+    """Delta: since_id dan keyin o'zgargan qatorlar (CHANGE_LOG_TABLES) + kichik jadvallar to'liq.
 
-        files = sorted(
-            [f for f in os.listdir(BACKUP_DIR) if f.endswith(".sql")],
-            key=lambda f: os.path.getmtime(os.path.join(BACKUP_DIR, f)),
-            reverse=True
+    Args:
+        base_name: Zanjir boshidagi to'liq backup fayl nomi
+        since_id: Oldingi backup manifestidagi change_log_id
+    """
+    now = datetime.now(TZ)
+    try:
+        engine = await db.reporting_engine()
+        position = await db.get_change_log_position(engine=engine)
+        specs = []
+        for table in TABLES:
+            if table not in CHANGE_LOG_TABLES:
+                specs.append((table, {"mode": "full"}))
+                continue
+            params = (table, since_id, position)
+            specs.append((table, {
+                "mode": "upsert",
+                "where": _CHANGED_IDS_WHERE,
+                "params": params,
+                "deleted": await db.get_deleted_ids(table, since_id, position, engine=engine),
+            }))
+        manifest = {
+            "type": "delta", "created_at": now.isoformat(), "base": base_name,
+            "change_log_from": since_id, "change_log_id": position,
+        }
+        return await _write_archive(
+            backup_name or f"{DELTA_PREFIX}{now.strftime('%Y-%m-%d')}.tar", manifest, specs, engine
         )
+    except Exception as e:
+        logger.error(f"Delta backup yaratishda xatolik: {e}", exc_info=True)
+        return None
+
 
-        for old_file in files[keep_last:]:
-            os.remove(os.path.join(BACKUP_DIR, old_file))
-            logger.info(f"Eski backup o'chirildi: {old_file}")
+def read_backup_manifest(path: str) -> Optional[dict]:
+    """Arxiv manifesti; eski .sql yoki buzilgan fayl uchun None."""
+    if not path.endswith(".tar"):
+        return None
+    try:
+        with tarfile.open(path) as tar:
+            return json.load(tar.extractfile(MANIFEST_NAME))
+    except (OSError, KeyError, tarfile.TarError, ValueError):
+        return None
+
+
+async def create_scheduled_backup() -> str | None:
+    """Kunlik backup: BACKUP_FULL_WEEKDAY da (yoki zanjir bo'lmasa) to'liq, qolgan kunlari delta.
+
+    To'liq backup muvaffaqiyatli bo'lsa, u qamragan change_log yozuvlari o'chiriladi.
+    """
+    latest = next((p for p in list_backups() if p.endswith(".tar")), None)
+    previous = await asyncio.to_thread(read_backup_manifest, latest) if latest else None
+
+    if previous is None or datetime.now(TZ).weekday() == BACKUP_FULL_WEEKDAY:
+        path = await create_backup()
+        if path:
+            manifest = await asyncio.to_thread(read_backup_manifest, path)
+            await db.compact_change_log(manifest["change_log_id"])
+        return path
+
+    base = previous.get("base") or os.path.basename(latest)
+    return await create_delta_backup(base, previous["change_log_id"])
+
+
+def list_backups() -> List[str]:
+    """Backup fayllari (to'liq yo'l), eng yangisi birinchi."""
+    if not os.path.exists(BACKUP_DIR):
+        return []
+    paths = [
+        os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR)
+        if f.endswith(BACKUP_EXTENSIONS)
+    ]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def latest_backup_chain() -> List[str]:
+    """Tiklash uchun kerakli fayllar: oxirgi to'liq backup va undan keyingi deltalar (eskisi birinchi).
+
+    Deltalar zanjir bo'lib ketma-ket qo'llanadi, shuning uchun bittasi o'zi yetarli emas.
+    """
+    chain = []
+    for path in list_backups():
+        chain.append(path)
+        if not os.path.basename(path).startswith(DELTA_PREFIX):
+            return chain[::-1]
+    return []  # to'liq backupsiz deltalarni tiklab bo'lmaydi
+
+
+def cleanup_old_backups(keep_full: int = BACKUP_KEEP_FULL):
+    """Oxirgi keep_full ta to'liq backup va ularning deltalarini qoldirish, qolganini o'chirish."""
+    try:
+        full_seen = 0
+        for path in list_backups():
+            if full_seen >= keep_full:
+                os.remove(path)
+                _forget_upload(os.path.basename(path))
+                logger.info(f"Eski backup o'chirildi: {os.path.basename(path)}")
+            elif not os.path.basename(path).startswith(DELTA_PREFIX):
+                full_seen += 1
 
     except Exception as e:
         logger.warning(f"Backup tozalashda xatolik: {e}")
+
+
+def _parts_dir() -> str:
+    return os.path.join(BACKUP_DIR, PARTS_DIR_NAME)
+
+
+def _upload_key(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def _load_upload_cache() -> dict:
+    try:
+        with open(os.path.join(BACKUP_DIR, UPLOAD_CACHE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_upload_cache(cache: dict):
+    path = os.path.join(BACKUP_DIR, UPLOAD_CACHE_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def _forget_upload(name: str):
+    """O'chirilgan backupning bo'laklari va file_id keshini tozalash."""
+    cache = _load_upload_cache()
+    if cache.pop(name, None) is not None:
+        _save_upload_cache(cache)
+    parts_dir = _parts_dir()
+    if os.path.isdir(parts_dir):
+        for part in os.listdir(parts_dir):
+            if part.startswith(name):
+                os.remove(os.path.join(parts_dir, part))
+
+
+def get_cached_file_ids(path: str) -> Optional[List[str]]:
+    """Avval yuborilgan bo'laklarning file_id lari (fayl o'zgarmagan bo'lsa)."""
+    entry = _load_upload_cache().get(os.path.basename(path))
+    if entry and entry.get("key") == _upload_key(path):
+        return entry["file_ids"]
+    return None
+
+
+def cache_file_ids(path: str, file_ids: List[str]):
+    cache = _load_upload_cache()
+    cache[os.path.basename(path)] = {"key": _upload_key(path), "file_ids": file_ids}
+    _save_upload_cache(cache)
+
+
+def prepare_upload_parts(path: str, part_size: int = UPLOAD_PART_SIZE) -> List[str]:
+    """Yuborish uchun fayllar: eski .sql gzip qilinadi, limitdan kattasi bo'laklarga bo'linadi.
+
+    Bo'laklar parts/ da saqlanadi va qayta ishlatiladi. Yig'ish: cat NAME.0* > NAME
+    Bloklovchi — asyncio.to_thread orqali chaqiring.
+    """
+    name = os.path.basename(path)
+    parts_dir = _parts_dir()
+    os.makedirs(parts_dir, exist_ok=True)
+    source = path
+    if name.endswith(".sql"):
+        # .tar ichidagi CSV lar allaqachon siqilgan; eski .sql dump esa xom matn
+        source = os.path.join(parts_dir, name + ".gz")
+        if not os.path.exists(source) or os.path.getmtime(source) < os.path.getmtime(path):
+            with open(path, "rb") as src, gzip.open(source + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, UPLOAD_COPY_CHUNK)
+            os.replace(source + ".tmp", source)
+        name = os.path.basename(source)
+
+    size = os.path.getsize(source)
+    if size <= part_size:
+        return [source]
+
+    count = (size + part_size - 1) // part_size
+    parts = [os.path.join(parts_dir, f"{name}.{i + 1:03d}") for i in range(count)]
+    if all(os.path.exists(p) and os.path.getmtime(p) >= os.path.getmtime(source) for p in parts):
+        return parts
+    with open(source, "rb") as src:
+        for part in parts:
+            remaining = part_size
+            with open(part + ".tmp", "wb") as dst:
+                while remaining and (chunk := src.read(min(UPLOAD_COPY_CHUNK, remaining))):
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(part + ".tmp", part)
+    return parts
@@ -3,25 +3,235 @@
 import time
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, NamedTuple, AsyncIterator, List
 
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection, AsyncEngine
 from sqlalchemy import text
-from config import DATABASE_URL
+from sqlalchemy.sql.elements import TextClause
+from config import DATABASE_URL, DATABASE_REPLICA_URL, REPLICA_MAX_LAG_SECONDS, REACHABILITY_RECHECK_DAYS
+from utils.cache import TTLCache
+from utils.db_metrics import DBMetrics, query_name, pool_stats
+from utils.migrations import run_migrations
 
 logger = logging.getLogger(__name__)
 
 TZ = ZoneInfo("Asia/Tashkent")
 ALLOWED_TABLES = {"channel", "premium_channel"}
+PREMIUM_CACHE_TTL = 300  # sec; change feed ulangan paytda CHANGE_FEED_CACHE_TTL
+
+POST_TIME_EDIT_COOLDOWN = timedelta(hours=24)
+# Faol yoki qayta tekshirish vaqti kelgan (inactive_at eskirgan) chatlar; parametr — recheck_cutoff()
+REACHABLE_SQL = "(inactive_at IS NULL OR inactive_at <= ?)"
+
+
+def to_db_time(value: datetime) -> datetime:
+    """TIMESTAMP ustunlari uchun: Toshkent vaqti, tzinfo siz."""
+    if value.tzinfo is not None:
+        value = value.astimezone(TZ).replace(tzinfo=None)
+    return value
+
+
+def db_now() -> datetime:
+    return to_db_time(datetime.now(TZ))
+
+
+def recheck_cutoff() -> datetime:
+    """Shundan oldin belgilangan yetib bo'lmaydigan chatlar yana bir marta sinab ko'riladi."""
+    return db_now() - timedelta(days=REACHABILITY_RECHECK_DAYS)
+
+
+def to_timestamp(value) -> Optional[float]:
+    """TIMESTAMP qiymatini (datetime yoki SQLite matni) unix vaqtga o'girish."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=TZ)
+    return value.timestamp()
+
+
+class PreparedQuery(NamedTuple):
+    """`?` placeholderli so'rovning bir marta tarjima qilingan ko'rinishi."""
+    clause: TextClause          # SQLAlchemy uchun (:p0, :p1, ...)
+    param_names: Tuple[str, ...]
+    native_sql: str             # asyncpg uchun ($1, $2, ...)
+    name: str = "query"         # metrikalar uchun mantiqiy nom
+
+
+# Replica holati shu oraliqda bir marta tekshiriladi
+REPLICA_HEALTH_INTERVAL = 30  # sec
+
+# Replica primary dan qancha orqada (sekund). Yangi WAL kelmayotgan bo'lsa 0.
+_REPLICA_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _async_url(url: str) -> str:
+    """postgresql:// → postgresql+asyncpg://"""
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def prepare_query(query: str) -> PreparedQuery:
+    """`?` larni SQLAlchemy va asyncpg placeholderlariga o'girish."""
+    parts = query.split("?")
+    names = tuple(f"p{i}" for i in range(len(parts) - 1))
+    sa_sql = parts[0]
+    native_sql = parts[0]
+    for i, part in enumerate(parts[1:]):
+        sa_sql += f":p{i}{part}"
+        native_sql += f"${i + 1}{part}"
+    return PreparedQuery(text(sa_sql), names, native_sql, query_name(query))
+
+
+def parse_channel_posts(channel_data: Optional[tuple], premium: bool) -> list:
+    """Kanal qatoridan to'ldirilgan postlar ro'yxati."""
+    if not channel_data:
+        return []
+    posts = []
+    max_posts = 15 if premium else 3
+    for i in range(1, max_posts + 1):
+        post_idx = 2 + (i - 1) * 2
+        theme_idx = post_idx + 1
+        post_time = channel_data[post_idx] if len(channel_data) > post_idx else None
+        post_theme = channel_data[theme_idx] if len(channel_data) > theme_idx else None
+        if post_time and post_theme:
+            posts.append({'post_num': i, 'time': post_time, 'theme': post_theme})
+    return posts
+
+
+def count_filled_posts(channel_data: Optional[tuple], premium: bool) -> int:
+    """Vaqti belgilangan (NULL bo'lmagan) postlar soni."""
+    if not channel_data:
+        return 0
+    max_posts = 15 if premium else 3
+    count = 0
+    for i in range(1, max_posts + 1):
+        post_idx = 2 + (i - 1) * 2
+        if post_idx < len(channel_data) and channel_data[post_idx] is not None:
+            count += 1
+    return count
+
+
+def next_free_post_num(channel_data: Optional[tuple], premium: bool) -> Optional[int]:
+    """Birinchi bo'sh post raqami (hammasi band bo'lsa None)."""
+    if not channel_data:
+        return 1
+    max_posts = 15 if premium else 3
+    for i in range(1, max_posts + 1):
+        post_idx = 2 + (i - 1) * 2
+        if post_idx >= len(channel_data) or channel_data[post_idx] is None:
+            return i
+    return None
+
+
+def _active_post_sum(max_posts: int, with_image: bool = False) -> str:
+    """Bo'sh bo'lmagan post ustunlari soni (rasmli postlar uchun image = 'yes')."""
+    terms = []
+    for i in range(1, max_posts + 1):
+        cond = f"post{i} IS NOT NULL AND post{i} <> ''"
+        if with_image:
+            cond += f" AND image{i} = 'yes'"
+        terms.append(f"CASE WHEN {cond} THEN 1 ELSE 0 END")
+    return f"COALESCE(SUM({' + '.join(terms)}), 0)"
+
+
+# Statistika uchun agregat subquerylar: har bir jadval bir marta o'qiladi
+_USERS_AGG_FROM = (
+    "(SELECT COUNT(*) AS total, "
+    "COALESCE(SUM(CASE WHEN subscription = TRUE THEN 1 ELSE 0 END), 0) AS premium FROM users) u"
+)
+_CHANNEL_AGG_FROM = (
+    f"(SELECT COUNT(*) AS cnt, {_active_post_sum(3)} AS posts FROM channel) c, "
+    f"(SELECT COUNT(*) AS cnt, {_active_post_sum(15)} AS posts, "
+    f"{_active_post_sum(15, with_image=True)} AS images FROM premium_channel) p"
+)
+# ins: yangi user (referrer faqat mavjud bo'lsa yoziladi), ref: referral qatori.
+# Asosiy SELECT CTE lardan oldingi holatni ko'radi — yangi user uchun u.* NULL bo'ladi.
+_REGISTER_USER_SQL = """
+    WITH ins AS (
+        INSERT INTO users (id, subscription, referred_by)
+        VALUES (?, FALSE, (SELECT r.id FROM users r WHERE r.id = ?))
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id, referred_by
+    ), ref AS (
+        INSERT INTO referrals (referrer_id, referred_id)
+        SELECT referred_by, id FROM ins WHERE referred_by IS NOT NULL
+        ON CONFLICT (referred_id) DO NOTHING
+        RETURNING referrer_id
+    )
+    SELECT EXISTS (SELECT 1 FROM ins), (SELECT referrer_id FROM ref),
+           u.subscription, u.premium_type, u.start_date, u.end_date, u.referral_base_date
+    FROM (SELECT 1) AS one LEFT JOIN users u ON u.id = ?
+"""
+_DAILY_STATS_FIELDS = ("total_users", "premium_users", "total_channels", "total_posts", "posts_with_image")
+
+# API usage oynalari: nom → necha kun orqaga (0 — bugun). "all" — butun tarix
+API_USAGE_WINDOWS = (("today", 0), ("week", 7), ("month", 30))
+_API_USAGE_COLUMNS = ("input_tokens", "output_tokens", "requests_count")
+# Barcha oynalar bitta so'rovda (shartli agregatsiya), oxirida yozuvli kunlar soni
+_API_USAGE_ROLLUP_SQL = "SELECT " + ", ".join(
+    [f"COALESCE(SUM(CASE WHEN date >= ? THEN {col} END), 0)" for _ in API_USAGE_WINDOWS for col in _API_USAGE_COLUMNS]
+    + [f"COALESCE(SUM({col}), 0)" for col in _API_USAGE_COLUMNS]
+    + ["COUNT(DISTINCT date)"]
+) + " FROM api_usage"
+
+
+def _fetch_result(result, fetch_one: bool, fetch_all: bool):
+    if fetch_one:
+        row = result.fetchone()
+        return tuple(row) if row else None
+    if fetch_all:
+        return [tuple(r) for r in result.fetchall()]
+    return None
+
+
+class UnitOfWork:
+    """Bitta ulanish va bitta tranzaksiya ichida bajariladigan so'rovlar."""
+
+    def __init__(self, manager: 'DatabaseManager', conn: AsyncConnection):
+        self._manager = manager
+        self._conn = conn
+
+    async def execute(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
+        prepared = self._manager._get_prepared(query)
+        started = time.perf_counter()
+        try:
+            result = await self._conn.execute(prepared.clause, dict(zip(prepared.param_names, params)))
+            return _fetch_result(result, fetch_one, fetch_all)
+        except Exception:
+            self._manager.metrics.errors += 1
+            raise
+        finally:
+            self._manager.metrics.observe_query(
+                prepared.name, (time.perf_counter() - started) * 1000, query, params
+            )
 
 
 class DatabaseManager:
     _instance: Optional['DatabaseManager'] = None
-    _premium_cache: Dict[int, Tuple[bool, float]] = {}
-    _cache_ttl_seconds: int = 300
-    _cache_max_size: int = 10000
+    _premium_cache: TTLCache = TTLCache(max_size=10000, ttl_seconds=PREMIUM_CACHE_TTL)
+    # SQL matni → tarjima qilingan so'rov (f-string jadval nomlari bilan ham cheklangan to'plam)
+    _stmt_cache: Dict[str, PreparedQuery] = {}
+    _stmt_cache_max_size: int = 1024
+    # Superadminlar ro'yxati juda kichik — xotirada saqlanadi, faqat yozishda yangilanadi
+    _superadmin_ids: frozenset = frozenset()
+    _roles_loaded: bool = False
+    _replica_engine: Optional[AsyncEngine] = None
+    metrics: DBMetrics = DBMetrics()
+    schema_version: Optional[int] = None
+    _replica_healthy: bool = False
+    _replica_checked_at: float = 0.0
 
     def __new__(cls):
         if cls._instance is None:
@@ -35,13 +245,8 @@ class DatabaseManager:
         self._created = True
         self._db_ready = False
 
-        # postgresql:// → postgresql+asyncpg://
-        url = DATABASE_URL
-        if url.startswith("postgresql://"):
-            url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
-
         self._engine = create_async_engine(
-            url,
+            _async_url(DATABASE_URL),
             echo=False,
             pool_size=10,
             max_overflow=20,
@@ -49,173 +254,249 @@ class DatabaseManager:
             pool_recycle=3600,
             pool_timeout=30,
         )
+        # Hisobot so'rovlari uchun alohida (kichikroq) pool — scheduler bilan raqobatlashmaydi
+        if DATABASE_REPLICA_URL:
+            self._replica_engine = create_async_engine(
+                _async_url(DATABASE_REPLICA_URL),
+                echo=False,
+                pool_size=3,
+                max_overflow=5,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+                pool_timeout=10,
+            )
 
     async def initialize(self):
         """Jadvallarni yaratish — on_startup da chaqiriladi."""
         if self._db_ready:
             return
 
-        async with self._engine.begin() as conn:
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS superadmins (
-                    id BIGINT PRIMARY KEY
-                )
-            '''))
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id BIGINT PRIMARY KEY,
-                    subscription BOOLEAN DEFAULT FALSE,
-                    premium_type TEXT,
-                    start_date TIMESTAMP,
-                    end_date TIMESTAMP
-                )
-            '''))
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS channel (
-                    user_id BIGINT,
-                    id BIGINT PRIMARY KEY,
-                    post1 TEXT, theme1 TEXT,
-                    post2 TEXT, theme2 TEXT,
-                    post3 TEXT, theme3 TEXT,
-                    with_image BOOLEAN DEFAULT FALSE,
-                    last_edit_time TIMESTAMP
-                )
-            '''))
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS premium_channel (
-                    user_id BIGINT,
-                    id BIGINT PRIMARY KEY,
-                    post1 TEXT, theme1 TEXT,
-                    post2 TEXT, theme2 TEXT,
-                    post3 TEXT, theme3 TEXT,
-                    post4 TEXT, theme4 TEXT,
-                    post5 TEXT, theme5 TEXT,
-                    post6 TEXT, theme6 TEXT,
-                    post7 TEXT, theme7 TEXT,
-                    post8 TEXT, theme8 TEXT,
-                    post9 TEXT, theme9 TEXT,
-                    post10 TEXT, theme10 TEXT,
-                    post11 TEXT, theme11 TEXT,
-                    post12 TEXT, theme12 TEXT,
-                    post13 TEXT, theme13 TEXT,
-                    post14 TEXT, theme14 TEXT,
-                    post15 TEXT, theme15 TEXT,
-                    with_image BOOLEAN DEFAULT FALSE,
-                    last_edit_time TIMESTAMP,
-                    image1 TEXT DEFAULT 'no', image2 TEXT DEFAULT 'no',
-                    image3 TEXT DEFAULT 'no', image4 TEXT DEFAULT 'no',
-                    image5 TEXT DEFAULT 'no', image6 TEXT DEFAULT 'no',
-                    image7 TEXT DEFAULT 'no', image8 TEXT DEFAULT 'no',
-                    image9 TEXT DEFAULT 'no', image10 TEXT DEFAULT 'no',
-                    image11 TEXT DEFAULT 'no', image12 TEXT DEFAULT 'no',
-                    image13 TEXT DEFAULT 'no', image14 TEXT DEFAULT 'no',
-                    image15 TEXT DEFAULT 'no'
-                )
-            '''))
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS referrals (
-                    id SERIAL PRIMARY KEY,
-                    referrer_id BIGINT NOT NULL,
-                    referred_id BIGINT NOT NULL UNIQUE,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    activated BOOLEAN DEFAULT FALSE,
-                    activated_at TIMESTAMP
-                )
-            '''))
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS daily_stats (
-                    date TEXT PRIMARY KEY,
-                    total_users INTEGER DEFAULT 0,
-                    premium_users INTEGER DEFAULT 0,
-                    total_channels INTEGER DEFAULT 0,
-                    total_posts INTEGER DEFAULT 0,
-                    posts_with_image INTEGER DEFAULT 0
-                )
-            '''))
-
-            await conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS api_usage (
-                    date TEXT NOT NULL,
-                    model TEXT NOT NULL,
-                    input_tokens INTEGER DEFAULT 0,
-                    output_tokens INTEGER DEFAULT 0,
-                    requests_count INTEGER DEFAULT 0,
-                    PRIMARY KEY (date, model)
-                )
-            '''))
-
-            # Indexes
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_users_sub ON users(subscription)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_channel_uid ON channel(user_id)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pchannel_uid ON premium_channel(user_id)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_ref_referrer ON referrals(referrer_id)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_ref_activated ON referrals(referrer_id, activated)"))
-
-            for i in range(1, 4):
-                await conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_ch_post{i} ON channel(post{i})"))
-            for i in range(1, 16):
-                await conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_pch_post{i} ON premium_channel(post{i})"))
-
-            # Ustunlarni qo'shish (mavjud bo'lsa e'tiborsiz)
-            alter_stmts = [
-                "ALTER TABLE channel ADD COLUMN IF NOT EXISTS with_image BOOLEAN DEFAULT FALSE",
-                "ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS with_image BOOLEAN DEFAULT FALSE",
-                "ALTER TABLE channel ADD COLUMN IF NOT EXISTS last_edit_time TIMESTAMP",
-                "ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS last_edit_time TIMESTAMP",
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS referred_by BIGINT",
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS referral_base_date TIMESTAMP",
-            ]
-            for i in range(1, 16):
-                alter_stmts.append(f"ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS image{i} TEXT DEFAULT 'no'")
-
-            for stmt in alter_stmts:
-                try:
-                    await conn.execute(text(stmt))
-                except Exception:
-                    pass  # Ustun allaqachon mavjud (SQLite uchun)
+        version = await run_migrations(self._engine)
+        self.schema_version = version
+
+        self._db_ready = True
+        await self.load_superadmins()
+        logger.info(f"Database initialized (schema v{version})")
+
+    def _get_prepared(self, query: str) -> PreparedQuery:
+        prepared = self._stmt_cache.get(query)
+        if prepared is None:
+            prepared = prepare_query(query)
+            if len(self._stmt_cache) < self._stmt_cache_max_size:
+                self._stmt_cache[query] = prepared
+        return prepared
+
+    @property
+    def is_postgres(self) -> bool:
+        return self._engine.dialect.name == "postgresql"
+
+    def raw_dsn(self) -> str:
+        """Drayverga to'g'ridan-to'g'ri ulanish uchun DSN (postgresql://...)."""
+        return self._engine.url.set(drivername=self._engine.dialect.name).render_as_string(hide_password=False)
+
+    async def _check_replica(self) -> bool:
+        """Replica ishlayaptimi va REPLICA_MAX_LAG_SECONDS dan ko'p orqada emasmi."""
+        try:
+            async with self._replica_engine.connect() as conn:
+                if self._replica_engine.dialect.name == "postgresql":
+                    lag = (await conn.execute(text(_REPLICA_LAG_SQL))).scalar() or 0
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0
+        except Exception as e:
+            logger.warning(f"Replica unavailable, using primary: {e}")
+            return False
+        if lag > REPLICA_MAX_LAG_SECONDS:
+            logger.warning(f"Replica lag {lag:.0f}s > {REPLICA_MAX_LAG_SECONDS}s, using primary")
+            return False
+        return True
+
+    async def _reporting_engine(self) -> AsyncEngine:
+        """Hisobot so'rovlari uchun engine: sog'lom replica yoki primary."""
+        if self._replica_engine is None:
+            return self._engine
+        now = time.monotonic()
+        if now - self._replica_checked_at >= REPLICA_HEALTH_INTERVAL:
+            self._replica_healthy = await self._check_replica()
+            self._replica_checked_at = now
+        return self._replica_engine if self._replica_healthy else self._engine
+
+    async def reporting_engine(self) -> AsyncEngine:
+        """Ko'p so'rovli hisobot (backup) uchun engine ni boshida bir marta tanlash.
+
+        Barcha so'rovlar shu engine ga berilsa, o'rtada replica holati o'zgarsa ham
+        ma'lumot bitta manbadan olinadi.
+        """
+        if not self._db_ready:
+            await self.initialize()
+        return await self._reporting_engine()
 
-            # Migratsiya: referrals.id ga sequence bog'lash (eski INTEGER PRIMARY KEY uchun)
+    async def _query_on(self, engine: Optional[AsyncEngine], query: str, params: tuple = (),
+                        fetch_one: bool = False, fetch_all: bool = False):
+        """Aniq engine da so'rov (None — primary); replica dan primary ga qaytish yo'q."""
+        if not self._db_ready:
+            await self.initialize()
+        return await self._run_query(engine or self._engine, self._get_prepared(query), params, fetch_one, fetch_all)
+
+    @asynccontextmanager
+    async def _connect(self, engine: AsyncEngine, begin: bool = False):
+        """Ulanish olish + pool checkout kutish vaqtini yozish."""
+        started = time.perf_counter()
+        async with (engine.begin() if begin else engine.connect()) as conn:
+            self.metrics.observe_checkout((time.perf_counter() - started) * 1000)
+            yield conn
+
+    def pool_stats(self) -> Dict[str, dict]:
+        pools = {"primary": pool_stats(self._engine)}
+        if self._replica_engine is not None:
+            pools["replica"] = pool_stats(self._replica_engine)
+        return pools
+
+    async def _run_query(self, engine: AsyncEngine, prepared: PreparedQuery, params: tuple,
+                         fetch_one: bool, fetch_all: bool):
+        async with self._connect(engine) as conn:
+            started = time.perf_counter()
             try:
-                await conn.execute(text(
-                    "CREATE SEQUENCE IF NOT EXISTS referrals_id_seq OWNED BY referrals.id"
-                ))
-                await conn.execute(text(
-                    "SELECT setval('referrals_id_seq', COALESCE((SELECT MAX(id) FROM referrals), 0) + 1, false)"
-                ))
-                await conn.execute(text(
-                    "ALTER TABLE referrals ALTER COLUMN id SET DEFAULT nextval('referrals_id_seq')"
-                ))
+                return await self._execute_on(conn, engine, prepared, params, fetch_one, fetch_all)
             except Exception:
-                pass  # Allaqachon SERIAL yoki sequence mavjud
+                self.metrics.errors += 1
+                raise
+            finally:
+                self.metrics.observe_query(
+                    prepared.name, (time.perf_counter() - started) * 1000, prepared.native_sql, params
+                )
 
-        self._db_ready = True
-        logger.info("Database initialized (PostgreSQL + asyncpg)")
+    async def _execute_on(self, conn: AsyncConnection, engine: AsyncEngine, prepared: PreparedQuery,
+                          params: tuple, fetch_one: bool, fetch_all: bool):
+        if (fetch_one or fetch_all) and engine.dialect.driver == "asyncpg":
+            # Fast path: asyncpg o'zining prepared statement keshidan foydalanadi
+            raw = await conn.get_raw_connection()
+            driver_conn = raw.driver_connection
+            if fetch_one:
+                row = await driver_conn.fetchrow(prepared.native_sql, *params)
+                return tuple(row) if row else None
+            rows = await driver_conn.fetch(prepared.native_sql, *params)
+            return [tuple(r) for r in rows]
+
+        result = await conn.execute(prepared.clause, dict(zip(prepared.param_names, params)))
 
-    async def execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
+        if fetch_one or fetch_all:
+            return _fetch_result(result, fetch_one, fetch_all)
+
+        await conn.commit()
+        return None
+
+    async def execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False,
+                            replica: bool = False):
+        """replica=True — faqat o'qish uchun hisobot so'rovlari (replica bo'lsa o'sha yerda)."""
         if not self._db_ready:
             await self.initialize()
 
-        async with self._engine.connect() as conn:
-            sa_query = query
-            sa_params = {}
-            for i, val in enumerate(params):
-                sa_query = sa_query.replace("?", f":p{i}", 1)
-                sa_params[f"p{i}"] = val
+        prepared = self._get_prepared(query)
 
-            result = await conn.execute(text(sa_query), sa_params)
+        if replica and (fetch_one or fetch_all):
+            engine = await self._reporting_engine()
+            if engine is not self._engine:
+                try:
+                    return await self._run_query(engine, prepared, params, fetch_one, fetch_all)
+                except Exception as e:
+                    logger.warning(f"Replica query failed, retrying on primary: {e}")
+                    self._replica_healthy = False
+                    self._replica_checked_at = time.monotonic()
 
-            if fetch_one:
-                row = result.fetchone()
-                return tuple(row) if row else None
-            elif fetch_all:
-                rows = result.fetchall()
-                return [tuple(r) for r in rows]
+        return await self._run_query(self._engine, prepared, params, fetch_one, fetch_all)
 
-            await conn.commit()
+    async def stream_query(self, query: str, params: tuple = (), chunk_size: int = 1000,
+                           engine: Optional[AsyncEngine] = None) -> AsyncIterator[list]:
+        """Natijani server-side cursor orqali chunk_size lik bo'laklarda qaytarish.
+
+        Har bir bo'lak — tuple kabi ishlaydigan Row lar ro'yxati (Row._fields da ustun nomlari).
+        Xotira natija hajmiga emas, chunk_size ga bog'liq. engine — None bo'lsa primary.
+        """
+        if not self._db_ready:
+            await self.initialize()
+
+        prepared = self._get_prepared(query)
+        async with self._connect(engine or self._engine) as conn:
+            result = await conn.stream(
+                prepared.clause,
+                dict(zip(prepared.param_names, params)),
+                execution_options={"yield_per": chunk_size},
+            )
+            async for partition in result.partitions(chunk_size):
+                yield partition
+
+    async def copy_table_to(self, table: str, output, engine: Optional[AsyncEngine] = None,
+                            where: Optional[str] = None, params: tuple = ()) -> Optional[int]:
+        """asyncpg `COPY ... TO STDOUT` (CSV, sarlavha bilan, NULL = \\N).
+
+        where — ixtiyoriy shart (`?` placeholderlar bilan). Har bir bo'lak `await output(bytes)`
+        ga beriladi. Qatorlar sonini qaytaradi; drayver asyncpg bo'lmasa None
+        (chaqiruvchi stream_query ishlatadi).
+        """
+        if not self._db_ready:
+            await self.initialize()
+        engine = engine or self._engine
+        if engine.dialect.driver != "asyncpg":
             return None
+        options = dict(output=output, format="csv", header=True, null="\\N")
+        async with self._connect(engine) as conn:
+            driver_conn = (await conn.get_raw_connection()).driver_connection
+            if where:
+                query = self._get_prepared(f"SELECT * FROM {table} WHERE {where}").native_sql
+                status = await driver_conn.copy_from_query(query, *params, **options)
+            else:
+                status = await driver_conn.copy_from_table(table, **options)
+        return int(status.split()[-1])
+
+    # ============== Change Log (inkremental backup) ==============
+
+    async def get_change_log_position(self, engine: Optional[AsyncEngine] = None) -> int:
+        """change_log dagi oxirgi id — backup shu nuqtagacha bo'lgan o'zgarishlarni qamraydi."""
+        result = await self._query_on(engine, "SELECT COALESCE(MAX(id), 0) FROM change_log", fetch_one=True)
+        return result[0] if result else 0
+
+    async def get_deleted_ids(self, table: str, after_id: int, upto_id: int,
+                              engine: Optional[AsyncEngine] = None) -> List[int]:
+        """Oraliqda o'zgargan, lekin hozir jadvalda yo'q qatorlar."""
+        rows = await self._query_on(
+            engine,
+            f"SELECT DISTINCT c.row_id FROM change_log c "
+            f"WHERE c.table_name = ? AND c.id > ? AND c.id <= ? "
+            f"AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.id = c.row_id)",
+            (table, after_id, upto_id), fetch_all=True
+        )
+        return sorted(row[0] for row in rows)
+
+    async def compact_change_log(self, upto_id: int):
+        """To'liq backup qamragan yozuvlarni o'chirish."""
+        await self.execute_query("DELETE FROM change_log WHERE id <= ?", (upto_id,))
+
+    async def get_table_columns(self, table: str, engine: Optional[AsyncEngine] = None) -> List[str]:
+        rows = await self._query_on(
+            engine,
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ? ORDER BY ordinal_position",
+            (table,), fetch_all=True
+        )
+        return [row[0] for row in rows]
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """Bitta ulanishda tranzaksiya: xatolikda rollback, aks holda commit.
+
+        async with db.unit_of_work() as uow:
+            await uow.execute("UPDATE ... RETURNING id", (...), fetch_one=True)
+        """
+        if not self._db_ready:
+            await self.initialize()
+        async with self._connect(self._engine, begin=True) as conn:
+            yield UnitOfWork(self, conn)
 
     async def close_all(self):
         await self._engine.dispose()
+        if self._replica_engine is not None:
+            await self._replica_engine.dispose()
         logger.info("Database engine disposed")
 
     # ============== User Methods ==============
@@ -224,56 +505,154 @@ class DatabaseManager:
         result = await self.execute_query("SELECT 1 FROM users WHERE id = ?", (user_id,), fetch_one=True)
         return result is not None
 
-    def _cleanup_cache_if_needed(self):
-        if len(self._premium_cache) > self._cache_max_size:
-            now = time.time()
-            expired_keys = [k for k, v in self._premium_cache.items() if now - v[1] >= self._cache_ttl_seconds]
-            for k in expired_keys:
-                del self._premium_cache[k]
-            if len(self._premium_cache) > self._cache_max_size:
-                sorted_items = sorted(self._premium_cache.items(), key=lambda x: x[1][1])
-                keys_to_remove = [k for k, _ in sorted_items[:len(sorted_items) // 2]]
-                for k in keys_to_remove:
-                    del self._premium_cache[k]
+    def invalidate_premium_cache(self, user_id: int):
+        """Premium holati o'zgarganda chaqiriladi."""
+        self._premium_cache.invalidate(user_id)
+
+    def clear_premium_cache(self):
+        self._premium_cache.clear()
+
+    def set_premium_cache_ttl(self, ttl_seconds: float):
+        """Yangi yozuvlar uchun TTL (mavjudlari o'z muddatida eskiradi)."""
+        self._premium_cache.ttl_seconds = ttl_seconds
+
+    def premium_cache_stats(self) -> dict:
+        return self._premium_cache.stats()
+
+    def _cache_premium_state(self, user_id: int, subscription, end_date) -> bool:
+        """users qatoridan premium holatini hisoblab keshga yozish."""
+        is_premium = bool(subscription)
+        expires_at = None
+        if is_premium:
+            expires_at = to_timestamp(end_date)
+            if expires_at is not None and expires_at <= time.time():
+                # Muddati o'tgan, lekin expiry hali ishlamagan
+                is_premium = False
+                expires_at = None
+        self._premium_cache.set(user_id, is_premium, expires_at=expires_at)
+        return is_premium
 
     async def is_premium_user(self, user_id: int) -> bool:
-        now = time.time()
-        cached = self._premium_cache.get(user_id)
-        if cached and now - cached[1] < self._cache_ttl_seconds:
-            return cached[0]
         if await self.is_superadmin(user_id):
-            self._premium_cache[user_id] = (True, now)
-            self._cleanup_cache_if_needed()
             return True
-        result = await self.execute_query("SELECT subscription FROM users WHERE id = ?", (user_id,), fetch_one=True)
-        is_premium = bool(result and result[0])
-        self._premium_cache[user_id] = (is_premium, now)
-        self._cleanup_cache_if_needed()
-        return is_premium
+        cached = self._premium_cache.get(user_id)
+        if cached is not None:
+            return cached
+        result = await self.execute_query("SELECT subscription, end_date FROM users WHERE id = ?", (user_id,), fetch_one=True)
+        # User yo'q bo'lsa ham False keshlanadi (negative caching)
+        if not result:
+            return self._cache_premium_state(user_id, False, None)
+        return self._cache_premium_state(user_id, result[0], result[1])
+
+    async def load_superadmins(self):
+        """Superadminlarni bazadan xotiraga yuklash."""
+        rows = await self.execute_query("SELECT id FROM superadmins", fetch_all=True)
+        self._superadmin_ids = frozenset(row[0] for row in rows)
+        self._roles_loaded = True
 
     async def is_superadmin(self, user_id: int) -> bool:
-        result = await self.execute_query("SELECT 1 FROM superadmins WHERE id = ?", (user_id,), fetch_one=True)
-        return result is not None
+        if not self._roles_loaded:
+            await self.load_superadmins()
+        return user_id in self._superadmin_ids
 
     async def add_user(self, user_id: int, subscription: bool = False):
         await self.execute_query(
             "INSERT INTO users (id, subscription) VALUES (?, ?) ON CONFLICT (id) DO NOTHING",
             (user_id, subscription)
         )
+        self.invalidate_premium_cache(user_id)
+
+    async def register_user(self, user_id: int, referrer_id: Optional[int] = None) -> dict:
+        """/start uchun: userni ro'yxatdan o'tkazish va referrerni bog'lash.
+
+        PostgreSQL da bitta so'rov. Natija: is_new, is_superadmin, is_premium,
+        referrer_id (bog'langan bo'lsa) va premium_info (get_user_premium_info kabi).
+        """
+        if referrer_id == user_id:
+            referrer_id = None
+
+        if self.is_postgres:
+            async with self.unit_of_work() as uow:
+                row = await uow.execute(_REGISTER_USER_SQL, (user_id, referrer_id, user_id), fetch_one=True)
+            is_new, linked_referrer = row[0], row[1]
+            premium_info = None if is_new else row[2:]
+        else:
+            is_new, linked_referrer, premium_info = await self._register_user_stepwise(user_id, referrer_id)
+
+        if premium_info:
+            is_premium = self._cache_premium_state(user_id, premium_info[0], premium_info[3])
+        else:
+            is_premium = self._cache_premium_state(user_id, False, None)
+
+        return {
+            'is_new': bool(is_new),
+            'is_superadmin': user_id in self._superadmin_ids,
+            'is_premium': is_premium,
+            'referrer_id': linked_referrer,
+            'premium_info': premium_info,
+        }
+
+    async def _register_user_stepwise(self, user_id: int, referrer_id: Optional[int]):
+        """register_user ning data-modifying CTE siz varianti (SQLite)."""
+        async with self.unit_of_work() as uow:
+            existing = await uow.execute(
+                "SELECT subscription, premium_type, start_date, end_date, referral_base_date FROM users WHERE id = ?",
+                (user_id,), fetch_one=True
+            )
+            if existing:
+                return False, None, existing
+
+            if referrer_id is not None and not await uow.execute(
+                    "SELECT 1 FROM users WHERE id = ?", (referrer_id,), fetch_one=True):
+                referrer_id = None
+
+            await uow.execute(
+                "INSERT INTO users (id, subscription, referred_by) VALUES (?, FALSE, ?)",
+                (user_id, referrer_id)
+            )
+            linked = None
+            if referrer_id is not None:
+                linked = await uow.execute(
+                    "INSERT INTO referrals (referrer_id, referred_id) VALUES (?, ?) "
+                    "ON CONFLICT (referred_id) DO NOTHING RETURNING referrer_id",
+                    (referrer_id, user_id), fetch_one=True
+                )
+            return True, linked[0] if linked else None, None
 
     async def add_superadmin(self, user_id: int):
         await self.execute_query(
             "INSERT INTO superadmins (id) VALUES (?) ON CONFLICT (id) DO NOTHING",
             (user_id,)
         )
+        self._superadmin_ids = self._superadmin_ids | {user_id}
 
     async def update_user_subscription(self, user_id: int, subscription: bool, premium_type: Optional[str] = None):
         if premium_type:
             await self.execute_query("UPDATE users SET subscription = ?, premium_type = ? WHERE id = ?", (subscription, premium_type, user_id))
         else:
             await self.execute_query("UPDATE users SET subscription = ? WHERE id = ?", (subscription, user_id))
-        if user_id in self._premium_cache:
-            del self._premium_cache[user_id]
+        self.invalidate_premium_cache(user_id)
+
+    async def activate_subscription(self, user_id: int, premium_type: str, start_date: datetime, end_date: datetime) -> bool:
+        """Premiumni muddati bilan bitta UPDATE da yoqish. User topilmasa False."""
+        async with self.unit_of_work() as uow:
+            updated = await uow.execute(
+                "UPDATE users SET subscription = TRUE, premium_type = ?, start_date = ?, end_date = ? "
+                "WHERE id = ? RETURNING id",
+                (premium_type, to_db_time(start_date), to_db_time(end_date), user_id), fetch_one=True
+            )
+        self.invalidate_premium_cache(user_id)
+        return updated is not None
+
+    async def extend_subscription(self, user_id: int, end_date: datetime) -> bool:
+        """Faqat end_date ni yangilash (premium turi va boshlanishi o'zgarmaydi). User topilmasa False."""
+        async with self.unit_of_work() as uow:
+            updated = await uow.execute(
+                "UPDATE users SET end_date = ? WHERE id = ? RETURNING id",
+                (to_db_time(end_date), user_id), fetch_one=True
+            )
+        self.invalidate_premium_cache(user_id)
+        return updated is not None
 
     # ============== Channel Methods ==============
 
@@ -289,33 +668,62 @@ class DatabaseManager:
         result = await self.execute_query(f"SELECT 1 FROM {table} WHERE id = ?", (channel_id,), fetch_one=True)
         return result is not None
 
-    async def add_channel(self, channel_id: int, user_id: int, premium: bool = False):
+    async def add_channel(self, channel_id: int, user_id: int, premium: bool = False, title: Optional[str] = None):
         table = self._get_table_name(premium)
-        await self.execute_query(f"INSERT INTO {table} (id, user_id) VALUES (?, ?)", (channel_id, user_id))
+        if title is None:
+            await self.execute_query(f"INSERT INTO {table} (id, user_id) VALUES (?, ?)", (channel_id, user_id))
+            return
+        await self.execute_query(
+            f"INSERT INTO {table} (id, user_id, title, title_updated_at) VALUES (?, ?, ?, ?)",
+            (channel_id, user_id, title, db_now())
+        )
 
-    async def _check_24h_restriction(self, channel_id: int, premium: bool):
-        last_edit = await self.get_last_edit_time(channel_id, premium=premium)
-        if last_edit:
-            try:
-                last_dt = datetime.fromisoformat(last_edit)
-                if last_dt.tzinfo is None:
-                    last_dt = last_dt.replace(tzinfo=TZ)
-            except ValueError:
-                last_dt = None
-            if last_dt and datetime.now(TZ) - last_dt < timedelta(hours=24):
+    async def get_channel_titles(self, user_id: int, premium: bool = False) -> Dict[int, Tuple[Optional[str], Optional[datetime]]]:
+        """Userning kanallari: id → (saqlangan nom, yangilangan vaqt)."""
+        table = self._get_table_name(premium)
+        rows = await self.execute_query(
+            f"SELECT id, title, title_updated_at FROM {table} WHERE user_id = ?", (user_id,), fetch_all=True
+        )
+        return {row[0]: (row[1], row[2]) for row in rows or []}
+
+    async def set_channel_titles(self, titles: Dict[int, str], premium: bool = False):
+        table = self._get_table_name(premium)
+        now = db_now()
+        async with self.unit_of_work() as uow:
+            for channel_id, title in titles.items():
+                await uow.execute(
+                    f"UPDATE {table} SET title = ?, title_updated_at = ? WHERE id = ?", (title, now, channel_id)
+                )
+
+    async def _update_post_columns(self, table: str, channel_id: int, assignments: str, params: tuple, time_changed: bool):
+        """Post ustunlarini yangilash; vaqt o'zgarsa 24 soatlik cheklov bitta UPDATE ichida tekshiriladi."""
+        if not time_changed:
+            await self.execute_query(f"UPDATE {table} SET {assignments} WHERE id = ?", (*params, channel_id))
+            return
+
+        now = db_now()
+        async with self.unit_of_work() as uow:
+            updated = await uow.execute(
+                f"UPDATE {table} SET {assignments}, last_edit_time = ? "
+                f"WHERE id = ? AND (last_edit_time IS NULL OR last_edit_time <= ?) RETURNING id",
+                (*params, now, channel_id, now - POST_TIME_EDIT_COOLDOWN), fetch_one=True
+            )
+            if updated is None and await uow.execute(f"SELECT 1 FROM {table} WHERE id = ?", (channel_id,), fetch_one=True):
                 raise ValueError("Post vaqtini faqat 24 soatdan keyin o'zgartirish mumkin.")
 
     async def update_channel_post(self, channel_id: int, post_num: int, time: str, theme: str, premium: bool = False, with_image: str = 'no', skip_24h_check: bool = False):
         table = self._get_table_name(premium)
         try:
-            if not skip_24h_check:
-                await self._check_24h_restriction(channel_id, premium)
             if premium:
-                await self.execute_query(f"UPDATE {table} SET post{post_num} = ?, theme{post_num} = ?, image{post_num} = ? WHERE id = ?", (time, theme, with_image, channel_id))
+                await self._update_post_columns(
+                    table, channel_id, f"post{post_num} = ?, theme{post_num} = ?, image{post_num} = ?",
+                    (time, theme, with_image), time_changed=not skip_24h_check
+                )
             else:
-                await self.execute_query(f"UPDATE {table} SET post{post_num} = ?, theme{post_num} = ? WHERE id = ?", (time, theme, channel_id))
-            if not skip_24h_check:
-                await self.update_last_edit_time(channel_id, datetime.now(TZ).isoformat(), premium=premium)
+                await self._update_post_columns(
+                    table, channel_id, f"post{post_num} = ?, theme{post_num} = ?",
+                    (time, theme), time_changed=not skip_24h_check
+                )
         except ValueError:
             raise
         except Exception as e:
@@ -332,85 +740,134 @@ class DatabaseManager:
         return result[0] if result else 0
 
     async def count_channel_posts(self, channel_id: int, premium: bool = False) -> int:
-        channel_data = await self.get_channel_by_id(channel_id, premium)
-        if not channel_data:
-            return 0
-        max_posts = 15 if premium else 3
-        count = 0
-        for i in range(1, max_posts + 1):
-            post_idx = 2 + (i - 1) * 2
-            if post_idx < len(channel_data) and channel_data[post_idx] is not None:
-                count += 1
-        return count
+        return count_filled_posts(await self.get_channel_by_id(channel_id, premium), premium)
 
     async def is_premium(self, user_id: int) -> bool:
         return await self.is_premium_user(user_id)
 
-    async def get_expired_premium_users(self):
-        """Muddati o'tgan premium userlarni topish (subscription=TRUE, end_date < now)."""
+    async def get_upcoming_premium_expirations(self, until: datetime):
+        """`until` gacha tugaydigan premiumlar (id, end_date), end_date bo'yicha tartibda."""
         return await self.execute_query(
-            "SELECT id, premium_type, end_date FROM users "
-            "WHERE subscription = TRUE AND end_date IS NOT NULL AND end_date < NOW()",
-            fetch_all=True
+            "SELECT id, end_date FROM users "
+            "WHERE subscription = TRUE AND end_date IS NOT NULL AND end_date <= ? "
+            "ORDER BY end_date",
+            (to_db_time(until),), fetch_all=True
         )
 
+    async def expire_due_premiums(self, now: Optional[datetime] = None) -> List[int]:
+        """Muddati kelgan barcha premiumlarni bitta UPDATE da o'chirish. O'chirilgan id lar."""
+        async with self.unit_of_work() as uow:
+            rows = await uow.execute(
+                "UPDATE users SET subscription = FALSE, premium_type = NULL "
+                "WHERE subscription = TRUE AND end_date IS NOT NULL AND end_date <= ? RETURNING id",
+                (to_db_time(now) if now else db_now(),), fetch_all=True
+            )
+        user_ids = [row[0] for row in rows]
+        for user_id in user_ids:
+            self.invalidate_premium_cache(user_id)
+        return user_ids
+
     async def expire_user_premium(self, user_id: int):
         """Userni premiumdan chiqarish."""
         await self.execute_query(
             "UPDATE users SET subscription = FALSE, premium_type = NULL WHERE id = ?",
             (user_id,)
         )
-        if user_id in self._premium_cache:
-            del self._premium_cache[user_id]
+        self.invalidate_premium_cache(user_id)
 
     async def get_total_users(self) -> int:
-        result = await self.execute_query("SELECT COUNT(*) FROM users", fetch_one=True)
+        result = await self.execute_query("SELECT COUNT(*) FROM users", fetch_one=True, replica=True)
         return result[0] if result else 0
 
     async def get_premium_users_count(self) -> int:
-        result = await self.execute_query("SELECT COUNT(*) FROM users WHERE subscription = TRUE", fetch_one=True)
+        result = await self.execute_query("SELECT COUNT(*) FROM users WHERE subscription = TRUE", fetch_one=True, replica=True)
         return result[0] if result else 0
 
     async def get_total_channels(self) -> int:
-        free = await self.execute_query("SELECT COUNT(*) FROM channel", fetch_one=True)
-        premium = await self.execute_query("SELECT COUNT(*) FROM premium_channel", fetch_one=True)
-        return (free[0] if free else 0) + (premium[0] if premium else 0)
+        result = await self.execute_query(
+            "SELECT (SELECT COUNT(*) FROM channel) + (SELECT COUNT(*) FROM premium_channel)", fetch_one=True, replica=True
+        )
+        return result[0] if result else 0
 
     async def get_all_user_ids(self):
         return await self.execute_query("SELECT id FROM users", fetch_all=True)
 
+    async def iter_user_ids(self, chunk_size: int = 1000, after_id: Optional[int] = None,
+                            reachable_only: bool = False) -> AsyncIterator[List[int]]:
+        """Barcha user ID lar id bo'yicha tartibda — xotirada bir vaqtda faqat bitta chunk.
+
+        Broadcast soatlab davom etishi mumkin, shuning uchun ochiq cursor (va tranzaksiya)
+        ushlab turilmaydi: har bir chunk alohida keyset so'rov (id > oxirgi id).
+        reachable_only=True — yetib bo'lmaydigan (REACHABLE_SQL) userlar o'tkazib yuboriladi.
+        """
+        while True:
+            conditions, params = [], []
+            if after_id is not None:
+                conditions.append("id > ?")
+                params.append(after_id)
+            if reachable_only:
+                conditions.append(REACHABLE_SQL)
+                params.append(recheck_cutoff())
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            rows = await self.execute_query(
+                f"SELECT id FROM users{where} ORDER BY id LIMIT ?", (*params, chunk_size), fetch_all=True
+            )
+            if not rows:
+                return
+            ids = [row[0] for row in rows]
+            yield ids
+            if len(ids) < chunk_size:
+                return
+            after_id = ids[-1]
+
+    async def mark_inactive(self, table: str, chat_ids: List[int], reason: str):
+        """Chatlarni yetib bo'lmaydigan deb belgilash (qayta belgilash vaqtni yangilaydi)."""
+        now = db_now()
+        async with self.unit_of_work() as uow:
+            for chat_id in chat_ids:
+                await uow.execute(
+                    f"UPDATE {table} SET inactive_at = ?, inactive_reason = ? WHERE id = ?",
+                    (now, reason, chat_id)
+                )
+
+    async def reactivate(self, table: str, chat_ids: List[int]):
+        """Xabar yetib borgan chatlardan belgini olib tashlash (belgisizlarga yozilmaydi)."""
+        async with self.unit_of_work() as uow:
+            for chat_id in chat_ids:
+                await uow.execute(
+                    f"UPDATE {table} SET inactive_at = NULL, inactive_reason = NULL "
+                    f"WHERE id = ? AND inactive_at IS NOT NULL",
+                    (chat_id,)
+                )
+
+    async def filter_reachable_users(self, user_ids: List[int]) -> List[int]:
+        """Berilgan userlardan faqat yetib boriladiganlari (tartib saqlanadi)."""
+        if not user_ids:
+            return []
+        placeholders = ", ".join("?" * len(user_ids))
+        rows = await self.execute_query(
+            f"SELECT id FROM users WHERE id IN ({placeholders}) AND NOT {REACHABLE_SQL}",
+            (*user_ids, recheck_cutoff()), fetch_all=True
+        )
+        unreachable = {row[0] for row in rows}
+        return [uid for uid in user_ids if uid not in unreachable]
+
     async def delete_channel(self, channel_id: int, premium: bool = False):
         table = self._get_table_name(premium)
         await self.execute_query(f"DELETE FROM {table} WHERE id = ?", (channel_id,))
 
     async def get_channel_posts(self, channel_id: int, premium: bool = False):
-        channel_data = await self.get_channel_by_id(channel_id, premium)
-        if not channel_data:
-            return []
-        posts = []
-        max_posts = 15 if premium else 3
-        for i in range(1, max_posts + 1):
-            post_idx = 2 + (i - 1) * 2
-            theme_idx = post_idx + 1
-            post_time = channel_data[post_idx] if len(channel_data) > post_idx else None
-            post_theme = channel_data[theme_idx] if len(channel_data) > theme_idx else None
-            if post_time and post_theme:
-                posts.append({'post_num': i, 'time': post_time, 'theme': post_theme})
-        return posts
+        return parse_channel_posts(await self.get_channel_by_id(channel_id, premium), premium)
 
     async def update_single_post(self, channel_id: int, post_num: int, time: str = None, theme: str = None, premium: bool = False):
         table = self._get_table_name(premium)
         try:
-            if time:
-                await self._check_24h_restriction(channel_id, premium)
             if time and theme:
-                await self.execute_query(f"UPDATE {table} SET post{post_num} = ?, theme{post_num} = ? WHERE id = ?", (time, theme, channel_id))
+                await self._update_post_columns(table, channel_id, f"post{post_num} = ?, theme{post_num} = ?", (time, theme), time_changed=True)
             elif time:
-                await self.execute_query(f"UPDATE {table} SET post{post_num} = ? WHERE id = ?", (time, channel_id))
+                await self._update_post_columns(table, channel_id, f"post{post_num} = ?", (time,), time_changed=True)
             elif theme:
-                await self.execute_query(f"UPDATE {table} SET theme{post_num} = ? WHERE id = ?", (theme, channel_id))
-            if time:
-                await self.update_last_edit_time(channel_id, datetime.now(TZ).isoformat(), premium=premium)
+                await self._update_post_columns(table, channel_id, f"theme{post_num} = ?", (theme,), time_changed=False)
         except ValueError:
             raise
         except Exception as e:
@@ -425,15 +882,7 @@ class DatabaseManager:
             await self.execute_query(f"UPDATE {table} SET post{post_num} = NULL, theme{post_num} = NULL WHERE id = ?", (channel_id,))
 
     async def get_next_available_post_num(self, channel_id: int, premium: bool = False) -> int:
-        max_posts = 15 if premium else 3
-        channel_data = await self.get_channel_by_id(channel_id, premium)
-        if not channel_data:
-            return 1
-        for i in range(1, max_posts + 1):
-            post_idx = 2 + (i - 1) * 2
-            if post_idx >= len(channel_data) or channel_data[post_idx] is None:
-                return i
-        return None
+        return next_free_post_num(await self.get_channel_by_id(channel_id, premium), premium)
 
     async def add_new_post(self, channel_id: int, post_num: int, time: str, theme: str, premium: bool = False, with_image: str = 'no'):
         table = self._get_table_name(premium)
@@ -445,7 +894,10 @@ class DatabaseManager:
     async def get_last_edit_time(self, channel_id: int, premium: bool = False):
         table = self._get_table_name(premium)
         result = await self.execute_query(f"SELECT last_edit_time FROM {table} WHERE id = ?", (channel_id,), fetch_one=True)
-        return result[0] if result and result[0] else None
+        if not result or not result[0]:
+            return None
+        # PostgreSQL datetime qaytaradi, SQLite esa matn — chaqiruvchilar ISO matn kutadi
+        return result[0].isoformat() if isinstance(result[0], datetime) else result[0]
 
     async def update_last_edit_time(self, channel_id: int, edit_time: str, premium: bool = False):
         table = self._get_table_name(premium)
@@ -454,54 +906,40 @@ class DatabaseManager:
     # ============== Daily Stats Methods ==============
 
     async def count_total_active_posts(self) -> tuple:
-        total = 0
-        with_image = 0
-
-        free_channels = await self.execute_query("SELECT * FROM channel", fetch_all=True)
-        for ch in free_channels:
-            for i in range(1, 4):
-                post_idx = 2 + (i - 1) * 2
-                if post_idx < len(ch) and ch[post_idx]:
-                    total += 1
-
-        premium_channels = await self.execute_query("SELECT * FROM premium_channel", fetch_all=True)
-        for ch in premium_channels:
-            for i in range(1, 16):
-                post_idx = 2 + (i - 1) * 2
-                image_idx = 32 + (i - 1)
-                if post_idx < len(ch) and ch[post_idx]:
-                    total += 1
-                    if image_idx < len(ch) and ch[image_idx] == 'yes':
-                        with_image += 1
-
-        return total, with_image
-
-    async def record_daily_stats(self):
-        today = datetime.now(TZ).strftime("%Y-%m-%d")
-        total_users = await self.get_total_users()
-        premium_users = await self.get_premium_users_count()
-        total_channels = await self.get_total_channels()
-        total_posts, posts_with_image = await self.count_total_active_posts()
-
-        await self.execute_query(
-            """INSERT INTO daily_stats (date, total_users, premium_users, total_channels, total_posts, posts_with_image)
-               VALUES (?, ?, ?, ?, ?, ?)
-               ON CONFLICT (date) DO UPDATE SET
-               total_users = excluded.total_users,
-               premium_users = excluded.premium_users,
-               total_channels = excluded.total_channels,
-               total_posts = excluded.total_posts,
-               posts_with_image = excluded.posts_with_image""",
-            (today, total_users, premium_users, total_channels, total_posts, posts_with_image)
+        result = await self.execute_query(
+            f"SELECT c.posts + p.posts, p.images FROM {_CHANNEL_AGG_FROM}", fetch_one=True, replica=True
         )
-        logger.info(f"Daily stats recorded: {today} | users={total_users} premium={premium_users} "
-                     f"channels={total_channels} posts={total_posts} img={posts_with_image}")
+        return (result[0], result[1]) if result else (0, 0)
+
+    async def record_daily_stats(self) -> dict:
+        """Bugungi statistikani bitta agregat so'rov bilan hisoblab yozish."""
+        today = datetime.now(TZ).strftime("%Y-%m-%d")
+        async with self.unit_of_work() as uow:
+            row = await uow.execute(
+                f"""INSERT INTO daily_stats (date, total_users, premium_users, total_channels, total_posts, posts_with_image)
+                   SELECT ?, u.total, u.premium, c.cnt + p.cnt, c.posts + p.posts, p.images
+                   FROM {_USERS_AGG_FROM}, {_CHANNEL_AGG_FROM}
+                   WHERE TRUE
+                   ON CONFLICT (date) DO UPDATE SET
+                   total_users = excluded.total_users,
+                   premium_users = excluded.premium_users,
+                   total_channels = excluded.total_channels,
+                   total_posts = excluded.total_posts,
+                   posts_with_image = excluded.posts_with_image
+                   RETURNING total_users, premium_users, total_channels, total_posts, posts_with_image""",
+                (today,), fetch_one=True
+            )
+        stats = dict(zip(_DAILY_STATS_FIELDS, row))
+        logger.info(f"Daily stats recorded: {today} | users={stats['total_users']} premium={stats['premium_users']} "
+                     f"channels={stats['total_channels']} posts={stats['total_posts']} img={stats['posts_with_image']}")
+        return stats
 
-    async def get_stats_history(self, days: int = 30):
+    async def get_stats_history(self, days: int = 30, replica: bool = True):
+        """replica=False — hozirgina yozilgan qator ham kerak bo'lsa (replica orqada qolishi mumkin)."""
         return await self.execute_query(
             "SELECT date, total_users, premium_users, total_channels, total_posts, posts_with_image "
             "FROM daily_stats ORDER BY date DESC LIMIT ?",
-            (days,), fetch_all=True
+            (days,), fetch_all=True, replica=replica
         )
 
     # ============== API Usage Methods ==============
@@ -518,37 +956,69 @@ class DatabaseManager:
             (today, model, input_tokens, output_tokens)
         )
 
-    async def get_api_usage_summary(self, days: int):
-        """So'nggi N kun uchun jami tokenlar va requestlar (model bo'yicha)."""
-        return await self.execute_query(
-            "SELECT model, SUM(input_tokens) as total_input, SUM(output_tokens) as total_output, "
-            "SUM(requests_count) as total_requests "
-            "FROM api_usage WHERE date >= ? GROUP BY model",
-            (datetime.now(TZ).strftime("%Y-%m-%d") if days == 0
-             else (datetime.now(TZ) - timedelta(days=days)).strftime("%Y-%m-%d"),),
-            fetch_all=True
+    async def get_api_usage_rollup(self) -> dict:
+        """Oyna → (input, output, requests) va "days" (yozuvli kunlar soni) — bitta so'rovda."""
+        now = datetime.now(TZ)
+        params = tuple(
+            (now - timedelta(days=days)).strftime("%Y-%m-%d")
+            for _, days in API_USAGE_WINDOWS for _ in _API_USAGE_COLUMNS
         )
+        row = await self.execute_query(_API_USAGE_ROLLUP_SQL, params, fetch_one=True, replica=True)
+        values = [int(v or 0) for v in row]
+        width = len(_API_USAGE_COLUMNS)
+        names = [name for name, _ in API_USAGE_WINDOWS] + ["all"]
+        rollup = {name: tuple(values[i * width:(i + 1) * width]) for i, name in enumerate(names)}
+        rollup["days"] = values[-1]
+        return rollup
+
+    # ============== Broadcast Methods ==============
+
+    async def create_broadcast(self, admin_id: int, from_chat_id: int, message_id: int,
+                               progress_chat_id: int, progress_message_id: int) -> int:
+        async with self.unit_of_work() as uow:
+            row = await uow.execute(
+                "INSERT INTO broadcasts (admin_id, from_chat_id, message_id, progress_chat_id, progress_message_id) "
+                "VALUES (?, ?, ?, ?, ?) RETURNING id",
+                (admin_id, from_chat_id, message_id, progress_chat_id, progress_message_id), fetch_one=True
+            )
+        return row[0]
 
-    async def get_api_usage_days_count(self) -> int:
-        """API usage yozilgan kunlar soni (o'rtacha hisoblash uchun)."""
-        result = await self.execute_query(
-            "SELECT COUNT(DISTINCT date) FROM api_usage",
-            fetch_one=True
+    async def save_broadcast_progress(self, broadcast_id: int, cursor_id: int, sent: int, failed: int):
+        await self.execute_query(
+            "UPDATE broadcasts SET cursor_id = ?, sent = ?, failed = ? WHERE id = ?",
+            (cursor_id, sent, failed, broadcast_id)
         )
-        return result[0] if result else 0
-
-    # ============== Referral Methods ==============
 
-    async def add_referral(self, referrer_id: int, referred_id: int):
+    async def finish_broadcast(self, broadcast_id: int, status: str, sent: int, failed: int):
         await self.execute_query(
-            "INSERT INTO referrals (referrer_id, referred_id) VALUES (?, ?) ON CONFLICT (referred_id) DO NOTHING",
-            (referrer_id, referred_id)
+            "UPDATE broadcasts SET status = ?, sent = ?, failed = ?, finished_at = ? WHERE id = ?",
+            (status, sent, failed, db_now(), broadcast_id)
         )
-        await self.execute_query(
-            "UPDATE users SET referred_by = ? WHERE id = ?",
-            (referrer_id, referred_id)
+
+    async def get_running_broadcasts(self):
+        return await self.execute_query(
+            "SELECT id, from_chat_id, message_id, progress_chat_id, progress_message_id, cursor_id, sent, failed "
+            "FROM broadcasts WHERE status = 'running' ORDER BY id",
+            fetch_all=True
         )
 
+    # ============== Referral Methods ==============
+
+    async def add_referral(self, referrer_id: int, referred_id: int) -> bool:
+        """Referralni yozish; user allaqachon biriktirilgan bo'lsa False."""
+        async with self.unit_of_work() as uow:
+            inserted = await uow.execute(
+                "INSERT INTO referrals (referrer_id, referred_id) VALUES (?, ?) "
+                "ON CONFLICT (referred_id) DO NOTHING RETURNING id",
+                (referrer_id, referred_id), fetch_one=True
+            )
+            if inserted:
+                await uow.execute(
+                    "UPDATE users SET referred_by = ? WHERE id = ?",
+                    (referrer_id, referred_id)
+                )
+        return inserted is not None
+
     async def activate_referral(self, referred_id: int):
         await self.execute_query(
             "UPDATE referrals SET activated = TRUE, activated_at = CURRENT_TIMESTAMP WHERE referred_id = ? AND activated = FALSE",
@@ -586,18 +1056,18 @@ class DatabaseManager:
         return await self.execute_query(
             "SELECT referrer_id, COUNT(*) as cnt FROM referrals WHERE activated = TRUE "
             "GROUP BY referrer_id ORDER BY cnt DESC LIMIT ?",
-            (limit,), fetch_all=True
+            (limit,), fetch_all=True, replica=True
         )
 
     async def get_referral_stats(self) -> dict:
         total = await self.execute_query(
-            "SELECT COUNT(*) FROM referrals", fetch_one=True
+            "SELECT COUNT(*) FROM referrals", fetch_one=True, replica=True
         )
         activated = await self.execute_query(
-            "SELECT COUNT(*) FROM referrals WHERE activated = TRUE", fetch_one=True
+            "SELECT COUNT(*) FROM referrals WHERE activated = TRUE", fetch_one=True, replica=True
         )
         participants = await self.execute_query(
-            "SELECT COUNT(DISTINCT referrer_id) FROM referrals", fetch_one=True
+            "SELECT COUNT(DISTINCT referrer_id) FROM referrals", fetch_one=True, replica=True
         )
         return {
             'total_referrals': total[0] if total else 0,
@@ -0,0 +1,149 @@
+"""DB metrikalari: so'rov va pool checkout kechikishlari (gistogramma), pool holati.
+
+DatabaseManager har bir so'rovni nomi bilan (masalan "select_users") shu yerga yozadi.
+Ma'lumotlar admin paneldagi "DB metrikalar" va /metrics (Prometheus) orqali ko'rinadi.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import DB_SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+# Gistogramma chegaralari (ms)
+BUCKETS_MS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_NAME_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def query_name(sql: str) -> str:
+    """SQL matnidan mantiqiy nom: "<amal>_<jadval>" (masalan "update_premium_channel")."""
+    words = sql.split(None, 1)
+    verb = words[0].lower() if words else "query"
+    match = _NAME_RE.search(sql)
+    return f"{verb}_{match.group(1).lower()}" if match else verb
+
+
+def redact_params(params: Iterable) -> str:
+    """Parametr qiymatlari logga tushmaydi — faqat turlari."""
+    return "(" + ", ".join(type(p).__name__ for p in params) + ")"
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # oxirgisi — +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        for i, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Taxminiy persentil (bucket yuqori chegarasi)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, bound in enumerate(BUCKETS_MS):
+            seen += self.counts[i]
+            if seen >= target:
+                return float(bound)
+        return self.max
+
+
+class DBMetrics:
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.queries: Dict[str, Histogram] = {}
+        self.checkout = Histogram()
+        self.slow_queries = 0
+        self.errors = 0
+
+    def observe_checkout(self, wait_ms: float):
+        self.checkout.observe(wait_ms)
+
+    def observe_query(self, name: str, elapsed_ms: float, sql: str = "", params: Iterable = ()):
+        hist = self.queries.get(name)
+        if hist is None:
+            hist = self.queries[name] = Histogram()
+        hist.observe(elapsed_ms)
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            logger.warning(f"Slow query {name}: {elapsed_ms:.0f}ms | {' '.join(sql.split())[:300]} | params={redact_params(params)}")
+
+    def top_queries(self, limit: int = 10) -> List[Tuple[str, Histogram]]:
+        """Umumiy vaqt bo'yicha eng og'ir so'rovlar."""
+        return sorted(self.queries.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+
+    def reset(self):
+        self.queries.clear()
+        self.checkout = Histogram()
+        self.slow_queries = 0
+        self.errors = 0
+
+
+def pool_stats(engine) -> Dict[str, Optional[int]]:
+    """Pool holati: size, checked_out (ishlatilmoqda), overflow."""
+    pool = engine.pool
+    stats = {}
+    for key, attr in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+        method = getattr(pool, attr, None)
+        stats[key] = method() if callable(method) else None
+    return stats
+
+
+def render_prometheus(metrics: DBMetrics, pools: Dict[str, Dict[str, Optional[int]]]) -> str:
+    """Prometheus text formatida eksport."""
+    lines = []
+
+    def histogram(metric: str, hist: Histogram, labels: str = ""):
+        seen = 0
+        sep = "," if labels else ""
+        for bound, count in zip(BUCKETS_MS, hist.counts):
+            seen += count
+            lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound / 1000:g}"}} {seen}')
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{metric}_sum{suffix} {hist.total / 1000:.6f}")
+        lines.append(f"{metric}_count{suffix} {hist.count}")
+
+    lines.append("# TYPE univerbot_db_query_seconds histogram")
+    for name, hist in sorted(metrics.queries.items()):
+        histogram("univerbot_db_query_seconds", hist, f'query="{name}"')
+
+    lines.append("# TYPE univerbot_db_pool_checkout_seconds histogram")
+    histogram("univerbot_db_pool_checkout_seconds", metrics.checkout)
+
+    lines.append("# TYPE univerbot_db_slow_queries_total counter")
+    lines.append(f"univerbot_db_slow_queries_total {metrics.slow_queries}")
+    lines.append("# TYPE univerbot_db_errors_total counter")
+    lines.append(f"univerbot_db_errors_total {metrics.errors}")
+
+    for key in ("size", "checked_out", "overflow"):
+        lines.append(f"# TYPE univerbot_db_pool_{key} gauge")
+        for pool_name, stats in pools.items():
+            if stats.get(key) is not None:
+                lines.append(f'univerbot_db_pool_{key}{{pool="{pool_name}"}} {stats[key]}')
+
+    return "\n".join(lines) + "\n"
+
+
+__all__ = ["DBMetrics", "Histogram", "BUCKETS_MS", "query_name", "redact_params", "pool_stats", "render_prometheus"]
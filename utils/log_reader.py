@@ -0,0 +1,152 @@
+"""Log fayllardan vaqt oynasini o'qish (joriy + rotatsiya qilingan bot.log.N).
+
+Log qatorlari vaqt bo'yicha tartiblangan, shuning uchun oyna boshi har bir faylda
+binary search bilan topiladi (O(log hajm) ta seek). Keyin faqat oyna ichidagi baytlar
+gzip ga oqim bilan yoziladi, ERROR/WARNING lar shu o'tishda sanaladi — ish vaqti
+umumiy log hajmiga emas, oyna hajmiga bog'liq.
+"""
+
+import gzip
+import os
+import re
+from datetime import datetime
+from typing import BinaryIO, List, NamedTuple, Optional, Tuple
+
+from logging_config import BACKUP_COUNT, LOG_DIR, LOG_FILE
+
+# Oyna shundan katta bo'lsa, eng yangi qismi olinadi (siqilmagan baytlar)
+LOG_EXPORT_MAX_BYTES = 100 * 1024 * 1024
+# Binary search nuqtasidan keyin timestampli qator shuncha bayt ichida topilishi kerak
+_PROBE_LIMIT = 256 * 1024
+_CHUNK_SIZE = 1024 * 1024
+
+# Matn formati "2026-01-01 10:30:45,123 - ..." yoki LOG_JSON: {"time":"2026-01-01T10:30:45", ...}
+# (JSON da bo'shliqlar formatterga bog'liq — ixtiyoriy)
+_TS_RE = re.compile(rb'^(?:\{\s*"time"\s*:\s*")?(\d{4}-\d\d-\d\d)[ T](\d\d:\d\d:\d\d)')
+_LEVEL_RE = re.compile(rb' - (ERROR|WARNING) - |"level"\s*:\s*"(ERROR|WARNING)"')
+_LEVEL_KEYS = {b"ERROR": "errors", b"WARNING": "warnings"}
+
+
+class LogExport(NamedTuple):
+    path: str
+    lines: int
+    errors: int
+    warnings: int
+    raw_bytes: int
+    truncated: bool
+
+
+def _timestamp(line: bytes) -> Optional[bytes]:
+    """Qator boshidagi vaqt "YYYY-MM-DD HH:MM:SS" ko'rinishida (leksik tartib = vaqt tartibi)."""
+    match = _TS_RE.match(line)
+    return match.group(1) + b" " + match.group(2) if match else None
+
+
+def log_files(log_dir: str = LOG_DIR, log_file: str = LOG_FILE, backup_count: int = BACKUP_COUNT) -> List[str]:
+    """Mavjud log fayllar, eskisidan yangisiga: bot.log.N ... bot.log.1, bot.log."""
+    base = os.path.join(log_dir, log_file)
+    paths = [f"{base}.{i}" for i in range(backup_count, 0, -1)] + [base]
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _next_record(f: BinaryIO, offset: int) -> Optional[Tuple[int, bytes]]:
+    """offset dan boshlanadigan (yoki undan keyingi) birinchi timestampli qator: (boshi, vaqt)."""
+    if offset > 0:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            f.readline()  # chala qatorni o'tkazib yuborish
+    else:
+        f.seek(0)
+    scanned = 0
+    while scanned < _PROBE_LIMIT:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return None
+        ts = _timestamp(line)
+        if ts is not None:
+            return start, ts
+        scanned += len(line)  # traceback kabi davomiy qatorlar
+    return None
+
+
+def find_offset(f: BinaryIO, size: int, cutoff: bytes) -> int:
+    """vaqti >= cutoff bo'lgan birinchi yozuv boshi (yo'q bo'lsa size)."""
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        record = _next_record(f, mid)
+        if record is None or record[1] >= cutoff:
+            hi = mid
+        else:
+            lo = mid + 1
+    record = _next_record(f, lo)
+    return record[0] if record and record[1] >= cutoff else size
+
+
+def window_ranges(cutoff: datetime, paths: Optional[List[str]] = None) -> List[Tuple[str, int, int]]:
+    """Oyna qamraydigan (fayl, boshlanish, tugash) bo'laklari, eskisidan yangisiga."""
+    cutoff_ts = cutoff.strftime("%Y-%m-%d %H:%M:%S").encode()
+    ranges: List[Tuple[str, int, int]] = []
+    # Yangisidan boshlab: oyna boshi topilgan fayldan eskilari butunlay oynadan tashqarida
+    for path in reversed(paths if paths is not None else log_files()):
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            offset = find_offset(f, size, cutoff_ts)
+        if offset >= size:
+            break
+        ranges.insert(0, (path, offset, size))
+        if offset > 0:
+            break
+    return ranges
+
+
+def _limit_ranges(ranges: List[Tuple[str, int, int]], max_bytes: int) -> Tuple[List[Tuple[str, int, int]], bool]:
+    """Jami max_bytes dan oshsa, eng yangi max_bytes ni qoldirish (qator boshidan)."""
+    total = sum(end - start for _, start, end in ranges)
+    if total <= max_bytes:
+        return ranges, False
+    skip = total - max_bytes
+    limited = []
+    for path, start, end in ranges:
+        if skip >= end - start:
+            skip -= end - start
+            continue
+        if skip:
+            with open(path, "rb") as f:
+                f.seek(start + skip)
+                f.readline()
+                start = f.tell()
+            skip = 0
+        limited.append((path, start, end))
+    return limited, True
+
+
+def export_window(cutoff: datetime, out_path: str, paths: Optional[List[str]] = None,
+                  max_bytes: int = LOG_EXPORT_MAX_BYTES) -> LogExport:
+    """cutoff dan keyingi loglarni out_path (.gz) ga oqim bilan yozish. Bloklovchi."""
+    ranges, truncated = _limit_ranges(window_ranges(cutoff, paths), max_bytes)
+    counts = {"lines": 0, "errors": 0, "warnings": 0}
+    raw_bytes = 0
+    with gzip.open(out_path, "wb", compresslevel=6) as out:
+        for path, start, end in ranges:
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    # Bo'lak qator chegarasida tugaydi — marker ikki bo'lakka bo'linmaydi
+                    chunk = f.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    if len(chunk) < remaining and not chunk.endswith(b"\n"):
+                        chunk += f.readline(remaining - len(chunk))
+                    remaining -= len(chunk)
+                    raw_bytes += len(chunk)
+                    counts["lines"] += chunk.count(b"\n") + (0 if chunk.endswith(b"\n") else 1)
+                    for match in _LEVEL_RE.finditer(chunk):
+                        counts[_LEVEL_KEYS[match.group(1) or match.group(2)]] += 1
+                    out.write(chunk)
+    return LogExport(out_path, counts["lines"], counts["errors"], counts["warnings"], raw_bytes, truncated)
+
+
+__all__ = ["LogExport", "log_files", "find_offset", "window_ranges", "export_window", "LOG_EXPORT_MAX_BYTES"]
@@ -0,0 +1,355 @@
+"""Versiyalangan sxema migratsiyalari.
+
+Har bir migratsiya bir marta, o'z tranzaksiyasida bajariladi va `schema_version`
+jadvaliga yoziladi. Startda faqat bitta so'rov: joriy versiyani o'qish.
+Yangi o'zgarish — MIGRATIONS oxiriga yangi versiya qo'shish (eskilarini tahrirlamang).
+"""
+
+import logging
+from typing import NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Bir vaqtda ishga tushgan ikki jarayon migratsiyani ikki marta bajarmasligi uchun
+_ADVISORY_LOCK_ID = 7_342_001
+
+
+class Step(NamedTuple):
+    """Faqat berilgan dialektda bajariladigan qadam (masalan "postgresql")."""
+    dialect: str
+    sql: str
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    steps: Tuple[Union[str, Step], ...]
+
+
+def _premium_channel_columns() -> str:
+    posts = ",\n".join(f"    post{i} TEXT, theme{i} TEXT" for i in range(1, 16))
+    images = ", ".join(f"image{i} TEXT DEFAULT 'no'" for i in range(1, 16))
+    return f"{posts},\n    with_image BOOLEAN DEFAULT FALSE,\n    last_edit_time TIMESTAMP,\n    {images}"
+
+
+_REFERRALS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_ref_referrer ON referrals(referrer_id)",
+    "CREATE INDEX IF NOT EXISTS idx_ref_activated ON referrals(referrer_id, activated)",
+)
+
+_INITIAL_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS superadmins (id BIGINT PRIMARY KEY)",
+    """CREATE TABLE IF NOT EXISTS users (
+        id BIGINT PRIMARY KEY,
+        subscription BOOLEAN DEFAULT FALSE,
+        premium_type TEXT,
+        start_date TIMESTAMP,
+        end_date TIMESTAMP,
+        referred_by BIGINT,
+        referral_base_date TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS channel (
+        user_id BIGINT,
+        id BIGINT PRIMARY KEY,
+        post1 TEXT, theme1 TEXT,
+        post2 TEXT, theme2 TEXT,
+        post3 TEXT, theme3 TEXT,
+        with_image BOOLEAN DEFAULT FALSE,
+        last_edit_time TIMESTAMP
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS premium_channel (
+        user_id BIGINT,
+        id BIGINT PRIMARY KEY,
+    {_premium_channel_columns()}
+    )""",
+    """CREATE TABLE IF NOT EXISTS referrals (
+        id SERIAL PRIMARY KEY,
+        referrer_id BIGINT NOT NULL,
+        referred_id BIGINT NOT NULL UNIQUE,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        activated BOOLEAN DEFAULT FALSE,
+        activated_at TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS daily_stats (
+        date TEXT PRIMARY KEY,
+        total_users INTEGER DEFAULT 0,
+        premium_users INTEGER DEFAULT 0,
+        total_channels INTEGER DEFAULT 0,
+        total_posts INTEGER DEFAULT 0,
+        posts_with_image INTEGER DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS api_usage (
+        date TEXT NOT NULL,
+        model TEXT NOT NULL,
+        input_tokens INTEGER DEFAULT 0,
+        output_tokens INTEGER DEFAULT 0,
+        requests_count INTEGER DEFAULT 0,
+        PRIMARY KEY (date, model)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_users_sub ON users(subscription)",
+    "CREATE INDEX IF NOT EXISTS idx_channel_uid ON channel(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_pchannel_uid ON premium_channel(user_id)",
+    *_REFERRALS_INDEXES,
+    *(f"CREATE INDEX IF NOT EXISTS idx_ch_post{i} ON channel(post{i})" for i in range(1, 4)),
+    *(f"CREATE INDEX IF NOT EXISTS idx_pch_post{i} ON premium_channel(post{i})" for i in range(1, 16)),
+)
+
+# Versiyalashdan oldingi bazalar: ustunlar keyinroq ALTER bilan qo'shilgan edi.
+# Yangi bazada ular 1-migratsiyada bor, SQLite esa ADD COLUMN IF NOT EXISTS ni bilmaydi.
+_LEGACY_COLUMNS = tuple(
+    Step("postgresql", stmt) for stmt in (
+        "ALTER TABLE channel ADD COLUMN IF NOT EXISTS with_image BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS with_image BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE channel ADD COLUMN IF NOT EXISTS last_edit_time TIMESTAMP",
+        "ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS last_edit_time TIMESTAMP",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS referred_by BIGINT",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS referral_base_date TIMESTAMP",
+        *(f"ALTER TABLE premium_channel ADD COLUMN IF NOT EXISTS image{i} TEXT DEFAULT 'no'" for i in range(1, 16)),
+    )
+)
+
+# referrals.id ga sequence bog'lash (eski INTEGER PRIMARY KEY uchun)
+_REFERRALS_SEQUENCE = (
+    Step("postgresql", "CREATE SEQUENCE IF NOT EXISTS referrals_id_seq OWNED BY referrals.id"),
+    Step("postgresql", "SELECT setval('referrals_id_seq', COALESCE((SELECT MAX(id) FROM referrals), 0) + 1, false)"),
+    Step("postgresql", "ALTER TABLE referrals ALTER COLUMN id SET DEFAULT nextval('referrals_id_seq')"),
+)
+
+# O'zgarishlarni boshqa jarayonlarga bildirish (services/change_feed.py tinglaydi).
+# Payload: "<jadval>|<user_id>" — keshdagi aynan shu kalit o'chiriladi.
+CHANGE_FEED_CHANNEL = "univerbot_changes"
+
+_CHANGE_FEED_TABLES = ("users", "superadmins", "channel", "premium_channel")
+
+_CHANGE_FEED = (
+    Step("postgresql", f"""
+    CREATE OR REPLACE FUNCTION univerbot_notify_change() RETURNS trigger AS $$
+    DECLARE
+        rec RECORD;
+        key BIGINT;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN rec := OLD; ELSE rec := NEW; END IF;
+        IF TG_TABLE_NAME IN ('channel', 'premium_channel') THEN
+            key := rec.user_id;
+        ELSE
+            key := rec.id;
+        END IF;
+        PERFORM pg_notify('{CHANGE_FEED_CHANNEL}', TG_TABLE_NAME || '|' || key);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql"""),
+    *(
+        step
+        for table in _CHANGE_FEED_TABLES
+        for step in (
+            Step("postgresql", f"DROP TRIGGER IF EXISTS {table}_change_feed ON {table}"),
+            Step("postgresql",
+                 f"CREATE TRIGGER {table}_change_feed AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                 f"FOR EACH ROW EXECUTE FUNCTION univerbot_notify_change()"),
+        )
+    ),
+)
+
+# Inkremental backup uchun: qaysi qator (id) o'zgargani. op: 'U' — insert/update, 'D' — delete.
+CHANGE_LOG_TABLES = ("users", "channel", "premium_channel", "referrals")
+
+def _sqlite_change_log_triggers(table: str) -> Tuple[Step, ...]:
+    return tuple(
+        Step("sqlite",
+             f"CREATE TRIGGER IF NOT EXISTS {table}_change_log_{event.lower()} AFTER {event} ON {table} "
+             f"BEGIN INSERT INTO change_log (table_name, row_id, op) "
+             f"VALUES ('{table}', {ref}.id, '{op}'); END")
+        for event, ref, op in (("INSERT", "NEW", "U"), ("UPDATE", "NEW", "U"), ("DELETE", "OLD", "D"))
+    )
+
+
+_CHANGE_LOG = (
+    Step("postgresql", """CREATE TABLE IF NOT EXISTS change_log (
+        id BIGSERIAL PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        row_id BIGINT NOT NULL,
+        op CHAR(1) NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )"""),
+    Step("sqlite", """CREATE TABLE IF NOT EXISTS change_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id BIGINT NOT NULL,
+        op CHAR(1) NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )"""),
+    "CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log(table_name, id)",
+    Step("postgresql", """
+    CREATE OR REPLACE FUNCTION univerbot_log_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO change_log (table_name, row_id, op) VALUES (TG_TABLE_NAME, OLD.id, 'D');
+        ELSE
+            INSERT INTO change_log (table_name, row_id, op) VALUES (TG_TABLE_NAME, NEW.id, 'U');
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql"""),
+    *(
+        step
+        for table in CHANGE_LOG_TABLES
+        for step in (
+            Step("postgresql", f"DROP TRIGGER IF EXISTS {table}_change_log ON {table}"),
+            Step("postgresql",
+                 f"CREATE TRIGGER {table}_change_log AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                 f"FOR EACH ROW EXECUTE FUNCTION univerbot_log_change()"),
+            *_sqlite_change_log_triggers(table),
+        )
+    ),
+)
+
+# Broadcast holati: restartdan keyin cursor_id dan (shu id gacha hammasi ishlangan) davom etadi
+_BROADCASTS_COLUMNS = """
+        admin_id BIGINT NOT NULL,
+        from_chat_id BIGINT NOT NULL,
+        message_id BIGINT NOT NULL,
+        progress_chat_id BIGINT,
+        progress_message_id BIGINT,
+        status TEXT NOT NULL DEFAULT 'running',
+        cursor_id BIGINT,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )"""
+
+_BROADCASTS = (
+    Step("postgresql", "CREATE TABLE IF NOT EXISTS broadcasts (id SERIAL PRIMARY KEY," + _BROADCASTS_COLUMNS),
+    Step("sqlite", "CREATE TABLE IF NOT EXISTS broadcasts (id INTEGER PRIMARY KEY AUTOINCREMENT," + _BROADCASTS_COLUMNS),
+    "CREATE INDEX IF NOT EXISTS idx_broadcasts_running ON broadcasts(status) WHERE status = 'running'",
+)
+
+# Yetib bo'lmaydigan chatlar (bot bloklangan, kanaldan chiqarilgan, chat topilmadi).
+# inactive_at IS NULL — faol; services/reachability.py belgilaydi va qayta tekshiradi
+REACHABILITY_TABLES = ("users", "channel", "premium_channel")
+
+_REACHABILITY = tuple(
+    step
+    for table in REACHABILITY_TABLES
+    for column in ("inactive_at TIMESTAMP", "inactive_reason TEXT")
+    for step in (
+        Step("postgresql", f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}"),
+        Step("sqlite", f"ALTER TABLE {table} ADD COLUMN {column}"),
+    )
+)
+
+# Kanal nomi keshi (services/channel_titles.py): ro'yxat ochilganda get_chat chaqirilmaydi
+_CHANNEL_TITLES = tuple(
+    step
+    for table in ("channel", "premium_channel")
+    for column in ("title TEXT", "title_updated_at TIMESTAMP")
+    for step in (
+        Step("postgresql", f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}"),
+        Step("sqlite", f"ALTER TABLE {table} ADD COLUMN {column}"),
+    )
+)
+
+# SQLite: 1-migratsiyadagi "id SERIAL PRIMARY KEY" avtomatik to'ldirilmaydi (NULL qoladi),
+# change_log trigger esa row_id NOT NULL talab qiladi. SQLite ustun turini o'zgartira
+# olmaydi — jadval INTEGER PRIMARY KEY AUTOINCREMENT bilan qayta quriladi (NULL id lar
+# ko'chirishda raqam oladi), indeks va triggerlar qayta yaratiladi.
+_REFERRALS_COLUMN_NAMES = "id, referrer_id, referred_id, joined_at, activated, activated_at"
+
+_REFERRALS_ROWID = (
+    Step("sqlite", """CREATE TABLE referrals_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        referrer_id BIGINT NOT NULL,
+        referred_id BIGINT NOT NULL UNIQUE,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        activated BOOLEAN DEFAULT FALSE,
+        activated_at TIMESTAMP
+    )"""),
+    Step("sqlite", f"INSERT INTO referrals_new ({_REFERRALS_COLUMN_NAMES}) "
+                   f"SELECT {_REFERRALS_COLUMN_NAMES} FROM referrals ORDER BY joined_at"),
+    Step("sqlite", "DROP TABLE referrals"),
+    Step("sqlite", "ALTER TABLE referrals_new RENAME TO referrals"),
+    *(Step("sqlite", sql) for sql in _REFERRALS_INDEXES),
+    *_sqlite_change_log_triggers("referrals"),
+)
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "initial schema", _INITIAL_SCHEMA),
+    Migration(2, "legacy columns", _LEGACY_COLUMNS),
+    Migration(3, "referrals id sequence", _REFERRALS_SEQUENCE),
+    Migration(4, "premium end_date index", (
+        "CREATE INDEX IF NOT EXISTS idx_users_premium_end ON users(end_date) WHERE subscription = TRUE",
+    )),
+    Migration(5, "change feed triggers", _CHANGE_FEED),
+    Migration(6, "change log for incremental backups", _CHANGE_LOG),
+    Migration(7, "broadcasts", _BROADCASTS),
+    Migration(8, "reachability", _REACHABILITY),
+    Migration(9, "channel titles", _CHANNEL_TITLES),
+    Migration(10, "sqlite referrals rowid", _REFERRALS_ROWID),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def get_schema_version(engine: AsyncEngine) -> Optional[int]:
+    """Joriy versiya; schema_version jadvali yo'q bo'lsa None."""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT MAX(version) FROM schema_version"))
+            return result.scalar() or 0
+    except (ProgrammingError, OperationalError):
+        return None
+
+
+async def run_migrations(engine: AsyncEngine) -> int:
+    """Bajarilmagan migratsiyalarni tartib bilan qo'llash. Joriy versiyani qaytaradi."""
+    current = await get_schema_version(engine)
+    if current is not None and current >= LATEST_VERSION:
+        return current
+
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+    for migration in MIGRATIONS:
+        if current is not None and migration.version <= current:
+            continue
+        async with engine.begin() as conn:
+            dialect = conn.dialect.name
+            if dialect == "postgresql":
+                await conn.execute(text(f"SELECT pg_advisory_xact_lock({_ADVISORY_LOCK_ID})"))
+            # Boshqa jarayon lock kutayotganimizda qo'llagan bo'lishi mumkin
+            applied = await conn.execute(
+                text("SELECT 1 FROM schema_version WHERE version = :v"), {"v": migration.version}
+            )
+            if applied.first():
+                continue
+
+            try:
+                for step in migration.steps:
+                    if isinstance(step, Step):
+                        if step.dialect != dialect:
+                            continue
+                        step = step.sql
+                    await conn.execute(text(step))
+            except Exception as e:
+                logger.error(f"Migratsiya v{migration.version} ({migration.name}) bajarilmadi: {e}")
+                raise
+
+            await conn.execute(
+                text("INSERT INTO schema_version (version, name) VALUES (:v, :n)"),
+                {"v": migration.version, "n": migration.name},
+            )
+        logger.info(f"Migratsiya qo'llandi: v{migration.version} ({migration.name})")
+        current = migration.version
+
+    return current
+
+
+__all__ = ["MIGRATIONS", "LATEST_VERSION", "CHANGE_FEED_CHANNEL", "CHANGE_LOG_TABLES", "REACHABILITY_TABLES", "Migration", "Step", "run_migrations", "get_schema_version"]
@@ -0,0 +1,364 @@
+"""Backupdan (create_backup .tar) bazani tiklash.
+
+Ishga tushirish:
+    python -m utils.restore backups/backup_2026-01-01.tar [delta_*.tar ...] [--jobs 4] [--truncate]
+
+Tartib: manifest sha256 tekshiruvi → sxema (migratsiyalar) → ikkilamchi indekslarni
+vaqtincha o'chirish → jadvallarni parallel COPY → indekslarni qayta yaratish →
+qatorlar sonini manifest bilan solishtirish → deltalarni ketma-ket qo'llash →
+sequence larni to'g'rilash.
+PostgreSQL bo'lmagan bazalarda (test/dev) COPY o'rniga executemany ishlatiladi.
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from typing import Dict, IO, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from utils.backup import CSV_NULL, MANIFEST_NAME
+from utils.database import _async_url
+from utils.migrations import run_migrations
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = 4
+INSERT_BATCH_SIZE = 1000
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Jadval → (sequence, ustun): tiklangandan keyin MAX(id)+1 ga o'rnatiladi
+SEQUENCES = {"referrals": ("referrals_id_seq", "id")}
+
+
+class RestoreError(Exception):
+    pass
+
+
+def read_manifest(tar_path: str) -> dict:
+    with tarfile.open(tar_path) as tar:
+        return json.load(tar.extractfile(MANIFEST_NAME))
+
+
+def verify_checksums(tar_path: str, manifest: dict):
+    """Har bir jadval fayli sha256 ini manifest bilan solishtirish (bloklovchi)."""
+    with tarfile.open(tar_path) as tar:
+        for table, info in manifest["tables"].items():
+            digest = hashlib.sha256()
+            f = tar.extractfile(info["file"])
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+            if digest.hexdigest() != info["sha256"]:
+                raise RestoreError(f"{table}: sha256 mos emas ({info['file']})")
+
+
+def _open_member(tar: tarfile.TarFile, info: dict, compression: str) -> IO[bytes]:
+    """Siqilgan CSV ni ochiq (decompress qilinadigan) oqim sifatida qaytarish."""
+    raw = tar.extractfile(info["file"])
+    if compression == "zstd":
+        if zstandard is None:
+            raise RestoreError("Backup zstd bilan siqilgan, zstandard paketi o'rnatilmagan")
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return gzip.GzipFile(fileobj=raw, mode="rb")
+
+
+async def _copy_table_pg(conn, tar_path: str, table: str, info: dict, compression: str) -> int:
+    """Bitta jadvalni COPY FROM STDIN bilan yuklash (fayl o'qish asyncpg executorida)."""
+    tar = await asyncio.to_thread(tarfile.open, tar_path)
+    try:
+        source = _open_member(tar, info, compression)
+        status = await conn.copy_to_table(
+            table, source=source, columns=info["columns"],
+            format="csv", header=True, null=CSV_NULL,
+        )
+    finally:
+        tar.close()
+    return int(status.split()[-1])
+
+
+def _read_csv_batches(tar_path: str, info: dict, compression: str):
+    """Fallback uchun: CSV qatorlarini INSERT_BATCH_SIZE lik dict ro'yxatlarida qaytarish."""
+    with tarfile.open(tar_path) as tar:
+        reader = csv.reader(io.TextIOWrapper(_open_member(tar, info, compression), encoding="utf-8"))
+        header = next(reader, None)
+        if header is None:
+            return
+        batch = []
+        for row in reader:
+            batch.append({col: (None if val == CSV_NULL else val) for col, val in zip(header, row)})
+            if len(batch) >= INSERT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+async def _insert_rows(conn, table: str, columns: List[str], batches: List[List[dict]]) -> int:
+    stmt = text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})")
+    rows = 0
+    for batch in batches:
+        await conn.execute(stmt, batch)
+        rows += len(batch)
+    return rows
+
+
+async def _insert_table(engine: AsyncEngine, tar_path: str, table: str, info: dict, compression: str) -> int:
+    if not info["rows"]:
+        return 0
+    batches = await asyncio.to_thread(lambda: list(_read_csv_batches(tar_path, info, compression)))
+    async with engine.begin() as conn:
+        return await _insert_rows(conn, table, info["columns"], batches)
+
+
+def _raw_dsn(engine: AsyncEngine) -> str:
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def _deferrable_indexes(conn, tables: List[str]) -> List[tuple]:
+    """Constraint ga bog'lanmagan indekslar (PK/UNIQUE emas) — yuklashdan keyin yaratiladi."""
+    return await conn.fetch(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = ANY($1::text[]) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)",
+        tables,
+    )
+
+
+async def _restore_pg(engine: AsyncEngine, tar_path: str, manifest: dict, jobs: int) -> Dict[str, int]:
+    import asyncpg
+
+    tables = list(manifest["tables"])
+    compression = manifest.get("compression", "gzip")
+    pool = await asyncpg.create_pool(_raw_dsn(engine), min_size=1, max_size=jobs)
+    try:
+        async with pool.acquire() as conn:
+            indexes = await _deferrable_indexes(conn, tables)
+            for name, _ in indexes:
+                await conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        logger.info(f"Restore: {len(indexes)} ta indeks yuklashdan keyinga qoldirildi")
+
+        loaded: Dict[str, int] = {}
+        try:
+            async def load(table: str):
+                async with pool.acquire() as conn:
+                    started = time.perf_counter()
+                    loaded[table] = await _copy_table_pg(conn, tar_path, table, manifest["tables"][table], compression)
+                    logger.info(f"Restore: {table} — {loaded[table]} qator, {time.perf_counter() - started:.1f}s")
+
+            # Kattaroq jadvallar birinchi — parallel yuklash tezroq tugaydi
+            order = sorted(tables, key=lambda t: manifest["tables"][t]["bytes"], reverse=True)
+            await asyncio.gather(*(load(t) for t in order))
+        finally:
+            async def create_index(indexdef: str):
+                async with pool.acquire() as conn:
+                    await conn.execute(indexdef)
+
+            await asyncio.gather(*(create_index(d) for _, d in indexes))
+
+        return loaded
+    finally:
+        await pool.close()
+
+
+async def _restore_generic(engine: AsyncEngine, tar_path: str, manifest: dict) -> Dict[str, int]:
+    compression = manifest.get("compression", "gzip")
+    return {
+        table: await _insert_table(engine, tar_path, table, info, compression)
+        for table, info in manifest["tables"].items()
+    }
+
+
+def _check_chain(base_path: str, base: dict, deltas: List[Tuple[str, dict]]):
+    """Deltalar shu to'liq backupga tegishli va change_log oralig'i uzluksiz bo'lishi kerak."""
+    if base.get("type", "full") != "full":
+        raise RestoreError(f"{os.path.basename(base_path)} to'liq backup emas")
+    position = base.get("change_log_id")
+    for path, manifest in deltas:
+        name = os.path.basename(path)
+        if manifest.get("type") != "delta":
+            raise RestoreError(f"{name} delta backup emas")
+        if manifest["base"] != os.path.basename(base_path):
+            raise RestoreError(f"{name} boshqa backupga tegishli ({manifest['base']})")
+        if manifest["change_log_from"] != position:
+            raise RestoreError(
+                f"{name}: change_log {manifest['change_log_from']} dan boshlanadi, kutilgan {position} "
+                "(oraliqdagi delta yetishmaydi yoki tartib noto'g'ri)"
+            )
+        position = manifest["change_log_id"]
+
+
+async def _apply_delta_pg(engine: AsyncEngine, tar_path: str, manifest: dict):
+    """Delta bitta tranzaksiyada: o'zgargan qatorlar COPY → vaqtinchalik jadval → DELETE + INSERT."""
+    import asyncpg
+
+    compression = manifest.get("compression", "gzip")
+    conn = await asyncpg.connect(_raw_dsn(engine))
+    try:
+        async with conn.transaction():
+            for table, info in manifest["tables"].items():
+                if info["mode"] == "full":
+                    await conn.execute(f"DELETE FROM {table}")
+                    await _copy_table_pg(conn, tar_path, table, info, compression)
+                    continue
+                cols = ", ".join(info["columns"])
+                await conn.execute(f"CREATE TEMP TABLE _delta (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                await _copy_table_pg(conn, tar_path, "_delta", info, compression)
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE id IN (SELECT id FROM _delta) OR id = ANY($1::bigint[])",
+                    info.get("deleted", []),
+                )
+                await conn.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _delta")
+                await conn.execute("DROP TABLE _delta")
+    finally:
+        await conn.close()
+
+
+async def _apply_delta_generic(engine: AsyncEngine, tar_path: str, manifest: dict):
+    compression = manifest.get("compression", "gzip")
+    async with engine.begin() as conn:
+        for table, info in manifest["tables"].items():
+            batches = await asyncio.to_thread(lambda: list(_read_csv_batches(tar_path, info, compression)))
+            if info["mode"] == "full":
+                await conn.execute(text(f"DELETE FROM {table}"))
+            else:
+                ids = [int(row["id"]) for batch in batches for row in batch] + info.get("deleted", [])
+                if ids:
+                    await conn.execute(text(f"DELETE FROM {table} WHERE id = :id"), [{"id": i} for i in ids])
+            await _insert_rows(conn, table, info["columns"], batches)
+
+
+async def _set_user_triggers(engine: AsyncEngine, tables: List[str], enabled: bool):
+    """Yuklash paytida change feed / change_log triggerlari ishlamasin (faqat PostgreSQL)."""
+    action = "ENABLE" if enabled else "DISABLE"
+    async with engine.begin() as conn:
+        for table in tables:
+            await conn.execute(text(f"ALTER TABLE {table} {action} TRIGGER USER"))
+
+
+async def _finalize(engine: AsyncEngine, tables: List[str]):
+    """Sequence larni MAX(id) ga to'g'rilash, change_log ni tozalash, statistikani yangilash."""
+    async with engine.begin() as conn:
+        # Tiklangan baza o'z backup zanjirini yangi to'liq backupdan boshlaydi
+        await conn.execute(text("DELETE FROM change_log"))
+        if engine.dialect.name != "postgresql":
+            return
+        for table, (seq, column) in SEQUENCES.items():
+            if table in tables:
+                await conn.execute(text(
+                    f"SELECT setval('{seq}', COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+                ))
+    async with engine.connect() as conn:
+        for table in tables:
+            await conn.execute(text(f"ANALYZE {table}"))
+
+
+async def _count_rows(engine: AsyncEngine, tables: List[str]) -> Dict[str, int]:
+    async with engine.connect() as conn:
+        return {t: (await conn.execute(text(f"SELECT COUNT(*) FROM {t}"))).scalar() for t in tables}
+
+
+async def restore_backup(tar_path: str, database_url: str, jobs: int = DEFAULT_JOBS,
+                         truncate: bool = False, deltas: Sequence[str] = ()) -> Dict[str, int]:
+    """Backupni (va undan keyingi deltalarni) bazaga tiklash. Jadval → qatorlar soni.
+
+    Maqsad jadvallar bo'sh bo'lishi kerak (yoki truncate=True).
+    Deltalar yaratilgan tartibda berilishi kerak.
+    """
+    manifest = await asyncio.to_thread(read_manifest, tar_path)
+    await asyncio.to_thread(verify_checksums, tar_path, manifest)
+    delta_manifests = []
+    for path in deltas:
+        delta = await asyncio.to_thread(read_manifest, path)
+        await asyncio.to_thread(verify_checksums, path, delta)
+        delta_manifests.append((path, delta))
+    _check_chain(tar_path, manifest, delta_manifests)
+    tables = list(manifest["tables"])
+
+    engine = create_async_engine(_async_url(database_url))
+    try:
+        await run_migrations(engine)
+
+        existing = await _count_rows(engine, tables)
+        non_empty = [t for t, n in existing.items() if n]
+        if non_empty and not truncate:
+            raise RestoreError(f"Jadvallar bo'sh emas: {', '.join(non_empty)} (--truncate bilan tozalang)")
+        if non_empty:
+            async with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    await conn.execute(text(f"TRUNCATE {', '.join(tables)}"))
+                else:
+                    for table in tables:
+                        await conn.execute(text(f"DELETE FROM {table}"))
+
+        is_pg = engine.dialect.driver == "asyncpg"
+        if is_pg:
+            await _set_user_triggers(engine, tables, enabled=False)
+        try:
+            started = time.perf_counter()
+            if is_pg:
+                loaded = await _restore_pg(engine, tar_path, manifest, jobs)
+            else:
+                loaded = await _restore_generic(engine, tar_path, manifest)
+            logger.info(f"Restore: {sum(loaded.values())} qator {time.perf_counter() - started:.1f}s da yuklandi")
+
+            counts = await _count_rows(engine, tables)
+            mismatched = [
+                f"{t}: kutilgan {manifest['tables'][t]['rows']}, bazada {counts[t]}"
+                for t in tables if counts[t] != manifest["tables"][t]["rows"]
+            ]
+            if mismatched:
+                raise RestoreError("Qatorlar soni mos emas — " + "; ".join(mismatched))
+
+            for path, delta in delta_manifests:
+                started = time.perf_counter()
+                if is_pg:
+                    await _apply_delta_pg(engine, path, delta)
+                else:
+                    await _apply_delta_generic(engine, path, delta)
+                logger.info(f"Restore: {os.path.basename(path)} {time.perf_counter() - started:.1f}s da qo'llandi")
+        finally:
+            if is_pg:
+                await _set_user_triggers(engine, tables, enabled=True)
+
+        await _finalize(engine, tables)
+        return await _count_rows(engine, tables) if delta_manifests else counts
+    finally:
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="UniverBot backup (.tar) ni bazaga tiklash")
+    parser.add_argument("backup", help="create_backup yaratgan .tar fayl")
+    parser.add_argument("deltas", nargs="*", help="Shu backupdan keyingi delta_*.tar fayllar (tartib bilan)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="Maqsad baza (default: DATABASE_URL)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Parallel COPY ulanishlari")
+    parser.add_argument("--truncate", action="store_true", help="Mavjud ma'lumotlarni o'chirib tiklash")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("DATABASE_URL yoki --database-url kerak")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    counts = asyncio.run(restore_backup(args.backup, args.database_url, jobs=args.jobs, truncate=args.truncate,
+                                        deltas=args.deltas))
+    for table, rows in counts.items():
+        print(f"{table}: {rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,22 @@ def sanitize_channel_id(channel_id: int | str) -> int | None:
         return None
 
 
+_BIGINT_MAX = 2 ** 63 - 1
+
+
+def sanitize_referrer_id(referral_arg: str) -> int | None:
+    """/start ref_<id> dan referrer id; BIGINT dan katta bo'lsa None (register_user so'rovi yiqilmasin)."""
+    try:
+        rid = int(referral_arg.removeprefix("ref_"))
+    except (ValueError, TypeError, AttributeError):
+        logger.warning(f"Invalid referral payload: {referral_arg!r}")
+        return None
+    if 0 < rid <= _BIGINT_MAX:
+        return rid
+    logger.warning(f"Invalid referrer ID range: {rid}")
+    return None
+
+
 def validate_broadcast_message(message_text: str, max_length: int = 4096) -> tuple[bool, str]:
     if not message_text or not message_text.strip():
         return False, "Xabar bo'sh bo'lishi mumkin emas"
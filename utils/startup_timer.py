@@ -0,0 +1,59 @@
+"""Bot ishga tushish vaqtini bosqichlarga bo'lib o'lchash.
+
+main.py jarayon boshidagi vaqtni beradi; importlar, on_startup qadamlari va birinchi
+polling gacha ketgan umumiy vaqt (time-to-first-poll) logga va /metrics ga chiqadi.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self._last = self.started
+        self.first_poll: Optional[float] = None
+
+    def restart(self, started: float):
+        """Hisobni jarayon boshidan olish (main.py birinchi qatoridagi vaqt)."""
+        self.started = self._last = started
+        self.phases.clear()
+        self.first_poll = None
+
+    def mark(self, name: str):
+        """Oldingi belgidan shu paytgacha ketgan vaqtni `name` bosqichi sifatida yozish."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - started))
+            self._last = now
+
+    def mark_first_poll(self):
+        self.first_poll = time.perf_counter() - self.started
+
+    def report(self) -> str:
+        lines = [f"  {name:<24} {seconds * 1000:8.1f} ms" for name, seconds in self.phases]
+        if self.first_poll is not None:
+            lines.append(f"  {'time-to-first-poll':<24} {self.first_poll * 1000:8.1f} ms")
+        return "Startup:\n" + "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        lines = ["# TYPE univerbot_startup_phase_seconds gauge"]
+        lines += [f'univerbot_startup_phase_seconds{{phase="{name}"}} {seconds:.6f}' for name, seconds in self.phases]
+        if self.first_poll is not None:
+            lines.append("# TYPE univerbot_time_to_first_poll_seconds gauge")
+            lines.append(f"univerbot_time_to_first_poll_seconds {self.first_poll:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+startup_timer = StartupTimer()
@@ -1,16 +1,26 @@
-"""Statistika grafik yaratish (matplotlib)."""
+"""Statistika grafik yaratish (matplotlib).
 
+Chizish alohida jarayonda (ProcessPoolExecutor) — event loop bloklanmaydi.
+Tayyor PNG daily_stats qatorlari hash i bo'yicha keshlanadi. matplotlib bot jarayoniga
+import qilinmaydi.
+"""
+
+import asyncio
+import hashlib
 import io
 import logging
-
-import matplotlib
-matplotlib.use('Agg')  # GUI siz backend
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+CHART_CACHE_SIZE = 8
+
+_executor: ProcessPoolExecutor | None = None
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
 
 def generate_stats_chart(stats_data: list) -> bytes | None:
     """Kunlik statistikadan grafik yaratish.
@@ -24,6 +34,12 @@ def generate_stats_chart(stats_data: list) -> bytes | None:
     if not stats_data:
         return None
 
+    # matplotlib faqat chizuvchi jarayonda yuklanadi (bot jarayonida emas)
+    import matplotlib
+    matplotlib.use('Agg')  # GUI siz backend
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
     try:
         # Eng eski → eng yangi tartibda
         stats_data = list(reversed(stats_data))
@@ -93,3 +109,51 @@ def generate_stats_chart(stats_data: list) -> bytes | None:
         logger.error(f"Chart yaratishda xatolik: {e}", exc_info=True)
         plt.close('all')
         return None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: bot jarayonidagi threadlar/ulanishlar fork qilinmaydi
+        _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _rows_key(rows: list) -> str:
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+async def render_stats_chart(stats_data: list) -> bytes | None:
+    """generate_stats_chart ning asinxron, keshlangan varianti (alohida jarayonda)."""
+    if not stats_data:
+        return None
+    rows = [tuple(row) for row in stats_data]
+    key = _rows_key(rows)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    global _executor
+    try:
+        png = await asyncio.get_running_loop().run_in_executor(_get_executor(), generate_stats_chart, rows)
+    except Exception as e:
+        # BrokenProcessPool va h.k. — keyingi chaqiruvda pool qayta yaratiladi
+        logger.error(f"Chart jarayonida xatolik: {e}", exc_info=True)
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        return None
+
+    if png:
+        _cache[key] = png
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png
+
+
+def shutdown_chart_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None